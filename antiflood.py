@@ -0,0 +1,137 @@
+import time
+from collections import deque
+
+from concurrency import update_key
+from metrics import UPDATES_DROPPED
+
+FLOOD_RATE = 1.0  # sustained updates per second per user
+FLOOD_BURST = 8  # updates a user may send at once before being limited
+DUPLICATE_WINDOW = 1.0  # seconds in which a repeat of a user's last update is dropped
+RECENT_UPDATE_IDS = 1000
+MAX_USER_UPLOADS = 3  # files a user may have queued or downloading at once
+NOTICE_INTERVAL = 30  # seconds between "slow down" replies to the same user
+PRUNE_EVERY = 1000  # checks between sweeps of idle users
+
+
+def _payload(update):
+    """What the user sent, for spotting double taps: text, button data or file."""
+    if update.callback_query is not None:
+        return "callback", update.callback_query.data
+    message = update.message
+    if message is None:
+        return None
+    if message.document is not None:
+        return "document", message.document.file_unique_id
+    return "text", message.text
+
+
+class FloodGuard:
+    """Decides which updates reach the handlers at all.
+
+    :meth:`check` runs before an update takes a concurrency slot or its
+    user's lock and returns why it should be dropped, or None:
+
+    * ``duplicate``: an update id seen before (webhook or router retries), or
+      the same text, button or file as the user's previous update within
+      ``duplicate_window`` seconds (double taps);
+    * ``rate``: the user's token bucket (``rate`` per second, bursts of
+      ``burst``) is empty; users in ``exempt`` are never limited, and a
+      ``rate`` of 0 disables the limit;
+    * ``uploads``: a document from a user who already has ``max_uploads``
+      files queued or downloading; 0 disables the cap.
+
+    Every document it admits takes one of its user's upload slots right away,
+    so a burst of documents can't all pass before the first is queued. The
+    caller gives the slot back with :meth:`upload_finished` once the upload
+    ends, or straight away if the document is turned down.
+
+    Drops are counted in ``bot_updates_dropped_total`` by reason.
+    """
+
+    def __init__(self, rate=FLOOD_RATE, burst=FLOOD_BURST, max_uploads=MAX_USER_UPLOADS,
+                 duplicate_window=DUPLICATE_WINDOW, exempt=()):
+        self.rate = rate
+        self.burst = burst
+        self.max_uploads = max_uploads
+        self.duplicate_window = duplicate_window
+        self.exempt = set(exempt)
+        self.users = {}  # user id -> [tokens, refilled at, last payload, last seen, last notice]
+        self.uploads = {}
+        self.recent_ids = set()
+        self.recent_order = deque()
+        self.checks = 0
+
+    def __len__(self):
+        return len(self.users)
+
+    def _seen(self, update_id):
+        if update_id in self.recent_ids:
+            return True
+        self.recent_ids.add(update_id)
+        self.recent_order.append(update_id)
+        if len(self.recent_order) > RECENT_UPDATE_IDS:
+            self.recent_ids.discard(self.recent_order.popleft())
+        return False
+
+    def check(self, update):
+        reason = self._check(update)
+        if reason is not None:
+            UPDATES_DROPPED.inc(reason)
+        return reason
+
+    def _check(self, update):
+        if self._seen(update.update_id):
+            return "duplicate"
+        user_id = update_key(update)
+        if user_id is None:
+            return None
+        now = time.monotonic()
+        self.checks += 1
+        if self.checks % PRUNE_EVERY == 0:
+            self._prune(now)
+
+        state = self.users.get(user_id)
+        if state is None:
+            state = self.users[user_id] = [self.burst, now, None, 0.0, float("-inf")]
+        payload = _payload(update)
+        if payload is not None and payload == state[2] and now - state[3] < self.duplicate_window:
+            return "duplicate"
+        state[2], state[3] = payload, now
+
+        if self.rate and user_id not in self.exempt:
+            state[0] = min(self.burst, state[0] + (now - state[1]) * self.rate)
+            state[1] = now
+            if state[0] < 1:
+                return "rate"
+            state[0] -= 1
+
+        if payload is not None and payload[0] == "document":
+            if self.max_uploads and self.uploads.get(user_id, 0) >= self.max_uploads:
+                return "uploads"
+            self.upload_started(user_id)
+        return None
+
+    def should_notify(self, user_id):
+        """True at most once per ``NOTICE_INTERVAL`` per user, so rejections cost at most one reply."""
+        state = self.users.get(user_id)
+        now = time.monotonic()
+        if state is None or now - state[4] < NOTICE_INTERVAL:
+            return False
+        state[4] = now
+        return True
+
+    def upload_started(self, user_id):
+        self.uploads[user_id] = self.uploads.get(user_id, 0) + 1
+
+    def upload_finished(self, user_id):
+        left = self.uploads.get(user_id, 0) - 1
+        if left > 0:
+            self.uploads[user_id] = left
+        else:
+            self.uploads.pop(user_id, None)
+
+    def _prune(self, now):
+        """Forget users whose bucket has refilled and whose last update is too old to repeat."""
+        idle = max(self.burst / self.rate if self.rate else 0, self.duplicate_window, NOTICE_INTERVAL)
+        for user_id in [uid for uid, state in self.users.items() if now - state[3] > idle]:
+            del self.users[user_id]
@@ -0,0 +1,97 @@
+"""One flooding user vs everyone else, with and without the anti-flood guard.
+
+A spammer sends ``--spam`` updates at once (menu taps, many of them repeats)
+while ``--users`` other students send one update each. Every admitted update
+costs a handler run with one Bot API call of ``--api-latency`` seconds.
+Reports the other users' latency, handler runs, Bot API calls and what the
+guard dropped.
+
+    python bench_antiflood.py --spam 2000 --users 200 --concurrency 32
+"""
+import time
+import asyncio
+import argparse
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+
+from antiflood import FloodGuard
+from bench_webhook import FakeRequest, make_update
+from concurrency import PENDING_UPDATES, UserOrderedApplication
+from metrics import UPDATES_DROPPED
+
+SPAMMER = 1
+BUTTONS = ["Exam Announcement", "Buy me coffee", "Exam Announcement", "Manage Files"]
+
+
+async def run(guarded, args):
+    request = FakeRequest(args.api_latency)
+    app = (ApplicationBuilder().token("123:FLOOD").request(request).updater(None)
+           .application_class(UserOrderedApplication, kwargs={"update_slots": args.concurrency})
+           .concurrent_updates(PENDING_UPDATES).build())
+    guard = FloodGuard() if guarded else None
+    if guard is not None:
+        app.admit = lambda update: guard.check(update) is None
+    sent, done = {}, {}
+
+    async def reply(update, context):
+        await update.message.reply_text("ok")
+        done[update.update_id] = time.perf_counter()
+
+    app.add_handler(MessageHandler(filters.TEXT, reply))
+    UPDATES_DROPPED.values.clear()
+    await app.initialize()
+    await app.start()
+
+    update_id = 0
+    for i in range(args.spam):
+        update_id += 1
+        data = make_update(update_id, SPAMMER)
+        data["message"]["text"] = BUTTONS[i % len(BUTTONS)] if i % 3 else BUTTONS[0]
+        await app.update_queue.put(Update.de_json(data, app.bot))
+    student_ids = []
+    for user in range(args.users):
+        update_id += 1
+        student_ids.append(update_id)
+        sent[update_id] = time.perf_counter()
+        await app.update_queue.put(Update.de_json(make_update(update_id, 1000 + user), app.bot))
+
+    started = time.perf_counter()
+    while not all(uid in done for uid in student_ids):
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    await app.update_queue.join()
+    await app.stop()
+    await app.shutdown()
+
+    latencies = sorted(done[uid] - sent[uid] for uid in student_ids)
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    dropped = ", ".join(f"{reason} {count}" for (reason,), count in sorted(UPDATES_DROPPED.values.items())) or "-"
+    print(f"{'guard' if guarded else 'no guard':9} {pct(0.5):>9.1f} {pct(0.99):>9.1f} {elapsed:>10.2f} "
+          f"{len(done):>9} {request.message_id:>9}   {dropped}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spam", type=int, default=2000, help="updates sent by the flooding user")
+    parser.add_argument("--users", type=int, default=200, help="other users, one update each")
+    parser.add_argument("--concurrency", type=int, default=32, help="updates handled at once")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="seconds per fake Bot API call")
+    args = parser.parse_args()
+
+    print(f"spam: {args.spam}  users: {args.users}  concurrency: {args.concurrency}  "
+          f"API latency: {args.api_latency * 1000:.0f} ms")
+    print(f"{'':9} {'p50 ms':>9} {'p99 ms':>9} {'all done s':>10} {'handlers':>9} {'API calls':>9}   dropped")
+    await run(False, args)
+    await run(True, args)
+
+    guard = FloodGuard()
+    updates = [Update.de_json(make_update(i, 1000 + i % 5000), None) for i in range(1, 100001)]
+    started = time.perf_counter()
+    for update in updates:
+        guard.check(update)
+    print(f"\nguard check: {(time.perf_counter() - started) / len(updates) * 1e6:.2f} us per update")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
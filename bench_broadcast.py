@@ -0,0 +1,77 @@
+"""Compare the old sequential broadcast loop with Broadcaster against a fake Bot.
+
+    python bench_broadcast.py --users 2000 --latency 0.08
+"""
+import time
+import random
+import asyncio
+import argparse
+
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+from broadcast import Broadcaster
+
+
+class FakeBot:
+    """Stand-in for telegram.Bot that simulates network latency and some failures."""
+
+    def __init__(self, latency, blocked_ratio=0.02, flaky_ratio=0.01, flood_every=0):
+        self.latency = latency
+        self.blocked_ratio = blocked_ratio
+        self.flaky_ratio = flaky_ratio
+        self.flood_every = flood_every
+        self.calls = 0
+        self.random = random.Random(42)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        if self.flood_every and call % self.flood_every == 0:
+            raise RetryAfter(1)
+        if chat_id % 100 < self.blocked_ratio * 100:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        if self.random.random() < self.flaky_ratio:
+            raise TimedOut()
+
+
+async def sequential(bot, chat_ids, text):
+    failed = 0
+    for uid in chat_ids:
+        try:
+            await bot.send_message(chat_id=uid, text=text)
+        except Exception:
+            failed += 1
+    return failed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean seconds per API call")
+    parser.add_argument("--rate", type=float, default=30, help="global messages/second")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--flood-every", type=int, default=0, help="raise RetryAfter every N calls")
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    chat_ids = list(range(1, args.users + 1))
+
+    if not args.skip_sequential:
+        bot = FakeBot(args.latency, flood_every=args.flood_every)
+        start = time.perf_counter()
+        failed = await sequential(bot, chat_ids, "hello")
+        elapsed = time.perf_counter() - start
+        print(f"sequential:  {elapsed:7.2f}s  {args.users / elapsed:7.1f} msg/s  failed={failed}")
+
+    bot = FakeBot(args.latency, flood_every=args.flood_every)
+    broadcaster = Broadcaster(bot, global_rate=args.rate, concurrency=args.concurrency)
+    stats = await broadcaster.run(chat_ids, "hello")
+    print(f"broadcaster: {stats.elapsed:7.2f}s  {stats.rate:7.1f} msg/s  failed={stats.failed}  "
+          f"retries={stats.retries}  api_calls={bot.calls}")
+    for error, count in stats.errors.most_common():
+        print(f"  {error}: {count}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
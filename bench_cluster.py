@@ -0,0 +1,205 @@
+"""Scale-out test for multi-worker mode: throughput, per-user order, shared state and restarts.
+
+Starts N worker processes on a shared SQLite database, routes synthetic
+updates to them through ``cluster.Router`` and checks that
+
+* every user's messages were handled in order, by one worker;
+* every worker's in-memory submission index converges to the full set
+  (via the change feed);
+* conversation state survives a restart of all workers.
+
+Handlers burn ``--cpu-ms`` of CPU each, so throughput should grow with the
+number of workers up to the number of cores. Exits non-zero on failure.
+
+    python bench_cluster.py --workers 1 2 4 --users 100 --messages 20 --cpu-ms 2
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+
+import httpx
+from telegram import Update
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+
+from bench_webhook import FakeRequest, make_update
+from cluster import FORWARD_PATH, ChangeFeed, Router, StatePersistence, WorkerPool, partition
+from concurrency import PENDING_UPDATES, UserOrderedApplication
+from persistence import PersistenceService
+from storage import SqliteStorage
+from submissions import SubmissionStore
+from webserver import WebServer
+
+SECRET = "bench-secret"
+
+
+async def serve_worker():
+    index, workers = int(os.environ["WORKER_INDEX"]), int(os.environ["BENCH_WORKERS"])
+    cpu_seconds = float(os.environ["BENCH_CPU_MS"]) / 1000
+    store = SqliteStorage(os.environ["BENCH_DB"], migrate_from=None, worker=str(index))
+    persistence = PersistenceService(store)
+    submissions = SubmissionStore(store, persistence, id_offset=index, id_step=workers)
+    feed = ChangeFeed(store, persistence, interval=0.2)
+    feed.on("submissions", store.get_submission, submissions.sync, key=int)
+    stats = {"handled": 0, "misorders": 0, "foreign": 0}
+
+    async def handler(update, context):
+        user_id = update.effective_user.id
+        seq = int(update.message.text)
+        if partition(user_id, workers) != index:
+            stats["foreign"] += 1
+        if seq != context.user_data.get("last", 0) + 1:
+            stats["misorders"] += 1
+        deadline = time.perf_counter() + cpu_seconds
+        while time.perf_counter() < deadline:
+            pass
+        submissions.add({"file_name": f"{seq}.pdf", "file_id": f"{user_id}-{seq}", "submitted_by": str(user_id),
+                         "subject": "OOSAD", "submission_date": "2025-01-01"})
+        context.user_data["last"] = seq
+        stats["handled"] += 1
+
+    app = (
+        ApplicationBuilder()
+        .token("123:CLUSTER")
+        .request(FakeRequest())
+        .updater(None)
+        .persistence(StatePersistence(store, persistence, owns=lambda uid: partition(uid, workers) == index,
+                                      update_interval=0.5))
+        .application_class(UserOrderedApplication, kwargs={"update_slots": 32})
+        .concurrent_updates(PENDING_UPDATES)
+        .build()
+    )
+    app.add_handler(MessageHandler(filters.TEXT, handler))
+
+    async def on_update(data):
+        await app.update_queue.put(Update.de_json(data, app.bot))
+
+    report = lambda: json.dumps({**stats, "submissions": len(submissions), "users": len(app.user_data)})
+    server = WebServer(on_update, lambda: app.running, report, host="127.0.0.1", port=int(os.environ["PORT"]),
+                       webhook_path=FORWARD_PATH, secret_token=SECRET)
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+
+    await app.initialize()
+    persistence.start()
+    feed_task = asyncio.create_task(feed.run())
+    await app.start()
+    await server.start()
+    await stop.wait()
+    await server.stop()
+    await app.stop()
+    await app.shutdown()
+    feed_task.cancel()
+    await persistence.close()
+
+
+async def worker_stats(http, pool):
+    results = []
+    for url in pool.urls("/metrics"):
+        results.append((await http.get(url)).json())
+    return results
+
+
+async def wait_until(check, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await check():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def start_pool(http, pool):
+    pool.start()
+
+    async def ready():
+        try:
+            return all([(await http.get(url)).status_code == 200 for url in pool.urls("/readyz")])
+        except httpx.HTTPError:
+            return False
+    if not await wait_until(ready, 30):
+        raise RuntimeError("workers did not start")
+
+
+async def send(router, users, first, last):
+    update_id = int(time.time() * 1000) % 10 ** 9
+    for seq in range(first, last + 1):
+        for user_id in range(1, users + 1):
+            update_id += 1
+            data = make_update(update_id, 1000 + user_id)
+            data["message"]["text"] = str(seq)
+            await router.route(data)
+
+
+async def run(workers, args, directory, base_port):
+    env = {"BENCH_WORKER": "1", "BENCH_WORKERS": str(workers), "BENCH_CPU_MS": str(args.cpu_ms),
+           "BENCH_DB": os.path.join(directory, f"cluster-{workers}.db")}
+    SqliteStorage(env["BENCH_DB"], migrate_from=None).close()  # create the schema once, up front
+    pool = WorkerPool(os.path.abspath(__file__), workers, base_port, env)
+    expected = args.users * args.messages
+    async with httpx.AsyncClient(timeout=10) as http:
+        await start_pool(http, pool)
+        router = Router(pool.urls(FORWARD_PATH), SECRET)
+        await router.start()
+
+        started = time.perf_counter()
+        await send(router, args.users, 1, args.messages)
+
+        async def all_handled():
+            return sum(s["handled"] for s in await worker_stats(http, pool)) >= expected
+        handled = await wait_until(all_handled, 300)
+        elapsed = time.perf_counter() - started
+
+        async def converged():
+            return all(s["submissions"] == expected for s in await worker_stats(http, pool))
+        synced = await wait_until(converged, 10)
+        stats = await worker_stats(http, pool)
+
+        # Restart every worker, then continue each user's sequence.
+        await asyncio.to_thread(pool.stop)
+        await start_pool(http, pool)
+        await send(router, args.users, args.messages + 1, args.messages + 1)
+
+        async def resumed():
+            return sum(s["handled"] for s in await worker_stats(http, pool)) >= args.users
+        resumed_ok = await wait_until(resumed, 60)
+        after = await worker_stats(http, pool)
+        await router.stop()
+        await asyncio.to_thread(pool.stop)
+
+    misorders = sum(s["misorders"] + s["foreign"] for s in stats)
+    restart_misorders = sum(s["misorders"] for s in after)
+    ok = handled and synced and resumed_ok and not misorders and not restart_misorders and router.failed == 0
+    print(f"{workers:>7} {elapsed:>8.2f} {expected / elapsed:>9.0f} {misorders:>10} "
+          f"{'yes' if synced else 'NO':>7} {restart_misorders:>16} {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--cpu-ms", type=float, default=2.0, help="CPU time burned per update")
+    parser.add_argument("--port", type=int, default=18100, help="first worker port")
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}  updates per run: {args.users * args.messages}")
+    print(f"{'workers':>7} {'seconds':>8} {'updates/s':>9} {'misorders':>10} {'synced':>7} "
+          f"{'restart misorder':>16}")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            results.append(await run(workers, args, directory, args.port))
+    return all(results)
+
+
+if __name__ == "__main__":
+    if os.environ.get("BENCH_WORKER"):
+        asyncio.run(serve_worker())
+    else:
+        sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,109 @@
+"""Stress UserOrderedApplication: throughput vs concurrency, per-user ordering and no lost writes.
+
+Many simulated users each send a numbered sequence of messages. Every handler
+awaits fake I/O between reading and writing shared state (users, submissions),
+which is where lost updates would show up. After the run the script checks that
+every user's messages were handled in order and that storage holds exactly one
+user row per user and one submission per message. Exits non-zero on failure.
+
+    python bench_concurrency.py --users 200 --messages 20 --concurrency 1 32 128
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+
+from bench_webhook import FakeRequest, make_update
+from concurrency import PENDING_UPDATES, UserOrderedApplication
+from persistence import PersistenceService
+from storage import SqliteStorage
+from submissions import SubmissionStore
+from user_registry import UserRegistry
+
+
+async def run(concurrency, n_users, n_messages, burst, io_delay, directory):
+    store = SqliteStorage(os.path.join(directory, f"stress-{concurrency}.db"), migrate_from=None)
+    persistence = PersistenceService(store)
+    persistence.start()
+    users = UserRegistry(store, persistence)
+    submissions = SubmissionStore(store, persistence)
+    last_seen = {}
+    order_violations = []
+    rng = random.Random(concurrency)
+
+    async def handler(update, context):
+        user_id = update.effective_user.id
+        seq = int(update.message.text)
+        if seq != last_seen.get(user_id, 0) + 1:
+            order_violations.append((user_id, last_seen.get(user_id), seq))
+        users.touch(update.effective_user)
+        await asyncio.sleep(rng.uniform(0, io_delay))  # e.g. a download or an API call
+        submissions.add({"file_name": f"{seq}.pdf", "file_id": f"{user_id}-{seq}", "submitted_by": str(user_id),
+                         "subject": "OOSAD", "submission_date": "2025-01-01"})
+        last_seen[user_id] = seq
+
+    app = (
+        ApplicationBuilder()
+        .token("123:STRESS")
+        .request(FakeRequest())
+        .updater(None)
+        .application_class(UserOrderedApplication, kwargs={"update_slots": concurrency})
+        .concurrent_updates(PENDING_UPDATES)
+        .build()
+    )
+    app.add_handler(MessageHandler(filters.TEXT, handler))
+    await app.initialize()
+    await app.start()
+
+    # Interleave users, each sending short bursts of consecutive messages.
+    update_id = 0
+    started = time.perf_counter()
+    for first in range(1, n_messages + 1, burst):
+        for user_id in range(1, n_users + 1):
+            for seq in range(first, min(first + burst, n_messages + 1)):
+                update_id += 1
+                data = make_update(update_id, user_id)
+                data["message"]["text"] = str(seq)
+                await app.update_queue.put(Update.de_json(data, app.bot))
+    await app.update_queue.join()
+    elapsed = time.perf_counter() - started
+    await app.stop()
+    await app.shutdown()
+    await persistence.flush()
+
+    stored_users = len(store.load_users())
+    stored_submissions = len(store.load_submissions())
+    await persistence.close()
+    expected = n_users * n_messages
+    ok = (not order_violations and stored_users == n_users and stored_submissions == expected
+          and len(submissions) == expected and len(app.user_locks) == 0)
+    print(f"{concurrency:>11} {elapsed:>8.2f} {expected / elapsed:>9.0f} {len(order_violations):>10} "
+          f"{stored_users:>6}/{n_users:<6} {stored_submissions:>7}/{expected:<7} {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--burst", type=int, default=3, help="consecutive messages per user at a time")
+    parser.add_argument("--io-delay", type=float, default=0.01, help="max seconds of fake I/O per handler")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 32, 128])
+    args = parser.parse_args()
+
+    print(f"{'concurrency':>11} {'seconds':>8} {'updates/s':>9} {'misorders':>10} {'users':>13} {'submissions':>15}")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for concurrency in args.concurrency:
+            results.append(await run(concurrency, args.users, args.messages, args.burst, args.io_delay, directory))
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
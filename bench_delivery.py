@@ -0,0 +1,70 @@
+"""Time to deliver a subject's submissions: per-file loop vs albums vs ZIP, against a fake Bot.
+
+    python bench_delivery.py --files 80 --latency 0.3
+"""
+import os
+import asyncio
+import argparse
+import tempfile
+
+from delivery import ZipExporter, send_as_albums, send_one_by_one
+
+
+class FakeMessage:
+    def __init__(self, file_id):
+        self.document = type("Document", (), {"file_id": file_id})()
+
+
+class FakeBot:
+    """Every API call costs ``latency`` seconds; uploads also pay for their size."""
+
+    def __init__(self, latency, upload_bytes_per_second=5 * 1024 * 1024):
+        self.latency = latency
+        self.upload_rate = upload_bytes_per_second
+        self.calls = 0
+
+    async def send_document(self, chat_id, document, **kwargs):
+        self.calls += 1
+        delay = self.latency
+        if hasattr(document, "read"):
+            delay += len(document.read()) / self.upload_rate
+        await asyncio.sleep(delay)
+        return FakeMessage(f"cached-{self.calls}")
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=80)
+    parser.add_argument("--size-kb", type=int, default=200, help="size of each local submission")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per Bot API call")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = []
+        for i in range(args.files):
+            path = os.path.join(directory, f"assignment_{i}.pdf")
+            with open(path, "wb") as f:
+                f.write(os.urandom(args.size_kb * 1024))
+            files.append({"id": i + 1, "file_id": f"file-{i}", "file_name": f"assignment_{i}.pdf",
+                          "subject": "OOSAD", "submitted_by": f"student{i}", "path": path})
+        caption = lambda file: f"📂 File: {file['file_name']}"
+
+        print(f"{'mode':16} {'seconds':>8} {'api calls':>10}")
+        for label, send in (("per-file loop", send_one_by_one), ("albums", send_as_albums)):
+            bot = FakeBot(args.latency)
+            report = await send(bot, 1, files, caption)
+            print(f"{label:16} {report.elapsed:>8.2f} {bot.calls:>10}")
+
+        exporter = ZipExporter(os.path.join(directory, "exports"))
+        for label in ("zip (cold)", "zip (cached)"):
+            bot = FakeBot(args.latency)
+            report = await exporter.send(bot, 1, files, "OOSAD")
+            print(f"{label:16} {report.elapsed:>8.2f} {bot.calls:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
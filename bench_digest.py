@@ -0,0 +1,89 @@
+"""Admin notifications per submission pattern: one message per file vs adaptive digests.
+
+Replays submission arrivals in accelerated time (``--speedup``) through
+``digest.SubmissionDigest`` and reports how many messages reach the admin,
+the busiest minute, and how long a submission waits before the admin hears
+of it (in simulated seconds).
+
+    python bench_digest.py --speedup 600
+"""
+import random
+import asyncio
+import argparse
+
+from digest import SubmissionDigest, MIN_WINDOW, MAX_WINDOW, MAX_EVENTS
+
+SUBJECTS = ["Internet programming(IP)", "Information security", "Networking", "Ecommerce", "OOSAD"]
+
+
+def quiet(rng):
+    """A submission every ten minutes or so."""
+    t, times = 0.0, []
+    for _ in range(20):
+        t += rng.uniform(300, 900)
+        times.append(t)
+    return times
+
+
+def deadline(rng):
+    """300 submissions in the last 30 minutes before a deadline, thickest at the end."""
+    return sorted(1800 * rng.random() ** 0.5 for _ in range(300))
+
+
+def spikes(rng):
+    """Quiet hours with a few short bursts (a class uploading after a lab)."""
+    times = quiet(rng)
+    for start in (2000, 6000, 9000):
+        times += [start + rng.uniform(0, 120) for _ in range(40)]
+    return sorted(times)
+
+
+async def replay(times, speedup, rng):
+    loop = asyncio.get_running_loop()
+    clock = lambda: loop.time() * speedup
+    messages = []
+    sent_at = {}
+    pending = []
+
+    async def send(text):
+        now = clock()
+        messages.append(now)
+        for index in pending:
+            sent_at[index] = now
+        pending.clear()
+
+    digest = SubmissionDigest(send, MIN_WINDOW / speedup, MAX_WINDOW / speedup, MAX_EVENTS)
+    start = clock()
+    arrived = []
+    for index, t in enumerate(times):
+        await asyncio.sleep(max(0.0, (start + t - clock()) / speedup))
+        arrived.append(clock())
+        pending.append(index)
+        digest.add(rng.choice(SUBJECTS), f"student{rng.randrange(60)}")
+    await digest.close()
+
+    delays = sorted(sent_at[i] - arrived[i] for i in range(len(times)))
+    busiest = max(sum(1 for m in messages if s <= m < s + 60) for s in messages) if messages else 0
+    return len(messages), busiest, sum(delays) / len(delays), delays[int(len(delays) * 0.99)], delays[-1]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--speedup", type=float, default=600, help="simulated seconds per real second")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"window {MIN_WINDOW}-{MAX_WINDOW} s, flush at {MAX_EVENTS} events; delays in simulated seconds")
+    print(f"{'pattern':10} {'files':>6} {'old msgs':>9} {'old/min':>8} {'digests':>8} {'digest/min':>10} "
+          f"{'mean s':>7} {'p99 s':>7} {'max s':>7}")
+    for pattern in (quiet, deadline, spikes):
+        rng = random.Random(args.seed)
+        times = pattern(rng)
+        old_busiest = max(sum(1 for u in times if t <= u < t + 60) for t in times)
+        count, busiest, mean, p99, worst = await replay(times, args.speedup, rng)
+        print(f"{pattern.__name__:10} {len(times):>6} {len(times):>9} {old_busiest:>8} {count:>8} {busiest:>10} "
+              f"{mean:>7.1f} {p99:>7.1f} {worst:>7.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
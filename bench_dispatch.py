@@ -0,0 +1,94 @@
+"""Per-update routing cost: the old regex handler chain + text_router flags vs Dispatcher.
+
+    python bench_dispatch.py --rounds 20000
+"""
+import time
+import argparse
+
+from telegram import Bot, Update
+from telegram.ext import MessageHandler, filters
+
+from dispatcher import Dispatcher, IDLE, SELECTING_SUBJECT, ADDING_EXAM_NAME, STATE_KEY
+
+BUTTONS = ["Submit Group Assignment", "Submit Individual Assignment", "Exam Announcement", "Add Exam Date",
+           "Delete Exam", "View Assignments", "Post Message", "Buy me coffee", "Manage Files"]
+SUBJECTS = ["Internet programming(IP)", "Information security", "Networking", "Ecommerce", "OOSAD", "Mobile computing"]
+OLD_FLAGS = ["deleting_exam", "pending_broadcast", "confirm_broadcast", "selecting_subject",
+             "viewing_subject", "filtering_by_date", "adding_exam"]
+
+
+async def noop(update, context):
+    pass
+
+
+def make_update(bot, text):
+    return Update.de_json({
+        "update_id": 1,
+        "message": {"message_id": 1, "date": 0, "chat": {"id": 5, "type": "private"},
+                    "from": {"id": 5, "is_bot": False, "first_name": "S"}, "text": text},
+    }, bot)
+
+
+def old_route(handlers, update, user_data):
+    for handler in handlers:
+        if handler.check_update(update):
+            break
+    else:
+        return None
+    if handler is not handlers[-1]:
+        return handler
+    # text_router: walk the flag cascade until one is set.
+    for flag in OLD_FLAGS:
+        if user_data.get(flag):
+            return flag
+    return None
+
+
+def new_route(text_handler, dispatcher, update, user_data):
+    if not text_handler.check_update(update):
+        return None
+    return dispatcher.resolve(user_data.get(STATE_KEY, IDLE), update.message.text.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    bot = Bot("123:BENCH")
+    old_handlers = [MessageHandler(filters.TEXT & filters.Regex(text), noop) for text in BUTTONS]
+    old_handlers.append(MessageHandler(filters.Document.ALL, noop))
+    old_handlers.append(MessageHandler(filters.TEXT, noop))
+
+    dispatcher = Dispatcher()
+    for text in BUTTONS:
+        dispatcher.button(text, noop)
+    for subject in SUBJECTS:
+        dispatcher.on(SELECTING_SUBJECT, subject, noop)
+    dispatcher.on_text(ADDING_EXAM_NAME, noop)
+    text_handler = MessageHandler(filters.TEXT, noop)
+
+    # (text, old user_data, new user_data)
+    cases = [
+        ("Buy me coffee", {}, {}),
+        ("Manage Files", {}, {}),
+        ("OOSAD", {"selecting_subject": True}, {"state": SELECTING_SUBJECT}),
+        ("Midterm", {"adding_exam": {"step": "name"}}, {"state": ADDING_EXAM_NAME}),
+        ("hello", {}, {"state": IDLE}),
+    ]
+    print(f"{'message':28} {'old us':>8} {'new us':>8}")
+    for text, old_data, new_data in cases:
+        update = make_update(bot, text)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            old_route(old_handlers, update, old_data)
+        old_us = (time.perf_counter() - start) / args.rounds * 1e6
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            new_route(text_handler, dispatcher, update, new_data)
+        new_us = (time.perf_counter() - start) / args.rounds * 1e6
+        print(f"{text:28} {old_us:>8.2f} {new_us:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
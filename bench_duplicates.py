@@ -0,0 +1,155 @@
+"""Duplicate detection throughput over one subject, by process-pool size.
+
+Writes ``--files`` synthetic submissions (plain text, .docx and PDF) for one
+subject: originals, byte-identical re-uploads under new names, the same
+text in another format, and lightly edited copies. For each ``--workers``
+count a fresh ``duplicates.DuplicateDetector`` analyses the whole subject
+(cold signature cache); then the subject is indexed again from the warm
+cache. Reports files per second, the longest event-loop stall while the
+pool works, and how many planted copies were flagged.
+
+    python bench_duplicates.py --files 400 --workers 1,2,4
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import hashlib
+import tempfile
+import zipfile
+import zlib
+
+from duplicates import DuplicateDetector
+from submissions import SubmissionStore
+from bench_pagination import MemoryStorage, NoPersistence
+
+SUBJECT = "OOSAD"
+
+
+def make_vocabulary(rng, size=4000):
+    syllables = ["ka", "lo", "mi", "ne", "su", "ta", "ri", "po", "de", "ga", "vo", "xi", "bu", "fe", "ze", "ho"]
+    return sorted({"".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(size)})
+
+
+def write_docx(path, paragraphs):
+    body = "".join(f"<w:p><w:r><w:t>{p}</w:t></w:r></w:p>" for p in paragraphs)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("word/document.xml", f"<w:document><w:body>{body}</w:body></w:document>")
+
+
+def write_pdf(path, paragraphs):
+    lines = " ".join(f"({p}) Tj T*" for p in paragraphs).encode()
+    stream = zlib.compress(b"BT /F1 11 Tf " + lines + b" ET")
+    with open(path, "wb") as f:
+        f.write(b"%%PDF-1.4\n1 0 obj << /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream))
+        f.write(stream + b"\nendstream\nendobj\n%EOF\n")
+
+
+def write_text(path, paragraphs):
+    with open(path, "w") as f:
+        f.write("\n\n".join(paragraphs))
+
+
+WRITERS = {".txt": write_text, ".docx": write_docx, ".pdf": write_pdf}
+
+
+def make_subject(directory, count, words, rng):
+    """Write the files and return ``(records, family)``; copies share their original's family."""
+    vocabulary = make_vocabulary(rng)
+    records, family, texts = [], {}, []
+    for i in range(count):
+        roll = rng.random()
+        ext = rng.choice(list(WRITERS))
+        if texts and roll < 0.1:  # byte-identical re-upload under another name
+            source = rng.randrange(len(records))
+            record = dict(records[source], file_name=f"copy_{i}{os.path.splitext(records[source]['file_name'])[1]}")
+            record["path"] = os.path.join(directory, record["file_name"])
+            os.link(records[source]["path"], record["path"])
+            texts.append(texts[source])
+            family[i] = family[source]
+        else:
+            if texts and roll < 0.2:  # same text in another format
+                source = rng.randrange(len(texts))
+                paragraphs = texts[source]
+            elif texts and roll < 0.3:  # light edits: ~2% of words replaced, two paragraphs swapped
+                source = rng.randrange(len(texts))
+                paragraphs = [" ".join(rng.choice(vocabulary) if rng.random() < 0.02 else w for w in p.split())
+                              for p in texts[source]]
+                a, b = rng.sample(range(len(paragraphs)), 2)
+                paragraphs[a], paragraphs[b] = paragraphs[b], paragraphs[a]
+            else:
+                source = None
+                paragraphs = [" ".join(rng.choice(vocabulary) for _ in range(words // 10)) for _ in range(10)]
+            path = os.path.join(directory, f"work_{i}{ext}")
+            WRITERS[ext](path, paragraphs)
+            with open(path, "rb") as f:
+                sha256 = hashlib.sha256(f.read()).hexdigest()
+            record = {"file_name": os.path.basename(path), "path": path, "sha256": sha256}
+            texts.append(paragraphs)
+            family[i] = i if source is None else family[source]
+        record.update(submitted_by=f"student{rng.randrange(120):03}", subject=SUBJECT, submission_date="2025-05-30")
+        records.append(record)
+    return records, family
+
+
+async def max_stall(task):
+    """Longest gap between event-loop ticks while ``task`` runs (ms)."""
+    worst, last = 0.0, time.perf_counter()
+    while not task.done():
+        await asyncio.sleep(0.001)
+        now = time.perf_counter()
+        worst, last = max(worst, now - last - 0.001), now
+    await task
+    return worst * 1000
+
+
+async def index_subject(store, workers, cache_dir):
+    detector = DuplicateDetector(store, workers=workers, cache_dir=cache_dir)
+    detector.start()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(detector.executor, int) for _ in range(workers)))  # spawn the pool
+    started = time.perf_counter()
+    task = asyncio.create_task(detector.subject_index(SUBJECT))
+    stall = await max_stall(task)
+    elapsed = time.perf_counter() - started
+    detector.stop()
+    return detector, task.result(), elapsed, stall
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--words", type=int, default=1500, help="words per original document")
+    parser.add_argument("--workers", default="1,2,4", help="process pool sizes to compare")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        records, family = make_subject(directory, args.files, args.words, random.Random(args.seed))
+        store = SubmissionStore(MemoryStorage(), NoPersistence())
+        ids = [store.add(record)["id"] for record in records]
+        planted = sum(1 for i in family if family[i] != i)
+        print(f"{args.files} files in {SUBJECT}, {planted} of them copies; {os.cpu_count()} CPUs")
+        print(f"{'workers':>7} {'cold s':>7} {'files/s':>8} {'speedup':>8} {'max stall ms':>13} {'warm s':>7}")
+
+        base = None
+        for workers in map(int, args.workers.split(",")):
+            cache_dir = os.path.join(directory, f".signatures-{workers}")
+            detector, index, cold, stall = await index_subject(store, workers, cache_dir)
+            _, _, warm, _ = await index_subject(store, workers, cache_dir)
+            base = base or cold
+            print(f"{workers:>7} {cold:>7.2f} {args.files / cold:>8.1f} {base / cold:>7.2f}x {stall:>13.1f} {warm:>7.2f}")
+
+        found = wrong = 0
+        for i, key in enumerate(ids):
+            matched = {ids.index(other) for other, _, _ in index.matches(key)}
+            wrong += sum(1 for j in matched if family[j] != family[i])
+            if family[i] != i and family[i] in matched | {family[j] for j in matched}:
+                found += 1
+        print(f"\nflagged {found}/{planted} planted copies, {wrong} matches between unrelated files")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
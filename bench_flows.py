@@ -0,0 +1,323 @@
+"""End-to-end load test: the real bot against a fake Bot API server, driven by simulated users.
+
+Starts ``fakeapi.FakeBotApi``, runs ``is_ass.py`` against it as a separate
+process (polling mode, fresh temporary database and files) and plays the
+bot's flows, phase by phase:
+
+* start: /start
+* submit: Submit Individual Assignment -> subject -> document, until it is stored
+* exam_add (admin): Add Exam Date -> name -> date -> time -> content -> yes
+* announcements: Exam Announcement -> tap an exam
+* view (admin): View Assignments -> subject, until every file was delivered
+* exam_delete (admin): Delete Exam -> number
+* broadcast (admin): Post Message -> text -> yes, until the broadcast completes
+
+Students play their flows concurrently; the admin's run one after another.
+With ``--workers`` above 1, phases that read what an earlier phase wrote on
+another worker (the new exam, the submitted files) first poll until the
+change feed has copied it to every worker that needs it.
+A flow's latency runs from its first update to the bot's last expected
+reply; API calls are every Bot API call made during the phase (getUpdates
+excluded) divided by the flows in it. ``--report`` saves the results as
+JSON and ``--compare`` prints the change against an earlier report.
+
+    python bench_flows.py --students 50 --latency 0.02 --report flows.json
+    python bench_flows.py --students 50 --latency 0.02 --compare flows.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import itertools
+import subprocess
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+
+from fakeapi import FakeBotApi
+
+TOKEN = "123:FLOWS"
+ADMIN = 999
+FIRST_STUDENT = 1001
+WARMUP_USER = 5000
+SUBJECT = "OOSAD"
+SETTLE = 0.3  # seconds to wait for trailing calls (admin notifications) after a phase
+PROBE_USER = 6000  # PROBE_USER + i is routed to worker i (user id modulo WORKERS)
+REPLICATION_POLL = 1.5  # seconds between probes; longer than the bot's 1 s duplicate-message window
+
+
+def replied(text):
+    return lambda call: text in call.text
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Driver:
+    """Sends updates as simulated users and waits for the bot's replies."""
+
+    def __init__(self, api, timeout):
+        self.api = api
+        self.timeout = timeout
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.file_ids = itertools.count(1)
+
+    def user(self, user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"Student {user_id}", "username": f"student{user_id}"}
+
+    async def _push(self, user_id, update, expect):
+        future = self.api.expect(lambda call: call.chat_id == user_id and expect(call))
+        self.api.push({"update_id": next(self.update_ids), **update})
+        return await asyncio.wait_for(future, self.timeout)
+
+    async def send(self, user_id, expect, **message):
+        """Send a message from ``user_id``; returns the first bot call to that chat matching ``expect``."""
+        message = {"message_id": next(self.message_ids), "date": int(time.time()),
+                   "chat": {"id": user_id, "type": "private"}, "from": self.user(user_id), **message}
+        return await self._push(user_id, {"message": message}, expect)
+
+    async def text(self, user_id, text, expect):
+        return await self.send(user_id, replied(expect), text=text)
+
+    async def command(self, user_id, command, expect):
+        entities = [{"type": "bot_command", "offset": 0, "length": len(command.split()[0])}]
+        return await self.send(user_id, replied(expect), text=command, entities=entities)
+
+    async def document(self, user_id, size, expect):
+        file_id = f"doc{next(self.file_ids)}"
+        self.api.add_file(file_id, size)
+        document = {"file_id": file_id, "file_unique_id": file_id, "file_name": f"{file_id}.pdf",
+                    "mime_type": "application/pdf", "file_size": size}
+        return await self.send(user_id, replied(expect), document=document)
+
+    async def press(self, user_id, reply, data, expect):
+        """Tap the inline button ``data`` under the message the bot sent in ``reply``."""
+        query = {"id": str(next(self.update_ids)), "from": self.user(user_id), "chat_instance": str(user_id),
+                 "data": data, "message": {**reply.result, "reply_markup": reply.params.get("reply_markup")}}
+        return await self._push(user_id, {"callback_query": query}, expect)
+
+
+async def flow_start(driver, user_id, args):
+    await driver.command(user_id, "/start", "Welcome")
+
+
+async def flow_submit(driver, user_id, args):
+    await driver.text(user_id, "Submit Individual Assignment", "select the subject")
+    await driver.text(user_id, SUBJECT, "You selected")
+    await driver.document(user_id, args.file_kb * 1024, "submitted successfully")
+
+
+async def flow_exam_add(driver, user_id, args):
+    await driver.text(user_id, "Add Exam Date", "Enter exam name")
+    await driver.text(user_id, f"Load test exam {next(driver.update_ids)}", "Enter exam date")
+    await driver.text(user_id, (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d"), "Enter exam time")
+    await driver.text(user_id, "09:00", "Enter exam content")
+    await driver.text(user_id, "Chapters 1-5", "Confirm")
+    await driver.text(user_id, "yes", "scheduled")
+
+
+async def flow_announcements(driver, user_id, args):
+    reply = await driver.text(user_id, "Exam Announcement", "Click on an exam")
+    data = reply.params["reply_markup"]["inline_keyboard"][0][0]["callback_data"]
+    await driver.press(user_id, reply, data, lambda call: call.method == "editMessageText")
+
+
+async def flow_view(driver, user_id, args):
+    await driver.text(user_id, "View Assignments", "Click on an the subject")
+    await driver.text(user_id, SUBJECT, "have been sent")
+
+
+async def flow_exam_delete(driver, user_id, args):
+    await driver.text(user_id, "Delete Exam", "exam number to delete")
+    await driver.text(user_id, "1", "Deleted exam")
+
+
+async def flow_broadcast(driver, user_id, args):
+    await driver.text(user_id, "Post Message", "Send the message")
+    await driver.text(user_id, "Load test announcement", "Preview")
+    await driver.text(user_id, "yes", "Broadcast complete")
+
+
+async def exams_replicated(driver, args, results):
+    """Every worker lists the exam added in the exam_add phase."""
+    async def lists_exams(user_id):
+        reply = await driver.send(user_id, lambda call: True, text="Exam Announcement")
+        return "Click on an exam" in reply.text
+
+    return [(user_id, lists_exams) for user_id in range(PROBE_USER, PROBE_USER + args.workers)]
+
+
+async def submissions_replicated(driver, args, results):
+    """The admin's worker has every file stored in the submit phase."""
+    stored = results["submit"]["flows"] - results["submit"]["failed"]
+
+    async def has_all(user_id):
+        reply = await driver.command(user_id, f"/find subject:{SUBJECT}", SUBJECT)
+        count = reply.text.split()[1]
+        return count.isdigit() and int(count) >= stored
+
+    return [(ADMIN, has_all)]
+
+
+async def wait_replicated(driver, probes, timeout):
+    """Poll each ``(user_id, probe)`` until the probe returns True; False if one never does in time."""
+    deadline = time.monotonic() + timeout
+    for user_id, probe in probes:
+        while not await probe(user_id):
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(REPLICATION_POLL)
+    return True
+
+
+# (name, played by the admin, flow, probes for the earlier phases' writes it reads when WORKERS > 1)
+PHASES = [
+    ("start", False, flow_start, None),
+    ("submit", False, flow_submit, None),
+    ("exam_add", True, flow_exam_add, None),
+    ("announcements", False, flow_announcements, exams_replicated),
+    ("view", True, flow_view, submissions_replicated),
+    ("exam_delete", True, flow_exam_delete, None),
+    ("broadcast", True, flow_broadcast, None),
+]
+
+
+async def run_phase(driver, flow, users, concurrent, args):
+    latencies, failed = [], 0
+    first_call = len(driver.api.calls)
+
+    async def play(user_id):
+        nonlocal failed
+        started = time.perf_counter()
+        try:
+            await flow(driver, user_id, args)
+            latencies.append(time.perf_counter() - started)
+        except (asyncio.TimeoutError, KeyError, IndexError):
+            failed += 1
+
+    started = time.perf_counter()
+    if concurrent:
+        await asyncio.gather(*(play(user_id) for user_id in users))
+    else:
+        for user_id in users:
+            await play(user_id)
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(SETTLE)
+
+    methods = Counter(call.method for call in driver.api.calls[first_call:])
+    flows = len(users)
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+    return {
+        "flows": flows, "failed": failed, "seconds": round(elapsed, 3),
+        "flows_per_s": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(pct(0.50), 1), "p99_ms": round(pct(0.99), 1),
+        "api_calls": round(sum(methods.values()) / flows, 2),
+        "methods": {method: round(count / flows, 2) for method, count in methods.most_common()},
+    }
+
+
+def start_bot(directory, api_port, args):
+    env = dict(os.environ, BOT_TOKEN=TOKEN, ADMIN_ID=str(ADMIN), BOT_API_URL=f"http://127.0.0.1:{api_port}",
+               BOT_MODE="polling", STORAGE_BACKEND="sqlite", DB_PATH=os.path.join(directory, "bot.db"),
+               PORT=str(free_port()), WORKERS=str(args.workers), CONCURRENT_UPDATES=str(args.concurrent_updates),
+               DELIVERY_MODE="album", PYTHONUNBUFFERED="1")
+    log = open(os.path.join(directory, "bot.log"), "w")
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "is_ass.py")
+    return subprocess.Popen([sys.executable, script], env=env, cwd=directory, stdout=log, stderr=subprocess.STDOUT)
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results):
+    print(f"{'flow':14} {'flows':>6} {'failed':>6} {'flows/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'api/flow':>9}")
+    for name, r in results.items():
+        print(f"{name:14} {r['flows']:>6} {r['failed']:>6} {r['flows_per_s']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['api_calls']:>9.2f}")
+
+
+def print_comparison(old, new):
+    print(f"\ncompared with {old['version']} ({old['created']}):")
+    print(f"{'flow':14} {'flows/s':>16} {'p50 ms':>18} {'p99 ms':>18} {'api/flow':>14}")
+    change = lambda a, b: f"{a:.1f}->{b:.1f}"
+    for name, r in new["flows"].items():
+        o = old["flows"].get(name)
+        if o is None:
+            continue
+        print(f"{name:14} {change(o['flows_per_s'], r['flows_per_s']):>16} {change(o['p50_ms'], r['p50_ms']):>18} "
+              f"{change(o['p99_ms'], r['p99_ms']):>18} {change(o['api_calls'], r['api_calls']):>14}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--admin-rounds", type=int, default=3, help="times each admin flow is played")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per fake Bot API call")
+    parser.add_argument("--file-kb", type=int, default=64, help="size of each submitted document")
+    parser.add_argument("--workers", type=int, default=1, help="WORKERS for the bot (>1: router + worker processes)")
+    parser.add_argument("--concurrent-updates", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for each reply")
+    parser.add_argument("--report", help="save the results as JSON")
+    parser.add_argument("--compare", help="an earlier --report to compare with")
+    args = parser.parse_args()
+
+    api = FakeBotApi(TOKEN, latency=args.latency)
+    api_port = await api.start()
+    driver = Driver(api, args.timeout)
+    students = list(range(FIRST_STUDENT, FIRST_STUDENT + args.students))
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        bot = start_bot(directory, api_port, args)
+        try:
+            try:
+                await driver.command(WARMUP_USER, "/start", "Welcome")
+            except asyncio.TimeoutError:
+                with open(os.path.join(directory, "bot.log")) as log:
+                    print(log.read()[-2000:])
+                raise SystemExit("the bot did not answer; see its log above")
+            for name, admin, flow, replicated in PHASES:
+                if replicated is not None and args.workers > 1:
+                    probes = await replicated(driver, args, results)
+                    if not await wait_replicated(driver, probes, args.timeout):
+                        print(f"⚠️ {name}: earlier writes did not reach every worker within {args.timeout:.0f}s")
+                users = [ADMIN] * args.admin_rounds if admin else students
+                results[name] = await run_phase(driver, flow, users, not admin, args)
+        finally:
+            bot.terminate()
+            await asyncio.to_thread(bot.wait)
+            await api.stop()
+
+    report = {
+        "version": git_version(), "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "cores": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("report", "compare")},
+        "flows": results,
+    }
+    print(f"bot {report['version']}  students: {args.students}  API latency: {args.latency * 1000:.0f} ms  "
+          f"workers: {args.workers}")
+    print_results(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return all(r["failed"] == 0 for r in results.values())
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,90 @@
+"""Inline listing cost vs listing size: one button per item vs one fixed-size page.
+
+Measures building the Manage Files keyboard and its serialized payload for a
+student with N submissions, and resolving a tapped button back to its record.
+
+    python bench_pagination.py --sizes 10 100 1000 10000
+"""
+import json
+import time
+import argparse
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from render import PAGE_SIZE, page_markup
+from submissions import SubmissionStore
+
+SUBMITTER = "student1"
+
+
+class MemoryStorage:
+    def load_submissions(self):
+        return []
+
+    def add_submission(self, record):
+        pass
+
+    def delete_submission(self, submission_id):
+        pass
+
+
+class NoPersistence:
+    def submit(self, fn, *args):
+        pass
+
+
+def old_markup(store):
+    keyboard = [[InlineKeyboardButton(f"📂 {file['file_name']}", callback_data=f"delete_{i}")]
+                for i, file in enumerate(store.by_submitter(SUBMITTER))]
+    keyboard.append([InlineKeyboardButton("Exit", callback_data="exit_manage_files")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def old_resolve(store, data):
+    return store.by_submitter(SUBMITTER)[int(data.split("_")[1])]
+
+
+def new_markup(store, offset):
+    return page_markup(store.iter_by("submitted_by", SUBMITTER), offset, store.count("submitted_by", SUBMITTER),
+                       lambda file: (f"📂 {file['file_name']}", f"delete_{file['id']}"), "files_",
+                       extra_rows=[[InlineKeyboardButton("Exit", callback_data="exit_manage_files")]])
+
+
+def new_resolve(store, data):
+    return store.get(int(data.split("_")[1]))
+
+
+def per_call_us(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"page size: {PAGE_SIZE}")
+    print(f"{'files':>7} {'old us':>9} {'old bytes':>10} {'page us':>8} {'page bytes':>11} "
+          f"{'old resolve us':>15} {'new resolve us':>15}")
+    for size in args.sizes:
+        store = SubmissionStore(MemoryStorage(), NoPersistence())
+        for i in range(size):
+            store.add({"file_name": f"assignment_{i:05}.pdf", "file_id": f"f{i}", "submitted_by": SUBMITTER,
+                       "subject": "OOSAD", "submission_date": "2025-01-01"})
+        middle = size // 2 // PAGE_SIZE * PAGE_SIZE
+        old_bytes = len(json.dumps(old_markup(store).to_dict()))
+        new_bytes = len(json.dumps(new_markup(store, middle).to_dict()))
+        last = f"delete_{size - 1}"
+        last_id = f"delete_{store.by_submitter(SUBMITTER)[-1]['id']}"
+        print(f"{size:>7} {per_call_us(lambda: old_markup(store), args.rounds):>9.1f} {old_bytes:>10} "
+              f"{per_call_us(lambda: new_markup(store, middle), args.rounds):>8.1f} {new_bytes:>11} "
+              f"{per_call_us(lambda: old_resolve(store, last), args.rounds):>15.2f} "
+              f"{per_call_us(lambda: new_resolve(store, last_id), args.rounds):>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
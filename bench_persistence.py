@@ -0,0 +1,69 @@
+"""Event-loop lag during a submission burst, with and without PersistenceService.
+
+    python bench_persistence.py --backend json --history 20000 --burst 200
+"""
+import time
+import asyncio
+import argparse
+import tempfile
+
+from persistence import PersistenceService
+from bench_storage import make_record, prepare
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe_lag(samples, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+async def burst(store, size, count, spacing, use_service):
+    """Simulate ``count`` uploads arriving ``spacing`` seconds apart."""
+    service = PersistenceService(store) if use_service else None
+    if service:
+        service.start()
+    samples, stop = [], asyncio.Event()
+    probe = asyncio.create_task(probe_lag(samples, stop))
+    started = time.perf_counter()
+    for i in range(count):
+        record = make_record(size + i)
+        if service:
+            service.submit(store.add_submission, record)
+        else:
+            store.add_submission(record)
+        await asyncio.sleep(spacing)
+    if service:
+        await service.close()
+    else:
+        store.close()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99)] if samples else 0.0
+    flushes = service.flushes if service else count
+    return elapsed, p99 * 1000, (samples[-1] if samples else 0.0) * 1000, flushes
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--history", type=int, default=20000, help="submissions already stored")
+    parser.add_argument("--burst", type=int, default=200, help="uploads in the burst")
+    parser.add_argument("--spacing", type=float, default=0.002, help="seconds between uploads")
+    args = parser.parse_args()
+
+    print(f"{'mode':10} {'elapsed s':>10} {'lag p99 ms':>11} {'lag max ms':>11} {'writes':>7}")
+    for label, use_service in (("inline", False), ("service", True)):
+        with tempfile.TemporaryDirectory() as directory:
+            store = prepare(args.backend, directory, args.history)
+            elapsed, p99, worst, writes = await burst(store, args.history, args.burst, args.spacing, use_service)
+        print(f"{label:10} {elapsed:>10.2f} {p99:>11.2f} {worst:>11.2f} {writes:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
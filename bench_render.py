@@ -0,0 +1,77 @@
+"""Render cost per request: rebuilding menus, exam lists and escaping vs the render cache.
+
+    python bench_render.py --rounds 20000 --exams 20
+"""
+import time
+import argparse
+
+from telegram import ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
+
+from render import RenderCache, escape_markdown_v2, main_menu, exam_list_text, exam_buttons
+
+
+def old_escape(text):
+    special_chars = r"_*[]()~`>#+-=|{}.!"
+    return "".join(f"\\{char}" if char in special_chars else char for char in text)
+
+
+def old_menu(is_admin):
+    keyboard = [
+        ["Exam Announcement", "View Assignments"] if is_admin else ["Submit Group Assignment", "Submit Individual Assignment"],
+        ["Add Exam Date", "Delete Exam"] if is_admin else ["Exam Announcement"],
+        ["Post Message", "Buy me coffee"] if is_admin else ["Manage Files", "Buy me coffee"]
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+
+def old_exam_list(exams):
+    msg = "\n".join([f"{i+1}. {e['name']} - {e['date']} {e['time']} (ID: {e['id'][:6]})" for i, e in enumerate(exams)])
+    return f"📚 Exams:\n{msg}"
+
+
+def old_exam_buttons(exams):
+    return InlineKeyboardMarkup([[InlineKeyboardButton(f"📚 {exam['name']}", callback_data=f"exam_{i}")]
+                                 for i, exam in enumerate(exams)])
+
+
+def per_call_us(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--exams", type=int, default=20)
+    args = parser.parse_args()
+
+    exams = [{"id": f"{i:08x}-exam", "name": f"Exam {i}", "date": "2025-06-01", "time": "09:00",
+              "content": "Chapters 1-5"} for i in range(args.exams)]
+    name = "Abebe_K. (IS-3)"
+    cache = RenderCache()
+    assert escape_markdown_v2(name) == old_escape(name)
+    assert main_menu(cache, True).to_dict() == old_menu(True).to_dict()
+    assert main_menu(cache, False).to_dict() == old_menu(False).to_dict()
+
+    cases = [
+        ("escape first name", lambda: old_escape(name), lambda: escape_markdown_v2(name)),
+        ("main menu keyboard", lambda: old_menu(False), lambda: main_menu(cache, False)),
+        (f"exam list text ({args.exams})", lambda: old_exam_list(exams), lambda: exam_list_text(cache, exams)),
+        (f"exam buttons ({args.exams})", lambda: old_exam_buttons(exams), lambda: exam_buttons(cache, exams)),
+    ]
+    print(f"{'render':28} {'old us':>8} {'cached us':>10}")
+    for label, old, new in cases:
+        print(f"{label:28} {per_call_us(old, args.rounds):>8.2f} {per_call_us(new, args.rounds):>10.2f}")
+
+    # Worst case for the cache: the exam list changes before every view.
+    def invalidated():
+        cache.invalidate("exams")
+        return exam_buttons(cache, exams)
+    print(f"{'exam buttons, invalidated':28} {'':>8} {per_call_us(invalidated, args.rounds):>10.2f}")
+    print(f"cache: {cache.hits} hits, {cache.misses} misses, {len(cache)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Search latency over the submission history: inverted index vs a full scan.
+
+Builds a ``SubmissionStore`` with ``--records`` synthetic submissions, indexes
+it with ``search.SearchIndex`` and times typical /find queries: the query
+plus its first results page uncached, a cached page, and keeping the index
+up to date on add/delete.
+
+    python bench_search.py --records 100000
+"""
+import time
+import random
+import argparse
+import statistics
+from datetime import date, timedelta
+
+from render import page_markup
+from search import SearchIndex, parse_query, words
+from submissions import SubmissionStore
+from bench_pagination import MemoryStorage, NoPersistence
+
+SUBJECTS = ["Internet programming(IP)", "Information security", "Networking", "Ecommerce", "OOSAD", "Mobile computing"]
+KINDS = ["lab", "report", "assignment", "project", "homework", "group", "final", "draft"]
+
+QUERIES = [
+    "by:student0042",
+    "student00",
+    "lab report",
+    "subject:oosad",
+    "networking 2025-03",
+    "2025-02-01..2025-02-14",
+    "final project by:student01",
+    "zzz",
+]
+
+
+def make_records(count, rng):
+    start = date(2025, 1, 1)
+    for i in range(count):
+        yield {"file_name": f"{rng.choice(KINDS)}_{rng.choice(KINDS)}_{i}.pdf", "file_id": f"f{i}",
+               "submitted_by": f"student{rng.randrange(2000):04}", "subject": rng.choice(SUBJECTS),
+               "submission_date": (start + timedelta(days=rng.randrange(180))).isoformat()}
+
+
+def scan(store, text):
+    """The alternative without an index: test every record against the parsed query."""
+    terms, dates = parse_query(text)
+    fields = {None: ("file_name", "submitted_by", "subject"), "file_name": ("file_name",),
+              "submitted_by": ("submitted_by",), "subject": ("subject",)}
+    matches = []
+    for record in store:
+        if dates and not dates[0] <= record["submission_date"] <= dates[1]:
+            continue
+        if all(any(word.startswith(prefix) for f in fields[field] for word in words(record[f]))
+               for field, prefix in terms):
+            matches.append(record["id"])
+    return sorted(matches, reverse=True)
+
+
+def timings(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return statistics.median(samples) * 1e3, samples[int(len(samples) * 0.99)] * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--scan-rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    store = SubmissionStore(MemoryStorage(), NoPersistence())
+    for record in make_records(args.records, rng):
+        store.add(record)
+    started = time.perf_counter()
+    index = SearchIndex(store)
+    print(f"records: {len(store)}  index build: {time.perf_counter() - started:.2f} s")
+
+    print(f"{'query':30} {'hits':>7} {'index p50 ms':>13} {'p99 ms':>8} {'cached ms':>10} {'scan ms':>9}")
+    button = lambda sid: (store.get(sid)["file_name"], f"found_{sid}")
+    for text in QUERIES:
+        ids = index.search(text)
+        assert list(ids) == scan(store, text) and len(ids) == len(list(ids)), text
+
+        def first_page():
+            ids = index.search(text)
+            return page_markup(ids, 0, len(ids), button, "find_")
+
+        def uncached():
+            index.cached = (None, None, None)
+            return first_page()
+
+        p50, p99 = timings(uncached, args.rounds)
+        page, _ = timings(first_page, args.rounds)
+        scan_ms, _ = timings(lambda: scan(store, text), args.scan_rounds)
+        print(f"{text:30} {len(ids):>7} {p50:>13.3f} {p99:>8.3f} {page:>10.3f} {scan_ms:>9.1f}")
+
+    new = list(make_records(1000, rng))
+    started = time.perf_counter()
+    added = [store.add(record) for record in new]
+    add_us = (time.perf_counter() - started) / len(new) * 1e6
+    started = time.perf_counter()
+    for record in added:
+        store.remove(record["id"])
+    delete_us = (time.perf_counter() - started) / len(new) * 1e6
+    print(f"\nwith the index attached: {add_us:.1f} us per add, {delete_us:.1f} us per delete")
+
+
+if __name__ == "__main__":
+    main()
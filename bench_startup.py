@@ -0,0 +1,106 @@
+"""Cold-start time: from process launch to the first handled update.
+
+Launches the bot in a fresh interpreter (fake token, temporary working
+directory and database seeded with ``--submissions`` records), builds it with
+``is_ass.create_app`` against a local fake Bot API, and processes one
+``/start`` update. Reports when the import, the factory, the first reply and
+the background load of the submission history finished, measured from just
+before the process was launched. ``--eager`` loads the history before the
+first update, as the bot did before lazy loading.
+
+    python bench_startup.py --submissions 0 10000 100000 --runs 3
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+ADMIN = 999
+
+
+async def child():
+    launched = float(os.environ["BENCH_LAUNCHED"])
+    since = lambda: time.time() - launched
+    marks = {"started": since()}
+
+    import is_ass
+    marks["imported"] = since()
+
+    from telegram import Update
+    from bench_webhook import FakeRequest, make_update
+
+    app = is_ass.create_app(request=FakeRequest())
+    marks["app built"] = since()
+    await app.initialize()
+    await app.post_init(app)
+    if os.environ.get("BENCH_EAGER"):
+        await is_ass.submitted_files.preload()
+    marks["initialized"] = since()
+
+    data = make_update(1, ADMIN)
+    data["message"]["text"] = "/start"
+    data["message"]["entities"] = [{"type": "bot_command", "offset": 0, "length": 6}]
+    await app.process_update(Update.de_json(data, app.bot))
+    marks["first update"] = since()
+
+    while not is_ass.submitted_files.loaded:
+        await asyncio.sleep(0.005)
+    marks["history loaded"] = since()
+
+    await app.shutdown()
+    await app.post_shutdown(app)
+    print(json.dumps(marks))
+
+
+def seed(directory, count):
+    from storage import SqliteStorage
+    store = SqliteStorage(os.path.join(directory, "bot.db"), migrate_from=None)
+    with store.batch():
+        store.import_submissions({"id": i, "file_name": f"assignment_{i}.pdf", "file_id": f"f{i}",
+                                  "file_unique_id": f"u{i}", "submitted_by": f"student{i % 500}",
+                                  "subject": "OOSAD", "submission_date": "2025-01-01", "size": 1000}
+                                 for i in range(1, count + 1))
+    store.close()
+
+
+def launch(directory, eager):
+    env = dict(os.environ, BENCH_CHILD="1", BENCH_LAUNCHED=repr(time.time()), BOT_TOKEN="123:STARTUP",
+               ADMIN_ID=str(ADMIN), DB_PATH=os.path.join(directory, "bot.db"), STORAGE_BACKEND="sqlite",
+               BOT_MODE="polling", WORKERS="1", PORT="0", PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    if eager:
+        env["BENCH_EAGER"] = "1"
+    result = subprocess.run([sys.executable, os.path.abspath(__file__)], env=env, cwd=directory,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--submissions", type=int, nargs="+", default=[0, 10000, 100000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--eager", action="store_true", help="load the submission history before the first update")
+    args = parser.parse_args()
+
+    columns = ["imported", "app built", "initialized", "first update", "history loaded"]
+    print(f"times in ms since launch, median of {args.runs} runs{' (eager)' if args.eager else ''}")
+    print(f"{'submissions':>11} " + " ".join(f"{name:>14}" for name in columns))
+    for count in args.submissions:
+        runs = []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as directory:
+                seed(directory, count)
+                runs.append(launch(directory, args.eager))
+        print(f"{count:>11} " + " ".join(f"{statistics.median(run[name] for run in runs) * 1000:>14.0f}"
+                                         for name in columns))
+
+
+if __name__ == "__main__":
+    if os.environ.get("BENCH_CHILD"):
+        asyncio.run(child())
+    else:
+        main()
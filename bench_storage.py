@@ -0,0 +1,76 @@
+"""Per-operation latency of JsonStorage vs SqliteStorage as the submission history grows.
+
+    python bench_storage.py --sizes 1000 10000 100000 --ops 20
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from storage import JsonStorage, SqliteStorage, SUBMITTED_FILES_FILE, write_json
+
+SUBJECTS = ["Internet programming(IP)", "Information security", "Networking", "Ecommerce", "OOSAD", "Mobile computing"]
+
+
+def make_record(i):
+    return {
+        "id": i + 1,
+        "file_name": f"assignment_{i}.pdf",
+        "file_id": f"BQACAgQAAxkBAAI{i:08d}",
+        "submitted_by": f"student{i % 500}",
+        "subject": SUBJECTS[i % len(SUBJECTS)],
+        "submission_date": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+    }
+
+
+def prepare(backend, directory, size):
+    records = [make_record(i) for i in range(size)]
+    if backend == "json":
+        write_json(os.path.join(directory, SUBMITTED_FILES_FILE), records)
+        return JsonStorage(directory)
+    store = SqliteStorage(os.path.join(directory, "bench.db"), migrate_from=None)
+    with store.batch():
+        store.import_submissions(records)
+    return store
+
+
+def timed(fn, ops):
+    samples = []
+    for i in range(ops):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, samples[-1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--ops", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'backend':8} {'size':>8} {'insert p50/max ms':>20} {'delete p50/max ms':>20} {'load ms':>10}")
+    for size in args.sizes:
+        for backend in ("json", "sqlite"):
+            with tempfile.TemporaryDirectory() as directory:
+                store = prepare(backend, directory, size)
+                added = []
+
+                def insert(i):
+                    record = make_record(size + i)
+                    store.add_submission(record)
+                    added.append(record)
+
+                insert_ms = timed(insert, args.ops)
+                delete_ms = timed(lambda i: store.delete_submission(added[i]["id"]), args.ops)
+                start = time.perf_counter()
+                store.load_submissions()
+                load_ms = (time.perf_counter() - start) * 1000
+                store.close()
+            print(f"{backend:8} {size:>8} {insert_ms[0]:>9.3f}/{insert_ms[1]:<10.3f} "
+                  f"{delete_ms[0]:>9.3f}/{delete_ms[1]:<10.3f} {load_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Lookup/delete cost of the indexed SubmissionStore vs scanning a plain list.
+
+    python bench_submissions.py --sizes 10000 100000 1000000
+"""
+import time
+import argparse
+
+from submissions import SubmissionStore
+from bench_storage import make_record
+
+
+class MemoryStorage:
+    def __init__(self, records):
+        self.records = records
+
+    def load_submissions(self):
+        return self.records
+
+    def add_submission(self, record):
+        pass
+
+    def delete_submission(self, submission_id):
+        pass
+
+
+class NoPersistence:
+    def submit(self, fn, *args):
+        pass
+
+
+def per_op_us(fn, ops):
+    start = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    return (time.perf_counter() - start) / ops * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--ops", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'operation':12} {'list scan us':>14} {'indexed us':>12}")
+    for size in args.sizes:
+        records = [make_record(i) for i in range(size)]
+        plain = [dict(record) for record in records]
+        store = SubmissionStore(MemoryStorage(records), NoPersistence())
+        subjects = sorted({record["subject"] for record in records})
+        submitters = [f"student{i}" for i in range(args.ops)]
+        dates = [f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}" for i in range(args.ops)]
+
+        cases = [
+            ("by_subject",
+             lambda i: [r for r in plain if r.get("subject") == subjects[i % len(subjects)]],
+             lambda i: store.by_subject(subjects[i % len(subjects)])),
+            ("by_date",
+             lambda i: [r for r in plain if r.get("submission_date") == dates[i]],
+             lambda i: store.by_date(dates[i])),
+            ("by_submitter",
+             lambda i: [r for r in plain if r.get("submitted_by") == submitters[i]],
+             lambda i: store.by_submitter(submitters[i])),
+            ("delete",
+             lambda i: plain.remove(next(r for r in plain if r["id"] == size - i)),
+             lambda i: store.remove(size - i)),
+        ]
+        for name, scan, indexed in cases:
+            print(f"{size:>8} {name:12} {per_op_us(scan, args.ops):>14.1f} {per_op_us(indexed, args.ops):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
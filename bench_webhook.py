@@ -0,0 +1,117 @@
+"""Load-test the webhook server: POST synthetic Update JSON and measure updates/sec and latency.
+
+Updates are processed by a real python-telegram-bot Application whose Bot API
+calls are answered locally (after ``--api-latency`` seconds) instead of by Telegram.
+
+    python bench_webhook.py --updates 5000 --connections 50
+"""
+import json
+import time
+import asyncio
+import argparse
+
+import httpx
+from telegram import Update
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+from telegram.request import BaseRequest
+
+from webserver import WebServer
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class FakeRequest(BaseRequest):
+    """Answers every Bot API method locally; enough for getMe and sendMessage."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.message_id = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        endpoint = url.rsplit("/", 1)[-1]
+        if endpoint == "getMe":
+            result = BOT_USER
+        elif endpoint == "sendMessage":
+            self.message_id += 1
+            params = request_data.parameters if request_data else {}
+            result = {"message_id": self.message_id, "date": int(time.time()), "from": BOT_USER,
+                      "chat": {"id": params.get("chat_id"), "type": "private"}, "text": params.get("text", "")}
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def make_update(update_id, user_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Student", "username": f"student{user_id}"},
+            "text": "Buy me coffee",
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="seconds per fake Bot API call")
+    args = parser.parse_args()
+
+    app = ApplicationBuilder().token("123:BENCH").request(FakeRequest(args.api_latency)).updater(None).build()
+    handled = {}
+
+    async def reply(update, context):
+        await update.message.reply_text("Buy me coffee? @kipa_s 😁😁")
+        handled[update.update_id] = time.perf_counter()
+
+    app.add_handler(MessageHandler(filters.TEXT, reply))
+    await app.initialize()
+
+    async def on_update(data):
+        # Process inline so the HTTP response time covers the whole handler.
+        await app.process_update(Update.de_json(data, app.bot))
+
+    server = WebServer(on_update, lambda: True, lambda: "", host="127.0.0.1", port=0, webhook_path="/webhook")
+    port = await server.start()
+    url = f"http://127.0.0.1:{port}/webhook"
+
+    latencies = []
+    counter = iter(range(1, args.updates + 1))
+
+    async def client():
+        async with httpx.AsyncClient() as http:
+            for update_id in counter:
+                payload = make_update(update_id, 1000 + update_id % 500)
+                start = time.perf_counter()
+                response = await http.post(url, json=payload)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.connections)))
+    elapsed = time.perf_counter() - started
+    await server.stop()
+    await app.shutdown()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f"updates: {len(latencies)}  handled: {len(handled)}  connections: {args.connections}")
+    print(f"throughput: {len(latencies) / elapsed:.0f} updates/s")
+    print(f"latency p50: {pct(0.50):.2f} ms  p99: {pct(0.99):.2f} ms  max: {latencies[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from collections import Counter
+from datetime import datetime
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+# Telegram allows roughly 30 messages/second across all chats and about one
+# message/second into the same chat.
+GLOBAL_RATE = 30
+PER_CHAT_RATE = 1
+MAX_RETRIES = 3
+CONCURRENCY = 20
+PROGRESS_INTERVAL = 5  # seconds between progress reports to the admin
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursts of up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        """Stop handing out tokens for ``seconds`` (used for flood-control backoff)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BroadcastStats:
+    def __init__(self, total):
+        self.total = total
+        self.sent = 0
+        self.retries = 0
+        self.errors = Counter()
+        self.started = time.monotonic()
+        self.finished = None
+
+    @property
+    def failed(self):
+        return sum(self.errors.values())
+
+    @property
+    def done(self):
+        return self.sent + self.failed
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self):
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        lines = [
+            f"Sent: {self.sent}/{self.total}",
+            f"Failed: {self.failed}",
+            f"Retries: {self.retries}",
+            f"Throughput: {self.rate:.1f} msg/s over {self.elapsed:.1f}s",
+        ]
+        for error, count in self.errors.most_common():
+            lines.append(f"  • {error}: {count}")
+        return "\n".join(lines)
+
+
+class Broadcaster:
+    """Sends one text to many chats concurrently while staying inside Telegram's limits.
+
+    ``on_progress`` is awaited with the running :class:`BroadcastStats` every
+    ``progress_interval`` seconds, and ``on_result`` with ``(chat_id, error)``
+    after every recipient is settled (``error`` is ``None`` on success).
+    """
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, per_chat_rate=PER_CHAT_RATE,
+                 concurrency=CONCURRENCY, max_retries=MAX_RETRIES):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.chat_buckets = {}
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, 1)
+        return bucket
+
+    async def _send(self, chat_id, text, stats):
+        for attempt in range(self.max_retries + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                return None
+            except RetryAfter as e:
+                # Flood control applies to the whole bot, so everyone backs off.
+                self.global_bucket.pause(e.retry_after)
+                error = e
+            except (Forbidden, BadRequest) as e:
+                return e
+            except (TimedOut, NetworkError) as e:
+                await asyncio.sleep(min(2 ** attempt, 30))
+                error = e
+            if attempt < self.max_retries:
+                stats.retries += 1
+        return error
+
+    async def run(self, chat_ids, text, on_progress=None, on_result=None,
+                  progress_interval=PROGRESS_INTERVAL):
+        chat_ids = list(chat_ids)
+        stats = BroadcastStats(len(chat_ids))
+        queue = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait(chat_id)
+
+        async def worker():
+            while True:
+                try:
+                    chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    error = await self._send(chat_id, text, stats)
+                except Exception as e:
+                    error = e
+                if error is None:
+                    stats.sent += 1
+                else:
+                    stats.errors[type(error).__name__] += 1
+                if on_result is not None:
+                    await on_result(chat_id, error)
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(progress_interval)
+                await on_progress(stats)
+
+        progress_task = asyncio.create_task(reporter()) if on_progress else None
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(chat_ids)) or 1)))
+        finally:
+            stats.finished = time.monotonic()
+            if progress_task:
+                progress_task.cancel()
+        return stats
+
+
+# === Durable broadcast jobs ===
+JOBS_DIR = "broadcast_jobs"
+DELIVERED = "ok"
+DEAD = "dead"
+
+
+def is_dead_recipient(error):
+    """True for errors that mean the chat will never accept messages from the bot again."""
+    if isinstance(error, Forbidden):
+        return True
+    return isinstance(error, BadRequest) and "chat not found" in error.message.lower()
+
+
+class BroadcastJob:
+    """A broadcast persisted as ``{id}.json`` (metadata) plus ``{id}.log``.
+
+    The log gets one ``chat_id<TAB>outcome`` line per settled recipient, so a
+    restarted job only sends to chats that have no line yet. Both files are
+    deleted when the job finishes (the admin has the summary by then).
+    """
+
+    def __init__(self, job_id, text, chat_ids, admin_chat_id, status_message_id=None,
+                 created_at=None, status="running"):
+        self.id = job_id
+        self.text = text
+        self.chat_ids = chat_ids
+        self.admin_chat_id = admin_chat_id
+        self.status_message_id = status_message_id
+        self.created_at = created_at or datetime.now().isoformat(timespec="seconds")
+        self.status = status
+        self.outcomes = {}
+
+    @property
+    def meta_path(self):
+        return os.path.join(JOBS_DIR, f"{self.id}.json")
+
+    @property
+    def log_path(self):
+        return os.path.join(JOBS_DIR, f"{self.id}.log")
+
+    @classmethod
+    def create(cls, text, chat_ids, admin_chat_id, status_message_id=None):
+        job = cls(uuid.uuid4().hex, text, list(chat_ids), admin_chat_id, status_message_id)
+        job.save()
+        return job
+
+    @classmethod
+    def load(cls, job_id):
+        with open(os.path.join(JOBS_DIR, f"{job_id}.json"), "r") as f:
+            job = cls(**json.load(f))
+        if job.status != "done":
+            job.load_outcomes()
+        return job
+
+    def load_outcomes(self):
+        try:
+            with open(self.log_path, "r") as f:
+                for line in f:
+                    chat_id, _, outcome = line.rstrip("\n").partition("\t")
+                    if outcome:
+                        self.outcomes[int(chat_id)] = outcome
+        except FileNotFoundError:
+            pass
+
+    def save(self):
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "job_id": self.id,
+                "text": self.text,
+                "chat_ids": self.chat_ids,
+                "admin_chat_id": self.admin_chat_id,
+                "status_message_id": self.status_message_id,
+                "created_at": self.created_at,
+                "status": self.status,
+            }, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def pending(self):
+        return [chat_id for chat_id in self.chat_ids if chat_id not in self.outcomes]
+
+    def delivered(self):
+        return sum(1 for outcome in self.outcomes.values() if outcome == DELIVERED)
+
+    def dead_recipients(self):
+        return {chat_id for chat_id, outcome in self.outcomes.items() if outcome == DEAD}
+
+    async def record(self, chat_id, error):
+        if error is None:
+            outcome = DELIVERED
+        elif is_dead_recipient(error):
+            outcome = DEAD
+        else:
+            outcome = type(error).__name__
+        self.outcomes[chat_id] = outcome
+        await asyncio.to_thread(self._append_log, f"{chat_id}\t{outcome}\n")
+
+    def _append_log(self, line):
+        with open(self.log_path, "a") as f:
+            f.write(line)
+
+    def finish(self):
+        self.status = "done"
+        self.delete()
+
+    def delete(self):
+        for path in (self.meta_path, self.log_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def load_unfinished_jobs():
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    jobs = []
+    for name in sorted(os.listdir(JOBS_DIR)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            job = BroadcastJob.load(name[:-len(".json")])
+        except (OSError, ValueError, TypeError):
+            continue
+        if job.status == "done":
+            job.delete()  # finished before jobs were deleted on completion
+        else:
+            jobs.append(job)
+    return jobs
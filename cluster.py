@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import subprocess
+
+import httpx
+from telegram import Update
+from telegram.error import RetryAfter
+from telegram.ext import BasePersistence, PersistenceInput
+
+FORWARD_PATH = "/update"
+FORWARD_RETRIES = 8
+ROUTER_QUEUE_SIZE = 1000
+POLL_TIMEOUT = 30
+MAX_POLL_BACKOFF = 60  # longest wait between failed getUpdates calls
+STATE_FLUSH_INTERVAL = 5  # seconds between conversation-state writes
+CHANGE_POLL_INTERVAL = 1.0
+CHANGE_LOG_MAX_AGE = 3600
+CHANGE_PRUNE_INTERVAL = 600
+
+
+def update_user_id(data):
+    """The sender of a raw update dict (or its chat, for channel posts); None if it has neither."""
+    for value in data.values():
+        if isinstance(value, dict):
+            for field in ("from", "user", "chat"):
+                owner = value.get(field)
+                if isinstance(owner, dict) and "id" in owner:
+                    return owner["id"]
+    return None
+
+
+def partition(user_id, workers):
+    return user_id % workers if user_id is not None else 0
+
+
+class StatePersistence(BasePersistence):
+    """Keeps ``context.user_data`` (conversation state, drafts) in the bot's storage.
+
+    Only user data is stored. Writes go through the write-behind
+    ``PersistenceService`` and are skipped when a user's data has not changed
+    since it was last saved. ``owns(user_id)`` limits loading to the users
+    routed to this worker.
+    """
+
+    def __init__(self, storage, persistence, owns=None, update_interval=STATE_FLUSH_INTERVAL):
+        super().__init__(PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+                         update_interval)
+        self.storage = storage
+        self.persistence = persistence
+        self.owns = owns or (lambda user_id: True)
+        self.saved = {}
+
+    async def get_user_data(self):
+        states = await self.persistence.run(self.storage.load_user_states)
+        states = {uid: data for uid, data in states.items() if self.owns(uid)}
+        self.saved = {uid: json.dumps(data, sort_keys=True) for uid, data in states.items()}
+        return states
+
+    async def update_user_data(self, user_id, data):
+        encoded = json.dumps(data, sort_keys=True)
+        if self.saved.get(user_id, "{}") == encoded:
+            return
+        self.saved[user_id] = encoded
+        self.persistence.submit(self.storage.save_user_states, {user_id: data})
+
+    async def drop_user_data(self, user_id):
+        self.saved.pop(user_id, None)
+        self.persistence.submit(self.storage.save_user_states, {user_id: {}})
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass  # each user is served by one worker, whose copy is always current
+
+    async def get_chat_data(self):
+        return {}
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def get_bot_data(self):
+        return {}
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def flush(self):
+        await self.persistence.flush()
+
+
+class ChangeFeed:
+    """Applies the other workers' writes to this worker's in-memory copies.
+
+    Tails the storage change log every ``interval`` seconds. For each changed
+    key the current row is re-read and handed to the collection's
+    ``apply(key, record)`` (``record`` is None when the row was deleted);
+    changes made by this worker are skipped.
+    """
+
+    def __init__(self, storage, persistence, interval=CHANGE_POLL_INTERVAL):
+        self.storage = storage
+        self.persistence = persistence
+        self.interval = interval
+        self.handlers = {}
+        self.seq = storage.last_change()
+        self.applied = 0
+
+    def on(self, collection, get, apply, key=str):
+        self.handlers[collection] = (get, apply, key)
+
+    async def poll(self):
+        changes = await self.persistence.run(self.storage.changes_since, self.seq)
+        keys = {}
+        for seq, collection, key, worker in changes:
+            self.seq = seq
+            if worker != self.storage.worker and collection in self.handlers:
+                keys[(collection, key)] = None  # latest row wins, one reload per key
+        for collection, key in keys:
+            get, apply, convert = self.handlers[collection]
+            key = convert(key)
+            record = await self.persistence.run(get, key)
+            result = apply(key, record)
+            if inspect.isawaitable(result):
+                await result
+            self.applied += 1
+
+    async def run(self, prune=False):
+        """Poll forever; the ``prune`` worker also trims old change-log entries."""
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+                if prune and time.monotonic() - last_prune > CHANGE_PRUNE_INTERVAL:
+                    last_prune = time.monotonic()
+                    self.persistence.submit(self.storage.prune_changes, CHANGE_LOG_MAX_AGE)
+            except Exception as e:
+                print(f"⚠️ Change feed error: {e}")
+
+
+class Router:
+    """Forwards raw updates to worker processes, partitioned by user id.
+
+    Each worker has its own queue and a single forwarding task, so a user's
+    updates reach their worker in the order they arrived.
+    """
+
+    def __init__(self, worker_urls, secret_token=None, queue_size=ROUTER_QUEUE_SIZE):
+        self.worker_urls = worker_urls
+        self.secret_token = secret_token
+        self.queues = [asyncio.Queue(queue_size) for _ in worker_urls]
+        self.tasks = []
+        self.client = None
+        self.forwarded = 0
+        self.failed = 0
+
+    async def route(self, data):
+        await self.queues[partition(update_user_id(data), len(self.queues))].put(data)
+
+    async def start(self):
+        headers = {"X-Telegram-Bot-API-Secret-Token": self.secret_token} if self.secret_token else {}
+        self.client = httpx.AsyncClient(timeout=10, headers=headers)
+        self.tasks = [asyncio.create_task(self._forward(url, queue))
+                      for url, queue in zip(self.worker_urls, self.queues)]
+
+    async def stop(self, timeout=10):
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self.queues)), timeout)
+        except asyncio.TimeoutError:
+            print("⚠️ Router stopped with updates still queued")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.client.aclose()
+
+    async def _forward(self, url, queue):
+        while True:
+            data = await queue.get()
+            for attempt in range(FORWARD_RETRIES):
+                try:
+                    response = await self.client.post(url, json=data)
+                    response.raise_for_status()
+                    self.forwarded += 1
+                    break
+                except httpx.HTTPError as e:
+                    # Usually a worker that is still starting or being restarted.
+                    error = e
+                    await asyncio.sleep(min(0.1 * 2 ** attempt, 5))
+            else:
+                self.failed += 1
+                print(f"⚠️ Dropped update {data.get('update_id')} for {url}: {error}")
+            queue.task_done()
+
+    async def poll(self, bot):
+        """Fetch updates with getUpdates and route them; run as a task and cancel to stop."""
+        offset = None
+        backoff = 1
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT, read_timeout=POLL_TIMEOUT + 10,
+                                                allowed_updates=Update.ALL_TYPES)
+            except RetryAfter as e:
+                print(f"⚠️ Flood control while polling, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                # Network errors, Conflict from a second poller, server errors: keep polling, just slower.
+                print(f"⚠️ Error while polling ({type(e).__name__}: {e}), retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_POLL_BACKOFF)
+                continue
+            backoff = 1
+            for update in updates:
+                await self.route(update.to_dict())
+                offset = update.update_id + 1
+
+
+class WorkerPool:
+    """Runs ``script`` ``count`` times as worker processes on consecutive ports and restarts any that exit."""
+
+    def __init__(self, script, count, base_port, env):
+        self.script = script
+        self.count = count
+        self.base_port = base_port
+        self.env = env
+        self.processes = [None] * count
+
+    def urls(self, path):
+        return [f"http://127.0.0.1:{self.base_port + index}{path}" for index in range(self.count)]
+
+    def _spawn(self, index):
+        env = dict(os.environ, **self.env, WORKER_INDEX=str(index), PORT=str(self.base_port + index))
+        self.processes[index] = subprocess.Popen([sys.executable, self.script], env=env)
+
+    def start(self):
+        for index in range(self.count):
+            self._spawn(index)
+
+    def check(self):
+        for index, process in enumerate(self.processes):
+            if process.poll() is not None:
+                print(f"⚠️ Worker {index} exited with {process.returncode}; restarting")
+                self._spawn(index)
+
+    def stop(self, timeout=30):
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
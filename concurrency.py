@@ -0,0 +1,92 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import Application
+
+PENDING_UPDATES = 10000  # update tasks python-telegram-bot may start before the oldest finishes
+
+
+class KeyedLock:
+    """One asyncio.Lock per key, dropped again as soon as nobody holds or awaits it."""
+
+    def __init__(self):
+        self.locks = {}
+
+    def __len__(self):
+        return len(self.locks)
+
+    async def acquire(self, key):
+        entry = self.locks.get(key)
+        if entry is None:
+            entry = self.locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._release_ref(key, entry)
+            raise
+
+    def release(self, key):
+        entry = self.locks[key]
+        entry[0].release()
+        self._release_ref(key, entry)
+
+    def _release_ref(self, key, entry):
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.locks[key]
+
+
+def update_key(update):
+    """Updates from the same user (or chat, for updates without a user) are processed in order."""
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(update, "effective_chat", None)
+    return chat.id if chat is not None else None
+
+
+class UserOrderedApplication(Application):
+    """Processes updates concurrently across users but one at a time per user.
+
+    python-telegram-bot starts update tasks in arrival order, and the per-user
+    lock is the first thing each task waits on, so a user's updates are handled
+    in the order they arrived.
+
+    At most ``update_slots`` updates are handled at once. The slot is taken
+    only after the user's lock, so a user's queued updates wait without
+    occupying one and can't starve everybody else. python-telegram-bot's own
+    ``concurrent_updates`` then only bounds how many update tasks may wait;
+    build with::
+
+        ApplicationBuilder()
+            .application_class(UserOrderedApplication, kwargs={"update_slots": n})
+            .concurrent_updates(PENDING_UPDATES)
+
+    ``admit(update)``, if set, is asked first; updates it turns down are
+    dropped before they wait for the lock or a slot, or reach any handler.
+    """
+
+    def __init__(self, *, update_slots=None, **kwargs):
+        super().__init__(**kwargs)
+        self.user_locks = KeyedLock()
+        self.update_slots = asyncio.Semaphore(update_slots) if update_slots else None
+        self.admit = None
+
+    async def process_update(self, update):
+        if self.admit is not None and isinstance(update, Update) and not self.admit(update):
+            return
+        key = update_key(update)
+        if key is None:
+            return await self._process_in_slot(update)
+        await self.user_locks.acquire(key)
+        try:
+            return await self._process_in_slot(update)
+        finally:
+            self.user_locks.release(key)
+
+    async def _process_in_slot(self, update):
+        if self.update_slots is None:
+            return await super().process_update(update)
+        async with self.update_slots:
+            return await super().process_update(update)
@@ -0,0 +1,183 @@
+import os
+import time
+import shutil
+import asyncio
+import hashlib
+import zipfile
+
+from telegram import InputMediaDocument
+from telegram.error import RetryAfter
+
+from filestore import open_submission, submission_exists
+
+ALBUM_SIZE = 10  # Telegram's limit for send_media_group
+ALBUM_CONCURRENCY = 3
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+EXPORTS_DIR = os.path.join("submissions", ".exports")
+
+
+class DeliveryReport:
+    def __init__(self, mode, total):
+        self.mode = mode
+        self.total = total
+        self.sent = 0
+        self.api_calls = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def summary(self):
+        text = f"Sent {self.sent}/{self.total} file(s) as {self.mode} in {self.elapsed:.1f}s ({self.api_calls} API call(s))."
+        if self.errors:
+            text += "\n" + "\n".join(f"❌ {error}" for error in self.errors[:10])
+        return text
+
+
+async def _with_retry(call, attempts=3):
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except RetryAfter as e:
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+async def send_one_by_one(bot, chat_id, files, caption):
+    """The original behaviour: one send_document per file, sequentially."""
+    report = DeliveryReport("single files", len(files))
+    for file in files:
+        report.api_calls += 1
+        try:
+            await bot.send_document(chat_id=chat_id, document=file["file_id"], caption=caption(file))
+            report.sent += 1
+        except Exception as e:
+            report.errors.append(f"{file['file_name']}: {e}")
+    report.elapsed = time.monotonic() - report.started
+    return report
+
+
+async def send_as_albums(bot, chat_id, files, caption, concurrency=ALBUM_CONCURRENCY):
+    """Send files as media groups of up to 10 documents, a few groups at a time."""
+    report = DeliveryReport("albums", len(files))
+    semaphore = asyncio.Semaphore(concurrency)
+    albums = [files[i:i + ALBUM_SIZE] for i in range(0, len(files), ALBUM_SIZE)]
+
+    async def send_album(album):
+        media = [InputMediaDocument(file["file_id"], caption=caption(file)) for file in album]
+        async with semaphore:
+            report.api_calls += 1
+            try:
+                await _with_retry(lambda: bot.send_media_group(chat_id=chat_id, media=media))
+                report.sent += len(album)
+                return
+            except Exception as e:
+                if len(album) == 1:
+                    report.errors.append(f"{album[0]['file_name']}: {e}")
+                    return
+        # One bad file fails the whole group; fall back to sending this group's files one by one.
+        fallback = await send_one_by_one(bot, chat_id, album, caption)
+        report.api_calls += fallback.api_calls
+        report.sent += fallback.sent
+        report.errors.extend(fallback.errors)
+
+    await asyncio.gather(*(send_album(album) for album in albums))
+    report.elapsed = time.monotonic() - report.started
+    return report
+
+
+def _build_zip(path, files):
+    missing = []
+    used = set()
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for file in files:
+            if not submission_exists(file):
+                missing.append(file["file_name"])
+                continue
+            name = f"{file['subject']}/{file['submitted_by']}_{file['file_name']}"
+            stem, ext = os.path.splitext(name)
+            n = 1
+            while name in used:
+                n += 1
+                name = f"{stem} ({n}){ext}"
+            used.add(name)
+            # Archived submissions are read back out of their packed archive.
+            with open_submission(file) as src, archive.open(name, "w") as dst:
+                shutil.copyfileobj(src, dst, 256 * 1024)
+    os.replace(tmp_path, path)
+    return missing
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ZipExporter:
+    """Packs a set of submissions into one ZIP and sends it as a single document.
+
+    Archives are keyed by the ids of the submissions they contain, so a cached
+    archive (and the Telegram ``file_id`` it got when first sent) is reused
+    until a submission is added to or removed from that set.
+    """
+
+    def __init__(self, directory=EXPORTS_DIR):
+        self.directory = directory
+        self.sent_file_ids = {}
+        self.latest = {}
+
+    def _key(self, files):
+        ids = ",".join(str(file["id"]) for file in files)
+        return hashlib.sha1(ids.encode()).hexdigest()[:16]
+
+    async def send(self, bot, chat_id, files, label):
+        report = DeliveryReport("ZIP", len(files))
+        key = self._key(files)
+        file_name = f"{label}.zip".replace("/", "-")
+        cached_id = self.sent_file_ids.get(key)
+        if cached_id is None:
+            path = os.path.join(self.directory, f"{key}.zip")
+            missing = []
+            if not await asyncio.to_thread(os.path.exists, path):
+                await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+                missing = await asyncio.to_thread(_build_zip, path, files)
+            previous = self.latest.get(label)
+            if previous and previous != key:
+                # The set for this label changed; the old archive will never be reused.
+                self.sent_file_ids.pop(previous, None)
+                await asyncio.to_thread(_remove_quietly, os.path.join(self.directory, f"{previous}.zip"))
+            self.latest[label] = key
+            if await asyncio.to_thread(os.path.getsize, path) > MAX_UPLOAD_SIZE:
+                return None
+            report.errors.extend(f"{name}: not found on disk" for name in missing)
+            report.api_calls += 1
+            with open(path, "rb") as f:
+                async def upload():
+                    f.seek(0)
+                    return await bot.send_document(chat_id=chat_id, document=f, filename=file_name)
+
+                message = await _with_retry(upload)
+            self.sent_file_ids[key] = message.document.file_id
+        else:
+            report.api_calls += 1
+            await _with_retry(lambda: bot.send_document(chat_id=chat_id, document=cached_id, filename=file_name))
+        report.sent = len(files) - len(report.errors)
+        report.elapsed = time.monotonic() - report.started
+        return report
+
+
+async def deliver(bot, chat_id, files, caption, label, mode, exporter):
+    """Send ``files`` using ``mode`` (``album``, ``zip`` or ``single``).
+
+    ZIP mode falls back to albums when the archive would exceed the 50 MB upload limit.
+    """
+    if mode == "zip":
+        report = await exporter.send(bot, chat_id, files, label)
+        if report is not None:
+            return report
+    if mode == "single":
+        return await send_one_by_one(bot, chat_id, files, caption)
+    return await send_as_albums(bot, chat_id, files, caption)
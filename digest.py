@@ -0,0 +1,92 @@
+import asyncio
+
+MIN_WINDOW = 5  # seconds
+MAX_WINDOW = 120
+MAX_EVENTS = 50  # flush early once this many events are buffered
+MAX_NAMES = 5  # submitters listed per subject before "+N more"
+
+
+def format_digest(events):
+    if len(events) == 1:
+        subject, submitter = events[0]
+        return f"📥 New assignment submitted for *{subject}* by @{submitter}."
+    by_subject = {}
+    for subject, submitter in events:
+        by_subject.setdefault(subject, []).append(submitter)
+    lines = [f"📥 {len(events)} new submissions:"]
+    for subject, submitters in sorted(by_subject.items(), key=lambda item: -len(item[1])):
+        names = list(dict.fromkeys(submitters))
+        shown = ", ".join(f"@{name}" for name in names[:MAX_NAMES])
+        more = f" +{len(names) - MAX_NAMES} more" if len(names) > MAX_NAMES else ""
+        lines.append(f"• *{subject}*: {len(submitters)} — {shown}{more}")
+    return "\n".join(lines)
+
+
+class SubmissionDigest:
+    """Coalesces submission notifications for the admin into digests.
+
+    A submission after a quiet stretch is sent straight away. Ones that
+    follow within the current window are buffered and sent together when it
+    ends (or once ``max_events`` are waiting), grouped by subject. Every
+    message sent less than two windows after the previous one doubles the
+    window, up to ``max_window``; a longer gap resets it to ``min_window``.
+    So a lone submission arrives at once, and a deadline rush costs a
+    message every couple of minutes instead of one per file. ``send(text)``
+    is awaited for every message; ``max_window=0`` sends each submission on
+    its own.
+    """
+
+    def __init__(self, send, min_window=MIN_WINDOW, max_window=MAX_WINDOW, max_events=MAX_EVENTS):
+        self.send = send
+        self.min_window = min(min_window, max_window)
+        self.max_window = max_window
+        self.max_events = max_events
+        self.window = self.min_window
+        self.events = []
+        self.last_flush = None
+        self.full = asyncio.Event()
+        self.task = None
+        self.sent = 0
+        self.received = 0
+
+    def add(self, subject, submitter):
+        self.received += 1
+        self.events.append((subject, submitter))
+        if len(self.events) >= self.max_events:
+            self.full.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        loop = asyncio.get_running_loop()
+        while self.events:
+            wait = self.last_flush + self.window - loop.time() if self.last_flush is not None else 0
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(self.full.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            await self.flush()
+
+    async def flush(self):
+        events, self.events = self.events, []
+        self.full.clear()
+        if not events:
+            return
+        now = asyncio.get_running_loop().time()
+        if self.last_flush is not None and now - self.last_flush < 2 * self.window:
+            self.window = min(self.window * 2, self.max_window)
+        else:
+            self.window = self.min_window
+        self.last_flush = now
+        try:
+            await self.send(format_digest(events))
+            self.sent += 1
+        except Exception as e:
+            print(f"⚠️ Could not send submission digest: {e}")
+
+    async def close(self):
+        """Send whatever is buffered (on shutdown)."""
+        self.full.set()
+        if self.task is not None:
+            await self.task
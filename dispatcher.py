@@ -0,0 +1,69 @@
+STATE_KEY = "state"
+
+# Conversation states, stored per user under context.user_data["state"].
+IDLE = "idle"
+SELECTING_SUBJECT = "selecting_subject"
+VIEWING_SUBJECT = "viewing_subject"
+FILTERING_BY_DATE = "filtering_by_date"
+DELETING_EXAM = "deleting_exam"
+PENDING_BROADCAST = "pending_broadcast"
+CONFIRM_BROADCAST = "confirm_broadcast"
+ADDING_EXAM_NAME = "adding_exam_name"
+ADDING_EXAM_DATE = "adding_exam_date"
+ADDING_EXAM_TIME = "adding_exam_time"
+ADDING_EXAM_CONTENT = "adding_exam_content"
+ADDING_EXAM_VERIFY = "adding_exam_verify"
+
+
+def get_state(context):
+    return context.user_data.get(STATE_KEY, IDLE)
+
+
+def set_state(context, state):
+    if state == IDLE:
+        context.user_data.pop(STATE_KEY, None)
+    else:
+        context.user_data[STATE_KEY] = state
+
+
+class Dispatcher:
+    """Routes text messages with hash lookups instead of a chain of regex handlers.
+
+    Resolution order for a message ``text`` from a user in ``state``:
+
+    1. ``buttons[text]``: main-menu buttons, valid in every state;
+    2. ``exact[(state, text)]``: fixed replies within a state ("Exit", a subject...);
+    3. ``free_text[state]``: the state's handler for arbitrary input.
+
+    Unmatched messages are ignored. Handlers have the usual ``(update, context)``
+    signature; ``wrap``, if given, is applied to each handler as it is
+    registered (e.g. ``metrics.timed``).
+    """
+
+    def __init__(self, wrap=None):
+        self.wrap = wrap or (lambda handler: handler)
+        self.buttons = {}
+        self.exact = {}
+        self.free_text = {}
+
+    def button(self, text, handler):
+        self.buttons[text] = self.wrap(handler)
+
+    def on(self, state, text, handler):
+        self.exact[(state, text)] = self.wrap(handler)
+
+    def on_text(self, state, handler):
+        self.free_text[state] = self.wrap(handler)
+
+    def resolve(self, state, text):
+        handler = self.buttons.get(text)
+        if handler is None:
+            handler = self.exact.get((state, text))
+        if handler is None:
+            handler = self.free_text.get(state)
+        return handler
+
+    async def dispatch(self, update, context):
+        handler = self.resolve(get_state(context), update.message.text.strip())
+        if handler is not None:
+            await handler(update, context)
@@ -0,0 +1,325 @@
+import os
+import re
+import array
+import asyncio
+import hashlib
+import zipfile
+import zlib
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from filestore import local_path
+from storage import read_json, write_json
+from uploads import SUBMISSIONS_DIR
+
+SIGNATURES_DIR = os.path.join(SUBMISSIONS_DIR, ".signatures")
+WORKERS = 2
+NUM_PERM = 128  # MinHash values per signature
+BANDS = 32  # LSH bands of NUM_PERM // BANDS values; pairs from ~45% similar up usually share one
+SHINGLE = 5  # words per shingle
+MIN_WORDS = 20  # shorter texts are only compared by hash
+SIMILARITY = 0.7  # estimated Jaccard similarity of shingles flagged as a near duplicate
+MAX_LISTED = 5  # matches listed in a notification before "+N more"
+
+BIN_BITS = 7  # NUM_PERM == 1 << BIN_BITS bins
+EMPTY = 1 << 64
+ROTATION = 1 << (64 - BIN_BITS)  # added per bin an empty bin borrows across
+
+WORD = re.compile(r"\w+")
+XML_TAG = re.compile(rb"<[^>]+>")
+PDF_STREAM = re.compile(rb"stream\r?\n(.*?)endstream", re.S)
+PDF_TEXT = re.compile(rb"\[((?:[^\]\\]|\\.)*)\]\s*TJ|\(((?:[^()\\]|\\.)*)\)\s*(?:Tj|')", re.S)
+PDF_LITERAL = re.compile(rb"\(((?:[^()\\]|\\.)*)\)", re.S)
+OFFICE_PARTS = ("word/document", "word/footnotes", "ppt/slides/slide", "xl/sharedStrings", "content.xml")
+
+
+def _pdf_text(data):
+    # Literal strings drawn with Tj/TJ in the (usually deflated) content streams.
+    parts = []
+    for stream in PDF_STREAM.findall(data):
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        for shown, literal in PDF_TEXT.findall(stream):
+            parts.append(b"".join(PDF_LITERAL.findall(shown)) if shown else literal)
+    return b" ".join(parts).decode("latin-1")
+
+
+def _zip_text(data):
+    # Office documents (docx, pptx, xlsx, odt) by their text parts; other archives by their text members.
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        names = sorted(archive.namelist())
+        office = [name for name in names if name.startswith(OFFICE_PARTS) and name.endswith(".xml")]
+        if office:
+            return XML_TAG.sub(b" ", b" ".join(map(archive.read, office))).decode("utf-8", "ignore")
+        return " ".join(filter(None, (_plain_text(archive.read(name)) for name in names if not name.endswith("/"))))
+
+
+def _plain_text(data):
+    return "" if b"\0" in data[:8192] else data.decode("utf-8", "ignore")
+
+
+def extract_text(data):
+    """Best-effort text of a PDF, Office document, zip of sources or plain text file ("" for other binaries)."""
+    if data.startswith(b"%PDF"):
+        return _pdf_text(data)
+    if data.startswith(b"PK\x03\x04"):
+        try:
+            return _zip_text(data)
+        except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError):
+            return ""  # corrupt, truncated, encrypted or unsupported archives
+    return _plain_text(data)
+
+
+def minhash(words):
+    """MinHash signature of the ``SHINGLE``-word shingles of ``words``, or None if the text is too short.
+
+    Uses one permutation hashing: each shingle is hashed once and the hash
+    picks one of ``NUM_PERM`` bins, which keeps its smallest value. Empty
+    bins borrow the next non-empty bin's value (rotation densification), so
+    two signatures agree in a bin with probability equal to the Jaccard
+    similarity of the shingle sets, as with ``NUM_PERM`` separate hashes,
+    for one hash per shingle instead of ``NUM_PERM``.
+    """
+    if len(words) < MIN_WORDS:
+        return None
+    bins = [EMPTY] * NUM_PERM
+    for i in range(len(words) - SHINGLE + 1):
+        h = int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE]).encode(), digest_size=8).digest(), "big")
+        b, value = h & (NUM_PERM - 1), h >> BIN_BITS
+        if value < bins[b]:
+            bins[b] = value
+    signature = []
+    for b in range(NUM_PERM):
+        step = 0
+        while bins[(b + step) % NUM_PERM] == EMPTY:
+            step += 1
+        signature.append(bins[(b + step) % NUM_PERM] + step * ROTATION)
+    return signature
+
+
+def analyse(path):
+    """Content hash, hash of the normalised text and MinHash signature of a file.
+
+    CPU-bound; runs in the detector's worker processes.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    words = WORD.findall(extract_text(data).lower())
+    return {
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "text_sha256": hashlib.sha256(" ".join(words).encode()).hexdigest() if words else None,
+        "minhash": minhash(words),
+    }
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class LshIndex:
+    """Exact-hash and MinHash LSH lookup over the submissions of one subject.
+
+    Signatures are cut into ``BANDS`` bands; submissions sharing any band
+    are candidates, and candidates whose signatures agree on at least
+    ``threshold`` of their values are reported. Files with the same bytes
+    or the same normalised text match outright.
+    """
+
+    def __init__(self, threshold=SIMILARITY, bands=BANDS):
+        self.threshold = threshold
+        self.rows = NUM_PERM // bands
+        self.bands = [{} for _ in range(bands)]
+        self.hashes = {"sha256": {}, "text_sha256": {}}
+        self.entries = {}  # key -> analysis, or None if the file could not be analysed
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _band_keys(self, signature):
+        return [signature[i:i + self.rows].tobytes() for i in range(0, NUM_PERM, self.rows)]
+
+    def add(self, key, analysis):
+        if key in self.entries:
+            return
+        if analysis is not None and analysis["minhash"] is not None:
+            analysis = dict(analysis, minhash=array.array("Q", analysis["minhash"]))
+        self.entries[key] = analysis
+        if analysis is None:
+            return
+        for field, hashes in self.hashes.items():
+            if analysis[field]:
+                hashes.setdefault(analysis[field], set()).add(key)
+        if analysis["minhash"] is not None:
+            for band, band_key in zip(self.bands, self._band_keys(analysis["minhash"])):
+                band.setdefault(band_key, set()).add(key)
+
+    def remove(self, key):
+        analysis = self.entries.pop(key, None)
+        if analysis is None:
+            return
+        for field, hashes in self.hashes.items():
+            self._discard(hashes, analysis[field], key)
+        if analysis["minhash"] is not None:
+            for band, band_key in zip(self.bands, self._band_keys(analysis["minhash"])):
+                self._discard(band, band_key, key)
+
+    @staticmethod
+    def _discard(buckets, bucket_key, key):
+        bucket = buckets.get(bucket_key)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del buckets[bucket_key]
+
+    def matches(self, key):
+        """``[(other key, similarity, kind)]`` for the entries ``key`` duplicates, most similar first."""
+        analysis = self.entries.get(key)
+        if analysis is None:
+            return []
+        found = {}
+        for other in self.hashes["sha256"].get(analysis["sha256"], ()):
+            found[other] = (1.0, "identical file")
+        for other in self.hashes["text_sha256"].get(analysis["text_sha256"], ()):
+            found.setdefault(other, (1.0, "same text"))
+        signature = analysis["minhash"]
+        if signature is not None:
+            candidates = set()
+            for band, band_key in zip(self.bands, self._band_keys(signature)):
+                candidates.update(band.get(band_key, ()))
+            for other in candidates - found.keys():
+                score = similarity(signature, self.entries[other]["minhash"])
+                if score >= self.threshold:
+                    found[other] = (score, "similar")
+        found.pop(key, None)
+        return sorted(((other, score, kind) for other, (score, kind) in found.items()), key=lambda m: -m[1])
+
+
+def _same_submitter(a, b):
+    # Records from before user ids were stored can only be told apart by username.
+    if a.get("user_id") is not None and b.get("user_id") is not None:
+        return a["user_id"] == b["user_id"]
+    return a["submitted_by"] == b["submitted_by"] != "Unknown User"
+
+
+def format_matches(record, matches):
+    lines = [f"🔁 Possible duplicate in *{record['subject']}*: '{record['file_name']}' by @{record['submitted_by']}"]
+    for other, score, kind in matches[:MAX_LISTED]:
+        what = kind if kind != "similar" else f"{score:.0%} similar"
+        own = " (their own earlier upload)" if _same_submitter(other, record) else ""
+        lines.append(f"• {what} to '{other['file_name']}' by @{other['submitted_by']}, "
+                     f"{other['submission_date']}{own}")
+    if len(matches) > MAX_LISTED:
+        lines.append(f"• +{len(matches) - MAX_LISTED} more")
+    return "\n".join(lines)
+
+
+class DuplicateDetector:
+    """Finds submissions that repeat or closely copy others in the same subject.
+
+    Reading, text extraction and hashing happen in a pool of ``workers``
+    processes, so even a burst of large PDFs never blocks the event loop.
+    Each file's analysis is cached on disk under its content hash
+    (``submissions/.signatures``), so a file is analysed once however often
+    it is re-uploaded, and restarts and other workers reuse the work.
+
+    One :class:`LshIndex` per subject is built on the first check in that
+    subject and brought up to date with the store before every check, so
+    deletions, archiving and other workers' submissions are taken into
+    account. Archived files are compared if their analysis is cached.
+    """
+
+    def __init__(self, store, workers=WORKERS, threshold=SIMILARITY, cache_dir=SIGNATURES_DIR):
+        self.store = store
+        self.workers = workers
+        self.threshold = threshold
+        self.cache_dir = cache_dir
+        self.executor = None
+        self.subjects = {}
+        self.analysed = 0
+        self.checked = 0
+        self.flagged = 0
+
+    def start(self):
+        if self.executor is None:
+            # Not fork: the bot's storage and to_thread threads may hold locks at that moment.
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self.executor = ProcessPoolExecutor(self.workers, multiprocessing.get_context(method))
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def _cache_path(self, sha256):
+        return os.path.join(self.cache_dir, sha256[:2], f"{sha256}.json")
+
+    def _write_cache(self, analysis):
+        path = self._cache_path(analysis["sha256"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_json(path, analysis)
+
+    async def analysis(self, record):
+        """The cached or freshly computed analysis of a submission's file, or None if it can't be analysed.
+
+        A None analysis still goes into the index, so a file that fails is not
+        retried on every check; it is only compared again once re-uploaded.
+        """
+        sha256 = record.get("sha256")
+        if sha256:
+            cached = await asyncio.to_thread(read_json, self._cache_path(sha256), None)
+            if cached is not None:
+                return cached
+        path = local_path(record)
+        if record.get("archive") or not await asyncio.to_thread(os.path.exists, path):
+            return None
+        self.start()
+        executor = self.executor
+        try:
+            analysis = await asyncio.get_running_loop().run_in_executor(executor, analyse, path)
+        except OSError:
+            return None  # deleted while queued
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); the next call starts a new pool.
+            if self.executor is executor:
+                print(f"⚠️ Duplicate check pool broke while analysing {record['file_name']}; restarting it")
+                self.stop()
+            return None
+        except Exception as e:
+            print(f"⚠️ Could not analyse {record['file_name']} for duplicates: {e}")
+            return None
+        self.analysed += 1
+        try:
+            await asyncio.to_thread(self._write_cache, analysis)
+        except OSError as e:
+            print(f"⚠️ Could not cache the analysis of {record['file_name']}: {e}")
+        return analysis
+
+    async def subject_index(self, subject):
+        """The subject's index, with records added or removed since the last call applied."""
+        index = self.subjects.get(subject)
+        if index is None:
+            index = self.subjects[subject] = LshIndex(self.threshold)
+        current = {record["id"]: record for record in self.store.iter_by("subject", subject)}
+        for key in index.entries.keys() - current.keys():
+            index.remove(key)
+        missing = [record for key, record in current.items() if key not in index.entries]
+        analyses = await asyncio.gather(*map(self.analysis, missing))
+        for record, analysis in zip(missing, analyses):
+            if self.store.get(record["id"]) is not None:
+                index.add(record["id"], analysis)
+        return index
+
+    async def check(self, record):
+        """``[(other record, similarity, kind)]`` for the submissions in ``record``'s subject it duplicates."""
+        index = await self.subject_index(record["subject"])
+        self.checked += 1
+        matches = [(self.store.get(key), score, kind) for key, score, kind in index.matches(record["id"])]
+        matches = [match for match in matches if match[0] is not None]
+        if matches:
+            self.flagged += 1
+        return matches
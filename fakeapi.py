@@ -0,0 +1,170 @@
+import json
+import time
+import asyncio
+import hashlib
+from email.parser import BytesParser
+from urllib.parse import parse_qsl
+
+from webserver import REASONS, WebServer
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+MAX_UPDATES = 100
+
+
+def parse_params(headers, body):
+    """Bot API parameters from a form-encoded or multipart request (as python-telegram-bot sends them)."""
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        params = {}
+        for part in message.get_payload():
+            data = part.get_payload(decode=True)
+            name = part.get_param("name", header="content-disposition")
+            params[name] = f"<{len(data)} bytes>" if part.get_filename() else data.decode()
+    else:
+        params = dict(parse_qsl(body.decode(), keep_blank_values=True))
+    for name, value in params.items():
+        if value[:1] in ("{", "["):
+            params[name] = json.loads(value)
+    return params
+
+
+def fake_file(file_id, size):
+    """Deterministic content for ``file_id``, so identical ids download identical bytes."""
+    seed = hashlib.sha256(file_id.encode()).digest()
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+class Call:
+    def __init__(self, method, params):
+        self.method = method
+        self.params = params
+        self.at = time.perf_counter()
+        self.result = None
+
+    @property
+    def chat_id(self):
+        try:
+            return int(self.params.get("chat_id"))
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def text(self):
+        if "media" in self.params:
+            return "\n".join(item.get("caption", "") for item in self.params["media"])
+        return self.params.get("text") or self.params.get("caption") or ""
+
+
+class FakeBotApi(WebServer):
+    """A local stand-in for the Telegram Bot API server, for load tests and replays.
+
+    Point the bot at it with ``BOT_API_URL``. Updates queued with :meth:`push`
+    are handed out through ``getUpdates`` (long polling); ``getFile`` and file
+    downloads serve generated content of the registered size; every other
+    method succeeds after ``latency`` seconds and returns a plausible result.
+    All calls except ``getUpdates`` are recorded in ``calls``, and
+    :meth:`expect` waits for a call to match.
+    """
+
+    def __init__(self, token, latency=0.0, host="127.0.0.1", port=0):
+        super().__init__(None, lambda: True, lambda: "", host=host, port=port)
+        self.token = token
+        self.latency = latency
+        self.updates = []
+        self.update_ready = asyncio.Event()
+        self.files = {}
+        self.calls = []
+        self.watchers = []
+        self.message_id = 0
+
+    async def stop(self):
+        self.update_ready.set()  # answer pending long polls so their connections can close
+        await super().stop()
+
+    def push(self, update):
+        self.updates.append(update)
+        self.update_ready.set()
+
+    def add_file(self, file_id, size):
+        self.files[file_id] = size
+
+    def expect(self, match):
+        """A future resolved with the first later call for which ``match(call)`` is true."""
+        future = asyncio.get_running_loop().create_future()
+        self.watchers.append((match, future))
+        return future
+
+    def _record(self, call):
+        self.calls.append(call)
+        for watcher in list(self.watchers):
+            match, future = watcher
+            if future.done():
+                self.watchers.remove(watcher)
+            elif match(call):
+                self.watchers.remove(watcher)
+                future.set_result(call)
+
+    async def _route(self, method, path, headers, body):
+        api_prefix, file_prefix = f"/bot{self.token}/", f"/file/bot{self.token}/"
+        if path.startswith(file_prefix):
+            file_id = path[len(file_prefix):].rsplit("/", 1)[-1]
+            if file_id not in self.files:
+                return 404, "not found", "text/plain"
+            return 200, fake_file(file_id, self.files[file_id]), "application/octet-stream"
+        if not path.startswith(api_prefix):
+            return 404, "not found", "text/plain"
+        name = path[len(api_prefix):]
+        params = parse_params(headers, body)
+        if name == "getUpdates":
+            result = await self._get_updates(params)
+        else:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            call = Call(name, params)
+            result = call.result = self._result(call)
+            self._record(call)
+        return 200, json.dumps({"ok": True, "result": result}), "application/json"
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        self.updates = [update for update in self.updates if update["update_id"] >= offset]
+        if not self.updates:
+            self.update_ready.clear()
+            try:
+                await asyncio.wait_for(self.update_ready.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:MAX_UPDATES]
+
+    def _message(self, call, **fields):
+        self.message_id += 1
+        return {"message_id": self.message_id, "date": int(time.time()), "from": BOT_USER,
+                "chat": {"id": call.chat_id, "type": "private"}, **fields}
+
+    def _result(self, call):
+        if call.method == "getMe":
+            return BOT_USER
+        if call.method == "getFile":
+            file_id = call.params["file_id"]
+            return {"file_id": file_id, "file_unique_id": file_id, "file_size": self.files.get(file_id, 0),
+                    "file_path": f"documents/{file_id}"}
+        if call.method in ("sendMessage", "editMessageText"):
+            return self._message(call, text=call.params.get("text", ""))
+        if call.method in ("sendDocument", "editMessageReplyMarkup"):
+            return self._message(call)
+        if call.method == "sendMediaGroup":
+            return [self._message(call, caption=item.get("caption", "")) for item in call.params["media"]]
+        return True
+
+    async def _respond(self, writer, status, payload, content_type="text/plain", keep_alive=True):
+        if isinstance(payload, str):
+            return await super()._respond(writer, status, payload, content_type, keep_alive)
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
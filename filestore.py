@@ -0,0 +1,163 @@
+import os
+import shutil
+import asyncio
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from uploads import SUBMISSIONS_DIR, release
+
+ARCHIVE_DIR = os.path.join(SUBMISSIONS_DIR, ".archive")
+MB = 1024 * 1024
+USER_QUOTA = 200 * MB
+SUBJECT_QUOTA = 5 * 1024 * MB
+RETENTION_DAYS = 30
+ARCHIVE_INTERVAL = 6 * 60 * 60  # seconds between archive runs
+
+
+def local_path(record):
+    return record.get("path") or os.path.join(SUBMISSIONS_DIR, record["subject"], record["file_name"])
+
+
+def archive_path(subject, month):
+    return os.path.join(ARCHIVE_DIR, subject, f"{month}.zip")
+
+
+def member_name(record):
+    return f"{record['id']}/{record['file_name']}"
+
+
+def submission_exists(record):
+    if record.get("archive"):
+        return os.path.exists(record["archive"])
+    return os.path.exists(local_path(record))
+
+
+@contextmanager
+def open_submission(record):
+    """Open a submission's content for reading, wherever it is stored now."""
+    if record.get("archive"):
+        with zipfile.ZipFile(record["archive"]) as archive, archive.open(member_name(record)) as f:
+            yield f
+    else:
+        with open(local_path(record), "rb") as f:
+            yield f
+
+
+def _pack(path, records):
+    """Add ``records`` to the archive at ``path`` (created if needed) and return those now in it.
+
+    The archive is rebuilt next to the original and swapped in with a rename,
+    so a crash never leaves a half-written archive behind. Members already
+    present (from an interrupted earlier run) are not added twice.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    if os.path.exists(path):
+        shutil.copyfile(path, tmp_path)
+    packed = []
+    with zipfile.ZipFile(tmp_path, "a", compression=zipfile.ZIP_DEFLATED) as archive:
+        existing = set(archive.namelist())
+        for record in records:
+            name = member_name(record)
+            if name not in existing:
+                source = local_path(record)
+                if not os.path.exists(source):
+                    continue
+                archive.write(source, name)
+            packed.append(record)
+    os.replace(tmp_path, path)
+    return packed
+
+
+def _sizes(records):
+    sizes = {}
+    for record in records:
+        try:
+            sizes[record["id"]] = os.path.getsize(local_path(record))
+        except OSError:
+            pass
+    return sizes
+
+
+class StorageManager:
+    """Disk quotas and archiving for submitted files.
+
+    Usage per subject and per user (``user_id``) comes from the ``size`` stored with
+    every submission (``SubmissionStore.used``); uploads that are queued but
+    not finished are reserved on top so a burst cannot overshoot a quota.
+    Submissions older than ``retention_days`` are packed into compressed
+    per-subject, per-month archives (``submissions/.archive/{subject}/{YYYY-MM}.zip``)
+    and their loose files removed; :func:`open_submission` reads either form.
+    A quota of 0 disables that limit.
+    """
+
+    def __init__(self, submissions, user_quota=USER_QUOTA, subject_quota=SUBJECT_QUOTA,
+                 retention_days=RETENTION_DAYS):
+        self.submissions = submissions
+        self.user_quota = user_quota
+        self.subject_quota = subject_quota
+        self.retention_days = retention_days
+        self.reserved = {"user_id": {}, "subject": {}}
+        self.archived = 0
+
+    def _usage(self, field, value):
+        return self.submissions.used(field, value) + self.reserved[field].get(value, 0)
+
+    def reserve(self, user_id, subject, size):
+        """Reserve space for an upload; returns a message for the user if a quota would be exceeded."""
+        if self.user_quota and self._usage("user_id", user_id) + size > self.user_quota:
+            return f"You have used your {self.user_quota // MB} MB of submission space. Delete old files in Manage Files first."
+        if self.subject_quota and self._usage("subject", subject) + size > self.subject_quota:
+            return f"Submissions for {subject} have reached their {self.subject_quota // MB} MB limit. Please contact the admin."
+        for field, value in (("user_id", user_id), ("subject", subject)):
+            self.reserved[field][value] = self.reserved[field].get(value, 0) + size
+        return None
+
+    def unreserve(self, user_id, subject, size):
+        """Drop a reservation once the upload is stored (its size is then counted) or has failed."""
+        for field, value in (("user_id", user_id), ("subject", subject)):
+            left = self.reserved[field].get(value, 0) - size
+            if left > 0:
+                self.reserved[field][value] = left
+            else:
+                self.reserved[field].pop(value, None)
+
+    async def backfill_sizes(self):
+        """Record sizes for submissions stored before sizes were tracked."""
+        missing = [record for record in self.submissions if record.get("size") is None and not record.get("archive")]
+        if missing:
+            for submission_id, size in (await asyncio.to_thread(_sizes, missing)).items():
+                self.submissions.update(submission_id, size=size)
+
+    async def archive_old(self, today=None):
+        """Pack every loose submission older than the retention window; returns how many were archived."""
+        cutoff = ((today or datetime.now()) - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        groups = {}
+        for date in [date for date in self.submissions.dates() if date < cutoff]:
+            for record in self.submissions.by_date(date):
+                if not record.get("archive"):
+                    groups.setdefault(archive_path(record["subject"], date[:7]), []).append(record)
+
+        count = 0
+        for path, records in groups.items():
+            packed = await asyncio.to_thread(_pack, path, records)
+            for record in packed:
+                old_path = local_path(record)
+                if self.submissions.update(record["id"], archive=path, path=None) is not None:
+                    await asyncio.to_thread(release, old_path, record.get("sha256"))
+                    count += 1
+        self.archived += count
+        return count
+
+    async def run(self, interval=ARCHIVE_INTERVAL):
+        """Backfill sizes once, then archive old submissions periodically; run as a background task."""
+        await self.backfill_sizes()
+        while True:
+            try:
+                archived = await self.archive_old()
+                if archived:
+                    print(f"📦 Archived {archived} old submission(s)")
+            except Exception as e:
+                print(f"⚠️ Archiving failed: {e}")
+            await asyncio.sleep(interval)
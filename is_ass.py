@@ -1,90 +1,90 @@
 import os
-import json
+import time
 import uuid
+import secrets
+import signal
 import asyncio
+import functools
 from datetime import datetime
 from dotenv import load_dotenv
-from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Bot, Update, InlineKeyboardButton
 from telegram.ext import (
     ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler,
     ContextTypes, filters
 )
+from telegram.error import BadRequest, TelegramError
+from telegram.request import HTTPXRequest
 from keep_alive import keep_alive
-
-keep_alive()
+from storage import open_storage
+from persistence import PersistenceService
+from user_registry import UserRegistry
+from submissions import SubmissionStore
+from uploads import UploadJob, UploadPipeline, clean_stale_parts, release
+from delivery import ZipExporter, deliver
+from filestore import MB, StorageManager, local_path
+from search import SearchIndex
+from duplicates import DuplicateDetector, format_matches
+from scheduler import ExamScheduler
+from webserver import WebServer
+from concurrency import PENDING_UPDATES, UserOrderedApplication
+from dispatcher import (
+    Dispatcher, set_state, IDLE, SELECTING_SUBJECT, VIEWING_SUBJECT, FILTERING_BY_DATE, DELETING_EXAM,
+    PENDING_BROADCAST, CONFIRM_BROADCAST, ADDING_EXAM_NAME, ADDING_EXAM_DATE, ADDING_EXAM_TIME,
+    ADDING_EXAM_CONTENT, ADDING_EXAM_VERIFY
+)
+from broadcast import Broadcaster, BroadcastJob, load_unfinished_jobs
+from render import (
+    RenderCache, escape_markdown_v2, main_menu, subject_menu, exam_list_text, exam_buttons, exam_details,
+    exam_lookup, page_markup, clamp_offset
+)
+from antiflood import FloodGuard
+from digest import SubmissionDigest
+from cluster import FORWARD_PATH, ChangeFeed, Router, StatePersistence, WorkerPool, partition
+from metrics import REGISTRY, InstrumentedRequest, LoopLagMonitor, timed, stats_report
 
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID")
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()  # polling or webhook (worker: set by the router)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = "/webhook"
+# Without a configured secret a random one is registered with Telegram, so the webhook never accepts unsigned posts.
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+PORT = int(os.getenv("PORT", "8080"))
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "32"))  # 1 = process updates one by one
+KEEP_ALIVE = os.getenv("KEEP_ALIVE", "0") == "1"  # legacy Flask thread instead of the health/metrics server
+DELIVERY_MODE = os.getenv("DELIVERY_MODE", "album").lower()  # album, zip or single
+USER_QUOTA_MB = int(os.getenv("USER_QUOTA_MB", "200"))  # 0 = unlimited
+SUBJECT_QUOTA_MB = int(os.getenv("SUBJECT_QUOTA_MB", "5120"))
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "30"))  # older submissions are packed into archives
+FLOOD_RATE = float(os.getenv("FLOOD_RATE", "1"))  # sustained updates/second per user; 0 = no limit
+FLOOD_BURST = int(os.getenv("FLOOD_BURST", "8"))
+MAX_USER_UPLOADS = int(os.getenv("MAX_USER_UPLOADS", "3"))  # files per user queued at once; 0 = no limit
+ADMIN_DIGEST_SECONDS = int(os.getenv("ADMIN_DIGEST_SECONDS", "120"))  # longest wait for a digest; 0 = one message per file
+DUPLICATE_WORKERS = int(os.getenv("DUPLICATE_WORKERS", "2"))  # processes checking uploads for duplicates; 0 = off
+WORKERS = int(os.getenv("WORKERS", "1"))  # >1: this process routes updates to worker processes on PORT+1...
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+CLUSTER_SECRET = os.getenv("CLUSTER_SECRET")
+BOT_API_URL = os.getenv("BOT_API_URL", "https://api.telegram.org").rstrip("/")  # self-hosted Bot API server, or fakeapi.py for load tests
 subjects = ["Internet programming(IP)", "Information security", "Networking", "Ecommerce", "OOSAD", "Mobile computing"]
 
 
-if not BOT_TOKEN or not ADMIN_ID:
-    raise ValueError("BOT_TOKEN or ADMIN_ID not found in .env file.")
-
+# === State ===
+# Created by load_state() when the application is built, so importing this
+# module opens no files and reads no data.
+IS_LEADER = True  # the admin's worker sends reminders and owns broadcast jobs
+storage = persistence = users = submitted_files = change_feed = file_store = None
+uploads = zip_exporter = exam_scheduler = loop_lag = flood_guard = admin_digest = search_index = None
+duplicate_detector = None
 exam_dates = []
-submitted_files = []
-user_ids = set()
-
-# === File I/O Helpers ===
-def save_user_ids():
-    with open("user_ids.json", "w") as f:
-        json.dump(list(user_ids), f)
-
-def load_user_ids():
-    global user_ids
-    try:
-        with open("user_ids.json", "r") as f:
-            user_ids = set(json.load(f))
-    except (FileNotFoundError, json.JSONDecodeError):
-        user_ids = set()
-
-def save_exam_dates():
-    with open("exam_dates.json", "w") as f:
-        json.dump(exam_dates, f)
-
-def load_exam_dates():
-    global exam_dates
-    try:
-        with open("exam_dates.json", "r") as f:
-            exam_dates = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        exam_dates = []
-
-def save_submitted_files():
-    with open("submitted_files.json", "w") as f:
-        json.dump(submitted_files, f)
-
-def load_submitted_files():
-    global submitted_files
-    try:
-        with open("submitted_files.json", "r") as f:
-            submitted_files = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        submitted_files = []
-
-def escape_markdown_v2(text):
-    special_chars = r"_*[]()~`>#+-=|{}.!"
-    return "".join(f"\\{char}" if char in special_chars else char for char in text)
-
-# Load data on startup
-load_user_ids()
-load_exam_dates()
-load_submitted_files()
+render_cache = RenderCache()
 
 # === Bot Handlers ===
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_ids.add(update.effective_user.id)
-    save_user_ids()
     is_admin = str(update.effective_user.id) == ADMIN_ID
+    users.touch(update.effective_user, is_admin)
 
-    keyboard = [
-        ["Exam Announcement", "View Assignments"] if is_admin else ["Submit Group Assignment", "Submit Individual Assignment"],
-        ["Add Exam Date", "Delete Exam"] if is_admin else ["Exam Announcement"],
-        ["Post Message", "Buy me coffee"] if is_admin else ["Manage Files", "Buy me coffee"]
-    ]
-
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    reply_markup = main_menu(render_cache, is_admin)
     name = update.effective_user.first_name or "Student"
     
     await update.message.reply_text(
@@ -95,81 +95,138 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 async def handle_assignment_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    keyboard = [[subject] for subject in subjects]
-    keyboard.append(["Exit"])
-
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    reply_markup = subject_menu(render_cache, subjects)
     await update.message.reply_text(
         "📚 🙏🏻 *Enter the date when you submit the assignment in the caption.* 🙏🏻\n\n"
         "Please select the subject for which you want to submit the assignment:",
         reply_markup=reply_markup,
         parse_mode="Markdown"
     )
-    context.user_data["selecting_subject"] = True
+    set_state(context, SELECTING_SUBJECT)
+
+def needs_submissions(handler):
+    """For handlers that use the submission history: wait for its background load instead of reading it inline."""
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        await submitted_files.preload()
+        return await handler(update, context)
+    return wrapper
 
 async def handle_file_submission(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # The flood guard took an upload slot when it admitted the document; keep it only if the file was queued.
+    queued = False
+    try:
+        queued = await queue_file_submission(update, context)
+    finally:
+        if not queued and update.message is not None and update.message.document is not None:
+            flood_guard.upload_finished(update.effective_user.id)
+
+@needs_submissions
+async def queue_file_submission(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Check and queue a submitted document; True once it is queued for download."""
     if not update.message.document:
         await update.message.reply_text("⚠️ Please send a valid document.")
-        return
+        return False
 
     file = update.message.document
     if file.file_size > 50 * 1024 * 1024:  # 50 MB in bytes
         await update.message.reply_text("❌ The file is too large. Please upload a file smaller than 50 MB.")
-        return
+        return False
 
     if "selected_subject" not in context.user_data:
         await update.message.reply_text("⚠️ Please select a subject first.")
-        return
+        return False
 
     subject = context.user_data["selected_subject"]
-    os.makedirs(f"submissions/{subject}", exist_ok=True)
-    file_path = f"submissions/{subject}/{file.file_name}"
-    
+    submitted_by = update.effective_user.username or "Unknown User"
+    submitted_files.claim(update.effective_user.id, update.effective_user.username)  # count older files too
+    quota_error = file_store.reserve(update.effective_user.id, subject, file.file_size)
+    if quota_error:
+        await update.message.reply_text(f"❌ {quota_error}")
+        return False
+
+    context.user_data.pop("selected_subject")
+    job = UploadJob(
+        file_id=file.file_id,
+        file_unique_id=file.file_unique_id,
+        file_name=os.path.basename(file.file_name or file.file_unique_id),
+        file_size=file.file_size,
+        subject=subject,
+        chat_id=update.effective_chat.id,
+        submitted_by=submitted_by,
+        user_id=update.effective_user.id
+    )
+    if uploads.enqueue(job) is None:
+        file_store.unreserve(job.user_id, subject, file.file_size)
+        context.user_data["selected_subject"] = subject
+        await update.message.reply_text("⏳ The bot is busy receiving other files. Please try again in a minute.")
+        return False
+
+    await update.message.reply_text(f"📥 Received '{job.file_name}' for *{subject}*. Saving it now...")
+    return True
+
+async def upload_complete(job, path, sha256):
+    await submitted_files.preload()
+    file_store.unreserve(job.user_id, job.subject, job.file_size)
+    flood_guard.upload_finished(job.user_id)
+    record = submitted_files.add({
+        "file_name": job.file_name,
+        "file_id": job.file_id,
+        "submitted_by": job.submitted_by,
+        "user_id": job.user_id,
+        "subject": job.subject,
+        "submission_date": datetime.now().strftime("%Y-%m-%d"),
+        "file_unique_id": job.file_unique_id,
+        "sha256": sha256,
+        "path": path,
+        "size": job.file_size
+    })
+
+    await uploads.bot.send_message(
+        chat_id=job.chat_id,
+        text=f"✅ File '{job.file_name}' for *{job.subject}* submitted successfully!"
+    )
+    admin_digest.add(job.subject, job.submitted_by)
+    if duplicate_detector is not None:
+        asyncio.create_task(flag_duplicates(record))
+
+async def flag_duplicates(record):
     try:
-        new_file = await context.bot.get_file(file.file_id)
-        await new_file.download_to_drive(file_path)
+        matches = await duplicate_detector.check(record)
+        if matches:
+            await notify_admin(format_matches(record, matches))
     except Exception as e:
-        await update.message.reply_text(f"❌ Error downloading file: {str(e)}")
-        return
+        print(f"⚠️ Duplicate check failed for {record['file_name']}: {e}")
 
-    submitted_files.append({
-        "file_name": file.file_name,
-        "file_id": file.file_id,
-        "submitted_by": update.effective_user.username or "Unknown User",
-        "subject": subject,
-        "submission_date": datetime.now().strftime("%Y-%m-%d")
-    })
-    save_submitted_files()
+async def notify_admin(text):
+    await uploads.bot.send_message(chat_id=ADMIN_ID, text=text)
 
-    await update.message.reply_text(f"✅ File '{file.file_name}' for *{subject}* submitted successfully!")
-    await context.bot.send_message(
-        chat_id=ADMIN_ID,
-        text=f"📥 New assignment submitted for *{subject}* by @{update.effective_user.username or 'Unknown'}."
-    )
-    context.user_data.pop("selected_subject", None)
+async def upload_failed(job, error):
+    file_store.unreserve(job.user_id, job.subject, job.file_size)
+    flood_guard.upload_finished(job.user_id)
+    await uploads.bot.send_message(chat_id=job.chat_id, text=f"❌ Error downloading file: {str(error)}")
 
 async def handle_view_assignments(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if str(update.effective_user.id) != ADMIN_ID:
         await update.message.reply_text("❌ You are not authorized to view assignments.")
         return
 
-    keyboard = [[subject] for subject in subjects]
-    keyboard.append(["Exit"])
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    reply_markup = subject_menu(render_cache, subjects)
     await update.message.reply_text(
         "📅 *Assignments*:\n\n"
         "Click on an the subject below to view its details! 💪",
         reply_markup=reply_markup,
         parse_mode="Markdown"
     )
-    context.user_data["viewing_subject"] = True
+    set_state(context, VIEWING_SUBJECT)
 
 async def handle_add_exam_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if str(update.effective_user.id) != ADMIN_ID:
         await update.message.reply_text("❌ You are not authorized to add exams.")
         return
 
-    context.user_data["adding_exam"] = {"step": "name"}
+    context.user_data.pop("exam_draft", None)
+    set_state(context, ADDING_EXAM_NAME)
     await update.message.reply_text("📚 Enter exam name:")
 
 async def handle_delete_exam(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -181,7 +238,7 @@ async def handle_delete_exam(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("📭 No exams to delete.")
         return
 
-    context.user_data["deleting_exam"] = True
+    set_state(context, DELETING_EXAM)
     await show_exams(update, context)
     await update.message.reply_text("Please enter the exam number to delete.")
 
@@ -191,9 +248,8 @@ async def handle_exam_announcement(update: Update, context: ContextTypes.DEFAULT
         return
 
     is_admin = str(update.effective_user.id) == ADMIN_ID
-    keyboard = [[InlineKeyboardButton(f"📚 {exam['name']}", callback_data=f"exam_{i}")] for i, exam in enumerate(exam_dates)]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
+    reply_markup = exam_buttons(render_cache, exam_dates)
+
     if is_admin:
         await update.message.reply_text("📅 Scheduled exams:", reply_markup=reply_markup)
     else:
@@ -203,250 +259,273 @@ async def handle_exam_details(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
 
-    if not query.data or "_" not in query.data:
-        await query.edit_message_text("❌ Invalid exam selection.")
+    exam = exam_lookup(render_cache, exam_dates).get(query.data.removeprefix("exam_"))
+    if exam is None:
+        await query.edit_message_text("❌ This exam is no longer scheduled.")
         return
 
+    await query.edit_message_text(exam_details(render_cache, exam), parse_mode="Markdown")
+
+async def show_page(query, reply_markup):
     try:
-        index = int(query.data.split("_")[1])
-        if 0 <= index < len(exam_dates):
-            exam = exam_dates[index]
-            await query.edit_message_text(
-                f"📚 *Exam Details:*\n"
-                f"📖 *Name:* {exam['name']}\n"
-                f"📅 *Date:* {exam['date']}\n"
-                f"⏰ *Time:* {exam['time']}\n"
-                f"📝 *Content:* {exam['content']}\n\n"
-                "✅ Stay prepared!",
-                parse_mode="Markdown"
-            )
-        else:
-            await query.edit_message_text("❌ Invalid exam index.")
-    except (ValueError, IndexError):
-        await query.edit_message_text("❌ An error occurred while processing your request.")
+        await query.edit_message_reply_markup(reply_markup)
+    except BadRequest as e:
+        # Tapping the "n/m" button re-renders the page that is already shown.
+        if "not modified" not in str(e):
+            raise
+
+async def handle_exam_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    try:
+        offset = int(query.data.removeprefix("exams_"))
+    except ValueError:
+        return
+    await show_page(query, exam_buttons(render_cache, exam_dates, clamp_offset(offset, len(exam_dates))))
 
 async def handle_post_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if str(update.effective_user.id) != ADMIN_ID:
         await update.message.reply_text("❌ You are not authorized to broadcast messages.")
         return
 
-    context.user_data["pending_broadcast"] = True
+    set_state(context, PENDING_BROADCAST)
     await update.message.reply_text("✉️ Send the message to broadcast.")
 
 async def buy_me_coffee(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Buy me coffee? @kipa_s 😁😁")
 
-async def text_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
+# === Conversation steps (routed by the dispatcher on the user's state) ===
+async def delete_exam_by_number(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    try:
+        idx = int(text) - 1
+        if 0 <= idx < len(exam_dates):
+            removed = exam_dates.pop(idx)
+            render_cache.invalidate("exams")
+            exam_scheduler.remove(removed["id"])
+            persistence.submit(storage.delete_exams, [removed["id"]])
+            await update.message.reply_text(f"✅ Deleted exam: {removed['name']}")
+        else:
+            await update.message.reply_text("❌ Invalid exam number.")
+    except ValueError:
+        await update.message.reply_text("❌ Please enter a valid number.")
+    set_state(context, IDLE)
+
+async def preview_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
+    context.user_data["broadcast_message"] = text
+    set_state(context, CONFIRM_BROADCAST)
+    await update.message.reply_text(f"📢 Preview:\n{text}\n\nType 'yes' to send or 'no' to cancel.")
 
-    if context.user_data.get("deleting_exam"):
-        try:
-            idx = int(text) - 1
-            if 0 <= idx < len(exam_dates):
-                removed = exam_dates.pop(idx)
-                save_exam_dates()
-                await update.message.reply_text(f"✅ Deleted exam: {removed['name']}")
-            else:
-                await update.message.reply_text("❌ Invalid exam number.")
-        except ValueError:
-            await update.message.reply_text("❌ Please enter a valid number.")
-        context.user_data.pop("deleting_exam", None)
-        return
+async def confirm_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    if text.lower() == "yes":
+        message = context.user_data["broadcast_message"]
+        status = await update.message.reply_text(f"📤 Broadcasting to {len(users)} user(s) in the background...")
+        job = await asyncio.to_thread(BroadcastJob.create, message, users.ids(), update.effective_chat.id, status.message_id)
+        context.application.create_task(run_broadcast(context.bot, job))
+    else:
+        await update.message.reply_text("❌ Broadcast canceled.")
+    set_state(context, IDLE)
+    context.user_data.pop("broadcast_message", None)
+
+async def select_subject(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    context.user_data["selected_subject"] = text
+    set_state(context, IDLE)
+    await update.message.reply_text(
+        f"✅ You selected *{text}*. Please upload your assignment file now.",
+        parse_mode="Markdown"
+    )
+
+@needs_submissions
+async def view_subject(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    set_state(context, IDLE)
+    subject_files = submitted_files.by_subject(text)
 
-    if context.user_data.get("pending_broadcast"):
-        context.user_data["broadcast_message"] = text
-        context.user_data["confirm_broadcast"] = True
-        context.user_data["pending_broadcast"] = False
-        await update.message.reply_text(f"📢 Preview:\n{text}\n\nType 'yes' to send or 'no' to cancel.")
+    if not subject_files:
+        await update.message.reply_text(f"ℹ️ No assignments submitted for *{text}*.")
         return
 
-    if context.user_data.get("confirm_broadcast"):
-        if text.lower() == "yes":
-            message = context.user_data["broadcast_message"]
-            failed = 0
-            for uid in user_ids:
-                try:
-                    await context.bot.send_message(chat_id=uid, text=message)
-                except Exception:
-                    failed += 1
-            await update.message.reply_text(f"✅ Broadcast complete. Failed to reach {failed} user(s).")
-        else:
-            await update.message.reply_text("❌ Broadcast canceled.")
-        context.user_data.pop("confirm_broadcast", None)
-        context.user_data.pop("broadcast_message", None)
+    report = await deliver(
+        context.bot, update.effective_chat.id, subject_files,
+        caption=lambda file: f"📂 File: {file['file_name']}\nSubmitted by: @{file['submitted_by']}",
+        label=text, mode=DELIVERY_MODE, exporter=zip_exporter
+    )
+    await update.message.reply_text(f"✅ All assignments for *{text}* have been sent.\n{report.summary()}")
+
+async def invalid_subject(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text("❌ Invalid subject. Please select a valid subject from the list.")
+
+@needs_submissions
+async def filter_by_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    try:
+        entered_date = datetime.strptime(text, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        await update.message.reply_text("❌ Invalid date format. Please enter the date in `YYYY-MM-DD` format.")
         return
-    
-    if context.user_data.get("selecting_subject"):
-        if text in subjects:
-            context.user_data["selected_subject"] = text
-            context.user_data["selecting_subject"] = False
-            await update.message.reply_text(
-                f"✅ You selected *{text}*. Please upload your assignment file now.",
-                parse_mode="Markdown"
-            )
-        elif text == "Exit":
-            await return_to_main_menu(update, context)
-        else:
-            await update.message.reply_text("❌ Invalid subject. Please select a valid subject from the list.")
+
+    set_state(context, IDLE)
+    date_files = submitted_files.by_date(entered_date)
+
+    if not date_files:
+        await update.message.reply_text(f"ℹ️ No assignments were submitted on *{entered_date}*.")
         return
 
-    if context.user_data.get("viewing_subject"):
-        if text in subjects:
-            context.user_data["viewing_subject"] = False
-            subject_files = [file for file in submitted_files if file.get("subject") == text]
-            
-            if not subject_files:
-                await update.message.reply_text(f"ℹ️ No assignments submitted for *{text}*.")
-                return
+    report = await deliver(
+        context.bot, update.effective_chat.id, date_files,
+        caption=lambda file: f"📂 File: {file['file_name']}\nSubject: {file['subject']}\nSubmitted by: @{file['submitted_by']}\nDate: {file['submission_date']}",
+        label=entered_date, mode=DELIVERY_MODE, exporter=zip_exporter
+    )
+    await update.message.reply_text(f"✅ All assignments submitted on *{entered_date}* have been sent.\n{report.summary()}")
 
-            for file in subject_files:
-                try:
-                    await context.bot.send_document(
-                        chat_id=update.effective_chat.id,
-                        document=file["file_id"],
-                        caption=f"📂 File: {file['file_name']}\nSubmitted by: @{file['submitted_by']}"
-                    )
-                except Exception as e:
-                    await update.message.reply_text(f"❌ Error sending file {file['file_name']}: {str(e)}")
-            
-            await update.message.reply_text(f"✅ All assignments for *{text}* have been sent.")
-        elif text == "Exit":
-            await return_to_main_menu(update, context)
-        else:
-            await update.message.reply_text("❌ Invalid subject. Please select a valid subject from the list.")
+async def exam_name_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data["exam_draft"] = {"name": update.message.text.strip()}
+    set_state(context, ADDING_EXAM_DATE)
+    await update.message.reply_text("📅 Enter exam date (YYYY-MM-DD):")
+
+async def exam_date_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    try:
+        datetime.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        await update.message.reply_text("❌ Invalid date format.")
         return
-   
-    if context.user_data.get("filtering_by_date"):
-        try:
-            entered_date = datetime.strptime(text, "%Y-%m-%d").strftime("%Y-%m-%d")
-            context.user_data["filtering_by_date"] = False
-            date_files = [file for file in submitted_files if file.get("submission_date") == entered_date]
-            
-            if not date_files:
-                await update.message.reply_text(f"ℹ️ No assignments were submitted on *{entered_date}*.")
-                return
+    context.user_data["exam_draft"]["date"] = text
+    set_state(context, ADDING_EXAM_TIME)
+    await update.message.reply_text("⏰ Enter exam time (HH:MM):")
 
-            for file in date_files:
-                try:
-                    await context.bot.send_document(
-                        chat_id=update.effective_chat.id,
-                        document=file["file_id"],
-                        caption=f"📂 File: {file['file_name']}\nSubject: {file['subject']}\nSubmitted by: @{file['submitted_by']}\nDate: {file['submission_date']}"
-                    )
-                except Exception as e:
-                    await update.message.reply_text(f"❌ Error sending file {file['file_name']}: {str(e)}")
-            
-            await update.message.reply_text(f"✅ All assignments submitted on *{entered_date}* have been sent.")
-        except ValueError:
-            await update.message.reply_text("❌ Invalid date format. Please enter the date in `YYYY-MM-DD` format.")
+async def exam_time_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    try:
+        datetime.strptime(text, "%H:%M")
+    except ValueError:
+        await update.message.reply_text("❌ Invalid time format.")
         return
-    
-    if "adding_exam" in context.user_data:
-        step = context.user_data["adding_exam"]["step"]
-
-        if step == "name":
-            context.user_data["adding_exam"]["name"] = text
-            context.user_data["adding_exam"]["step"] = "date"
-            await update.message.reply_text("📅 Enter exam date (YYYY-MM-DD):")
-
-        elif step == "date":
-            try:
-                datetime.strptime(text, "%Y-%m-%d")
-                context.user_data["adding_exam"]["date"] = text
-                context.user_data["adding_exam"]["step"] = "time"
-                await update.message.reply_text("⏰ Enter exam time (HH:MM):")
-            except ValueError:
-                await update.message.reply_text("❌ Invalid date format.")
-
-        elif step == "time":
-            try:
-                datetime.strptime(text, "%H:%M")
-                context.user_data["adding_exam"]["time"] = text
-                context.user_data["adding_exam"]["step"] = "content"
-                await update.message.reply_text("📝 Enter exam content (e.g., syllabus):")
-            except ValueError:
-                await update.message.reply_text("❌ Invalid time format.")
-
-        elif step == "content":
-            context.user_data["adding_exam"]["content"] = text
-            context.user_data["adding_exam"]["step"] = "verify"
-            data = context.user_data["adding_exam"]
-            await update.message.reply_text(
-                f"📚 Confirm:\nName: {data['name']}\nDate: {data['date']}\nTime: {data['time']}\nContent: {data['content']}\nType 'yes' to confirm or 'no' to cancel."
+    context.user_data["exam_draft"]["time"] = text
+    set_state(context, ADDING_EXAM_CONTENT)
+    await update.message.reply_text("📝 Enter exam content (e.g., syllabus):")
+
+async def exam_content_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    data = context.user_data["exam_draft"]
+    data["content"] = update.message.text.strip()
+    set_state(context, ADDING_EXAM_VERIFY)
+    await update.message.reply_text(
+        f"📚 Confirm:\nName: {data['name']}\nDate: {data['date']}\nTime: {data['time']}\nContent: {data['content']}\nType 'yes' to confirm or 'no' to cancel."
+    )
+
+async def exam_verify_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    data = context.user_data.pop("exam_draft", None)
+    set_state(context, IDLE)
+    if update.message.text.strip().lower() == "yes" and data:
+        exam = {
+            "id": str(uuid.uuid4()),
+            "name": data["name"],
+            "date": data["date"],
+            "time": data["time"],
+            "content": data["content"]
+        }
+        exam_dates.append(exam)
+        render_cache.invalidate("exams")
+        exam_scheduler.add(exam)
+        persistence.submit(storage.add_exam, exam)
+        await update.message.reply_text(f"✅ Exam '{data['name']}' scheduled.")
+    else:
+        await update.message.reply_text("❌ Exam scheduling canceled.")
+
+async def run_broadcast(bot, job):
+    """Run (or resume) a persisted broadcast job and keep the admin's status message up to date."""
+    already_delivered = job.delivered()
+
+    async def report_progress(stats):
+        if job.status_message_id is None:
+            return
+        try:
+            await bot.edit_message_text(
+                f"📤 Broadcast in progress...\n{stats.summary()}",
+                chat_id=job.admin_chat_id,
+                message_id=job.status_message_id
             )
+        except Exception:
+            pass
 
-        elif step == "verify":
-            if text.lower() == "yes":
-                data = context.user_data["adding_exam"]
-                exam_dates.append({"id": str(uuid.uuid4()), **data})
-                save_exam_dates()
-                await update.message.reply_text(f"✅ Exam '{data['name']}' scheduled.")
-            else:
-                await update.message.reply_text("❌ Exam scheduling canceled.")
-            context.user_data.pop("adding_exam", None)
-        return
+    stats = await Broadcaster(bot).run(job.pending(), job.text, on_progress=report_progress, on_result=job.record)
+    await asyncio.to_thread(job.finish)
 
-    if text == "Exit":
-        await return_to_main_menu(update, context)
-        return
+    dead = users.remove(job.dead_recipients())
+
+    resumed = f"\nResumed job: {already_delivered} already delivered before restart." if already_delivered else ""
+    await bot.send_message(
+        chat_id=job.admin_chat_id,
+        text=f"✅ Broadcast complete.\n{stats.summary()}\nPruned {len(dead)} unreachable user(s).{resumed}"
+    )
 
 async def return_to_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Helper function to return to the main menu."""
     is_admin = str(update.effective_user.id) == ADMIN_ID
-    keyboard = [
-        ["Exam Announcement", "View Assignments"] if is_admin else ["Submit Group Assignment", "Submit Individual Assignment"],
-        ["Add Exam Date", "Delete Exam"] if is_admin else ["Exam Announcement"],
-        ["Post Message", "Buy me coffee"] if is_admin else ["Manage Files", "Buy me coffee"]
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    await update.message.reply_text("🔙 Returning to the main menu:", reply_markup=reply_markup)
+    reply_markup = main_menu(render_cache, is_admin)
+    await update.effective_message.reply_text("🔙 Returning to the main menu:", reply_markup=reply_markup)
     
     # Clear any active context
-    for key in ["selecting_subject", "viewing_subject", "filtering_by_date", "adding_exam"]:
-        context.user_data.pop(key, None)
-
-async def remove_past_exams():
-    while True:
-        now = datetime.now()
-        for exam in list(exam_dates):
-            try:
-                exam_date = datetime.strptime(exam["date"], "%Y-%m-%d")
-                if exam_date < now:
-                    exam_dates.remove(exam)
-            except ValueError:
-                continue
-        save_exam_dates()
-        await asyncio.sleep(3600)  # Check every hour
+    set_state(context, IDLE)
+    context.user_data.pop("exam_draft", None)
+
+async def expire_exams(exam_ids):
+    expired = set(exam_ids)
+    exam_dates[:] = [exam for exam in exam_dates if exam["id"] not in expired]
+    render_cache.invalidate("exams")
+    persistence.submit(storage.delete_exams, list(expired))
+
+async def send_exam_reminder(bot, exam, label):
+    text = f"⏰ Reminder: {exam['name']} starts in {label} ({exam['date']} {exam['time']})."
+    job = await asyncio.to_thread(BroadcastJob.create, text, users.ids(), ADMIN_ID)
+    asyncio.create_task(run_broadcast(bot, job))
+
+def sync_exam(exam_id, exam):
+    """Apply an exam added or deleted by another worker."""
+    exam_scheduler.remove(exam_id)
+    exam_dates[:] = [e for e in exam_dates if e["id"] != exam_id]
+    if exam is not None:
+        exam_dates.append(exam)
+        exam_scheduler.add(exam)
+    render_cache.invalidate("exams")
+
+async def sync_submission(submission_id, record):
+    await submitted_files.preload()
+    submitted_files.sync(submission_id, record)
+    if record is not None:
+        uploads.remember(record.get("file_unique_id"), record.get("sha256"))
 
 async def show_exams(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not exam_dates:
         await update.message.reply_text("ℹ️ No exams scheduled.")
         return
 
-    msg = "\n".join([
-        f"{i+1}. {e['name']} - {e['date']} {e['time']} (ID: {e['id'][:6]})" 
-        for i, e in enumerate(exam_dates)
-    ])
-    await update.message.reply_text(f"📚 Exams:\n{msg}")
+    await update.message.reply_text(exam_list_text(render_cache, exam_dates))
 
+def manage_files_markup(user_id, offset=0):
+    """One page of a student's files; buttons carry ``delete_{id}``, pages ``files_{offset}``."""
+    return page_markup(
+        submitted_files.iter_by("user_id", user_id), offset, submitted_files.count("user_id", user_id),
+        lambda file: (f"📂 {file['file_name']}", f"delete_{file['id']}"), "files_",
+        extra_rows=[[InlineKeyboardButton("Exit", callback_data="exit_manage_files")]]
+    )
+
+@needs_submissions
 async def handle_manage_files(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_files = [
-        file for file in submitted_files 
-        if file.get("submitted_by") == (update.effective_user.username or str(update.effective_user.id))
-    ]
+    user_id = update.effective_user.id
+    submitted_files.claim(user_id, update.effective_user.username)
 
-    if not user_files:
+    if not submitted_files.count("user_id", user_id):
         await update.message.reply_text("ℹ️ You have not submitted any files.")
         return
 
-    keyboard = [
-        [InlineKeyboardButton(f"📂 {file['file_name']}", callback_data=f"delete_{i}")]
-        for i, file in enumerate(user_files)
-    ]
-    keyboard.append([InlineKeyboardButton("Exit", callback_data="exit_manage_files")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text("📂 Your submitted files:", reply_markup=reply_markup)
+    await update.message.reply_text("📂 Your submitted files:", reply_markup=manage_files_markup(user_id))
 
+@needs_submissions
 async def handle_file_deletion(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -456,22 +535,24 @@ async def handle_file_deletion(update: Update, context: ContextTypes.DEFAULT_TYP
         return
 
     try:
-        if query.data.startswith("delete_"):
-            index = int(query.data.split("_")[1])
-            user_files = [
-                file for file in submitted_files 
-                if file.get("submitted_by") == (query.from_user.username or str(query.from_user.id))
-            ]
-
-            if 0 <= index < len(user_files):
-                file = user_files[index]
-                file_path = f"submissions/{file['subject']}/{file['file_name']}"
+        if query.data.startswith("files_"):
+            user_id = query.from_user.id
+            offset = clamp_offset(int(query.data.split("_")[1]), submitted_files.count("user_id", user_id))
+            await show_page(query, manage_files_markup(user_id, offset))
+        elif query.data.startswith("delete_"):
+            submission_id = int(query.data.split("_")[1])
+            submitted_files.claim(query.from_user.id, query.from_user.username)
+            file = submitted_files.get(submission_id)
+
+            if file and file.get("user_id") == query.from_user.id:
+                # Archived files live inside a shared archive; only the record goes.
+                file_path = None if file.get("archive") else local_path(file)
 
                 try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                    submitted_files.remove(file)
-                    save_submitted_files()
+                    # Claim the record before touching the disk so a concurrent tap on the
+                    # same button cannot delete it twice.
+                    submitted_files.remove(submission_id)
+                    await asyncio.to_thread(release, file_path, file.get("sha256"))
                     await query.edit_message_text(f"✅ File '{file['file_name']}' has been deleted.")
                 except Exception as e:
                     await query.edit_message_text(f"❌ Error deleting file: {str(e)}")
@@ -480,6 +561,86 @@ async def handle_file_deletion(update: Update, context: ContextTypes.DEFAULT_TYP
     except (ValueError, IndexError) as e:
         await query.edit_message_text("❌ An error occurred while processing your request.")
 
+FIND_QUERIES_KEPT = 20  # recent /find queries whose result messages can still be paged
+
+def find_markup(text, search_id, offset=0):
+    """One page of search results; buttons carry ``found_{id}``, pages ``find_{search_id}_{offset}``."""
+    ids = search_index.search(text)
+    return len(ids), page_markup(ids, clamp_offset(offset, len(ids)), len(ids), find_button, f"find_{search_id}_")
+
+def remember_find_query(context, text):
+    """Keep ``text`` under a short id for the pager buttons (queries can exceed the 64-byte callback limit)."""
+    queries = context.user_data.setdefault("find_queries", {})
+    search_id = str(context.user_data.get("find_counter", 0) + 1)
+    context.user_data["find_counter"] = int(search_id)
+    queries[search_id] = text
+    for old in sorted(queries, key=int)[:-FIND_QUERIES_KEPT]:
+        del queries[old]
+    return search_id
+
+def find_button(submission_id):
+    file = submitted_files.get(submission_id)
+    return f"📄 {file['file_name']} · @{file['submitted_by']} · {file['submission_date']}", f"found_{submission_id}"
+
+@needs_submissions
+async def handle_find(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if str(update.effective_user.id) != ADMIN_ID:
+        await update.message.reply_text("❌ You are not authorized to search submissions.")
+        return
+
+    text = " ".join(context.args)
+    if not text:
+        await update.message.reply_text(
+            "🔎 Usage: /find words...\n"
+            "Words match the start of file names, usernames and subjects. "
+            "Narrow with by:username, subject:word or name:word, and dates like "
+            "2025-01-15, 2025-01 or 2025-01-01..2025-01-31."
+        )
+        return
+
+    search_id = remember_find_query(context, text)
+    total, reply_markup = find_markup(text, search_id)
+    if not total:
+        await update.message.reply_text(f"🔎 No submissions match “{text}”.")
+        return
+    await update.message.reply_text(f"🔎 {total} submission(s) match “{text}”:", reply_markup=reply_markup)
+
+@needs_submissions
+async def handle_find_result(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    if str(query.from_user.id) != ADMIN_ID:
+        return
+
+    try:
+        if query.data.startswith("find_"):
+            # Page the search this message showed, not whichever one the admin ran last.
+            search_id, offset = query.data.removeprefix("find_").split("_")
+            text = context.user_data.get("find_queries", {}).get(search_id)
+            if text is None:
+                await query.edit_message_text("⌛ This search has expired. Run /find again.")
+                return
+            await show_page(query, find_markup(text, search_id, int(offset))[1])
+        else:
+            file = submitted_files.get(int(query.data.removeprefix("found_")))
+            if file is None:
+                await query.message.reply_text("❌ This submission no longer exists.")
+                return
+            await context.bot.send_document(
+                chat_id=query.message.chat_id,
+                document=file["file_id"],
+                caption=f"📂 File: {file['file_name']}\nSubject: {file['subject']}\nSubmitted by: @{file['submitted_by']}\nDate: {file['submission_date']}"
+            )
+    except ValueError:
+        pass
+
+async def handle_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if str(update.effective_user.id) != ADMIN_ID:
+        await update.message.reply_text("❌ You are not authorized to view stats.")
+        return
+
+    await update.message.reply_text(stats_report())
+
 async def handle_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     is_admin = str(update.effective_user.id) == ADMIN_ID
     
@@ -489,7 +650,9 @@ async def handle_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             "Here are the commands you can use:\n\n"
             "🔹 /start - Start the bot and display the main menu\n"
             "🔹 /exams - View the list of scheduled exams\n"
-            "🔹 /help - Show this help message\n\n"
+            "🔹 /help - Show this help message\n"
+            "🔹 /stats - Handler latency, Bot API calls and queue depths\n"
+            "🔹 /find - Search submissions by file name, student, subject or date\n\n"
             "👨‍💻 *Admin Features:*\n"
             "1️⃣ Add Exam Date - Schedule a new exam\n"
             "2️⃣ Delete Exam - Remove an existing exam\n"
@@ -511,40 +674,358 @@ async def handle_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     
     await update.message.reply_text(help_text, parse_mode="Markdown")
 
-def main():
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+# === Anti-flood ===
+FLOOD_NOTICES = {
+    "rate": "⏳ You're sending messages too fast. Please wait a moment.",
+    "uploads": "⏳ Your other files are still being saved. Send this one again once they're done.",
+}
+
+def admit_update(update):
+    """Runs before every update (see UserOrderedApplication.admit); False drops it."""
+    reason = flood_guard.check(update)
+    if reason is None:
+        return True
+    message, query = update.message, update.callback_query
+    if query is not None:
+        # Telegram keeps the button spinning until the query is answered, dropped or not
+        asyncio.create_task(answer_dropped_query(query, FLOOD_NOTICES.get(reason)))
+    elif reason in FLOOD_NOTICES and message is not None and flood_guard.should_notify(update.effective_user.id):
+        asyncio.create_task(send_flood_notice(message, FLOOD_NOTICES[reason]))
+    return False
+
+async def send_flood_notice(message, text):
+    try:
+        await message.reply_text(text)
+    except TelegramError:
+        pass
+
+async def answer_dropped_query(query, text):
+    try:
+        await query.answer(text)
+    except TelegramError:
+        pass  # already answered, e.g. a retried update
+
+# === Text routing table ===
+dispatcher = Dispatcher(wrap=timed)
+dispatcher.button("Submit Group Assignment", handle_assignment_button)
+dispatcher.button("Submit Individual Assignment", handle_assignment_button)
+dispatcher.button("Exam Announcement", handle_exam_announcement)
+dispatcher.button("Add Exam Date", handle_add_exam_date)
+dispatcher.button("Delete Exam", handle_delete_exam)
+dispatcher.button("View Assignments", handle_view_assignments)
+dispatcher.button("Post Message", handle_post_message)
+dispatcher.button("Buy me coffee", buy_me_coffee)
+dispatcher.button("Manage Files", handle_manage_files)
+
+dispatcher.on(IDLE, "Exit", return_to_main_menu)
+for state in (SELECTING_SUBJECT, VIEWING_SUBJECT):
+    dispatcher.on(state, "Exit", return_to_main_menu)
+    dispatcher.on_text(state, invalid_subject)
+for subject in subjects:
+    dispatcher.on(SELECTING_SUBJECT, subject, select_subject)
+    dispatcher.on(VIEWING_SUBJECT, subject, view_subject)
+
+dispatcher.on_text(DELETING_EXAM, delete_exam_by_number)
+dispatcher.on_text(PENDING_BROADCAST, preview_broadcast)
+dispatcher.on_text(CONFIRM_BROADCAST, confirm_broadcast)
+dispatcher.on_text(FILTERING_BY_DATE, filter_by_date)
+dispatcher.on_text(ADDING_EXAM_NAME, exam_name_step)
+dispatcher.on_text(ADDING_EXAM_DATE, exam_date_step)
+dispatcher.on_text(ADDING_EXAM_TIME, exam_time_step)
+dispatcher.on_text(ADDING_EXAM_CONTENT, exam_content_step)
+dispatcher.on_text(ADDING_EXAM_VERIFY, exam_verify_step)
+
+def load_state():
+    """Open storage and build the bot's in-memory state.
+
+    Users and exams are read here; the submission history is loaded in the
+    background once the bot is running (see ``startup`` in :func:`create_app`).
+    """
+    global IS_LEADER, storage, persistence, users, exam_dates, submitted_files, change_feed, file_store
+    global uploads, zip_exporter, exam_scheduler, loop_lag, flood_guard, admin_digest, search_index
+    global duplicate_detector
+    IS_LEADER = partition(int(ADMIN_ID), WORKERS) == WORKER_INDEX
+    storage = open_storage(worker=str(WORKER_INDEX) if WORKERS > 1 else None)
+    persistence = PersistenceService(storage)
+    users = UserRegistry(storage, persistence)
+    exam_dates = storage.load_exams()
+    submitted_files = SubmissionStore(storage, persistence, id_offset=WORKER_INDEX, id_step=WORKERS, lazy=True)
+    file_store = StorageManager(submitted_files, USER_QUOTA_MB * MB, SUBJECT_QUOTA_MB * MB, RETENTION_DAYS)
+    search_index = SearchIndex(submitted_files)
+    duplicate_detector = DuplicateDetector(submitted_files, DUPLICATE_WORKERS) if DUPLICATE_WORKERS > 0 else None
+    uploads = UploadPipeline(upload_complete, upload_failed)
+    zip_exporter = ZipExporter()
+    exam_scheduler = ExamScheduler(expire_exams, None)
+    loop_lag = LoopLagMonitor()
+    flood_guard = FloodGuard(FLOOD_RATE, FLOOD_BURST, MAX_USER_UPLOADS, exempt=[int(ADMIN_ID)])
+    admin_digest = SubmissionDigest(notify_admin, max_window=ADMIN_DIGEST_SECONDS)
+
+    change_feed = ChangeFeed(storage, persistence)
+    change_feed.on("users", storage.get_user, users.sync, key=int)
+    change_feed.on("exams", storage.get_exam, sync_exam)
+    change_feed.on("submissions", storage.get_submission, sync_submission, key=int)
+
+    REGISTRY.gauge("bot_users", "Known users", lambda: len(users))
+    REGISTRY.gauge("bot_submissions", "Stored submissions", lambda: len(submitted_files.records))
+    REGISTRY.gauge("bot_exams", "Scheduled exams", lambda: len(exam_dates))
+    REGISTRY.gauge("bot_upload_queue_depth", "Files waiting to be downloaded", lambda: uploads.queue.qsize())
+    REGISTRY.gauge("bot_storage_pending_writes", "Storage writes waiting for the next flush", lambda: len(persistence.pending))
+    REGISTRY.gauge("bot_render_cache_hits_total", "Menus and messages served from the render cache",
+                   lambda: render_cache.hits, kind="counter")
+    REGISTRY.gauge("bot_render_cache_misses_total", "Menus and messages rendered from scratch",
+                   lambda: render_cache.misses, kind="counter")
+    REGISTRY.gauge("bot_submission_bytes", "Bytes of submitted files (before archiving)",
+                   lambda: submitted_files.total_size)
+    REGISTRY.gauge("bot_submissions_archived_total", "Submissions packed into archives by this process",
+                   lambda: file_store.archived, kind="counter")
+    REGISTRY.gauge("bot_storage_flushes_total", "Storage batches written", lambda: persistence.flushes, kind="counter")
+    REGISTRY.gauge("bot_flood_tracked_users", "Users with anti-flood state in memory", lambda: len(flood_guard))
+    REGISTRY.gauge("bot_admin_digests_sent_total", "Submission notifications sent to the admin",
+                   lambda: admin_digest.sent, kind="counter")
+    REGISTRY.gauge("bot_admin_digest_events_total", "Submissions reported to the admin",
+                   lambda: admin_digest.received, kind="counter")
+    if duplicate_detector is not None:
+        REGISTRY.gauge("bot_duplicate_files_analysed_total", "Files hashed and fingerprinted for duplicate checks",
+                       lambda: duplicate_detector.analysed, kind="counter")
+        REGISTRY.gauge("bot_duplicates_flagged_total", "Submissions reported to the admin as duplicates",
+                       lambda: duplicate_detector.flagged, kind="counter")
+
+def check_config():
+    if not BOT_TOKEN or not ADMIN_ID:
+        raise ValueError("BOT_TOKEN or ADMIN_ID not found in .env file.")
+
+def create_app(request=None):
+    """Build the bot application: load state, register handlers and the startup/shutdown hooks.
+
+    ``request`` replaces the HTTP client used for Bot API calls (the startup
+    benchmark passes one that answers locally).
+    """
+    check_config()
+    load_state()
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .base_url(f"{BOT_API_URL}/bot")
+        .base_file_url(f"{BOT_API_URL}/file/bot")
+        .request(InstrumentedRequest(request or HTTPXRequest(connection_pool_size=256)))
+        .persistence(StatePersistence(storage, persistence, owns=lambda uid: partition(uid, WORKERS) == WORKER_INDEX))
+        .application_class(UserOrderedApplication, kwargs={"update_slots": CONCURRENT_UPDATES})
+        .concurrent_updates(PENDING_UPDATES)
+        .build()
+    )
+    # Anti-flood checks run before an update waits for its user's lock or an update slot
+    app.admit = admit_update
 
     # Command handlers
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("exams", show_exams))
-    app.add_handler(CommandHandler("help", handle_help))
+    app.add_handler(CommandHandler("start", timed(start)))
+    app.add_handler(CommandHandler("exams", timed(show_exams)))
+    app.add_handler(CommandHandler("help", timed(handle_help)))
+    app.add_handler(CommandHandler("stats", timed(handle_stats)))
+    app.add_handler(CommandHandler("find", timed(handle_find)))
 
     # Callback handlers
-    app.add_handler(CallbackQueryHandler(handle_exam_details, pattern="^exam_"))
-    app.add_handler(CallbackQueryHandler(handle_file_deletion, pattern="^(delete_|exit_manage_files)"))
-
-    # Message handlers
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("Submit Group Assignment"), handle_assignment_button))
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("Submit Individual Assignment"), handle_assignment_button))
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("Exam Announcement"), handle_exam_announcement))
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("Add Exam Date"), handle_add_exam_date))
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("Delete Exam"), handle_delete_exam))
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("View Assignments"), handle_view_assignments))
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("Post Message"), handle_post_message))
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("Buy me coffee"), buy_me_coffee))
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("Manage Files"), handle_manage_files))
-    app.add_handler(MessageHandler(filters.Document.ALL, handle_file_submission))
-    app.add_handler(MessageHandler(filters.TEXT, text_router))
+    app.add_handler(CallbackQueryHandler(timed(handle_exam_details), pattern="^exam_"))
+    app.add_handler(CallbackQueryHandler(timed(handle_exam_page), pattern="^exams_"))
+    app.add_handler(CallbackQueryHandler(timed(handle_find_result), pattern="^(find_|found_)"))
+    app.add_handler(CallbackQueryHandler(timed(handle_file_deletion), pattern="^(delete_|files_|exit_manage_files)"))
+
+    # Message handlers (text branches are timed by the dispatcher)
+    app.add_handler(MessageHandler(filters.Document.ALL, timed(handle_file_submission)))
+    app.add_handler(MessageHandler(filters.TEXT, dispatcher.dispatch))
 
     # Error handling
     app.add_error_handler(error_handler)
 
+    # Health and metrics server for polling mode (webhook mode serves them itself)
+    health_server = None
+    if BOT_MODE == "polling" and not KEEP_ALIVE:
+        health_server = make_server(app, None)
+
     # Startup task
-    async def startup(_):
-        asyncio.create_task(remove_past_exams())
+    async def startup(app):
+        register_app_metrics(app)
+        asyncio.create_task(loop_lag.run())
+        if health_server is not None:
+            await health_server.start()
+            print(f"🩺 Health and metrics server listening on port {PORT}")
+        persistence.start()
+        uploads.start(app.bot)
+        removed = await asyncio.to_thread(clean_stale_parts)
+        if removed:
+            print(f"🧹 Removed {removed} unfinished download(s) left by a crash")
+        asyncio.create_task(users.run())
+        if WORKERS > 1:
+            asyncio.create_task(change_feed.run(prune=IS_LEADER))
+        exam_scheduler.on_reminder = functools.partial(send_exam_reminder, app.bot)
+        if not IS_LEADER:
+            exam_scheduler.reminders = ()
+        for exam in exam_dates:
+            exam_scheduler.add(exam)
+        asyncio.create_task(exam_scheduler.run())
+        asyncio.create_task(load_submissions())
+        if IS_LEADER:
+            for job in await asyncio.to_thread(load_unfinished_jobs):
+                app.create_task(run_broadcast(app.bot, job))
+
+    async def load_submissions():
+        started = time.perf_counter()
+        await submitted_files.preload()
+        for record in submitted_files:
+            uploads.remember(record.get("file_unique_id"), record.get("sha256"))
+        print(f"🗂 Loaded {len(submitted_files)} submissions in {time.perf_counter() - started:.2f}s")
+        if IS_LEADER:
+            await file_store.run()
+
+    async def stopped(_):
+        # The bot can still send until shutdown: let queued uploads finish (or tell
+        # their owners to resend), then send the last digest.
+        await uploads.stop()
+        await admin_digest.close()
+
+    async def shutdown(_):
+        if health_server is not None:
+            await health_server.stop()
+        if duplicate_detector is not None:
+            duplicate_detector.stop()
+        users.flush()
+        await persistence.close()
 
     app.post_init = startup
-    app.run_polling()
+    app.post_stop = stopped
+    app.post_shutdown = shutdown
+    return app
+
+def main():
+    check_config()
+    if WORKERS > 1 and BOT_MODE != "worker":
+        asyncio.run(run_router())
+        return
+
+    app = create_app()
+    if BOT_MODE == "webhook":
+        asyncio.run(run_webhook(app))
+    elif BOT_MODE == "worker":
+        asyncio.run(run_webhook(app, FORWARD_PATH, CLUSTER_SECRET, register=False))
+    else:
+        if KEEP_ALIVE:
+            keep_alive()
+        app.run_polling()
+
+def register_app_metrics(app):
+    REGISTRY.gauge("bot_update_queue_depth", "Updates waiting to be processed", lambda: app.update_queue.qsize())
+    REGISTRY.gauge("bot_users_in_flight", "Users with an update being processed or queued", lambda: len(app.user_locks))
+
+def make_server(app, on_update, webhook_path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET):
+    """HTTP server for health, readiness and /metrics; also the webhook when ``on_update`` is set."""
+    server = WebServer(
+        on_update,
+        is_ready=lambda: app.running,
+        metrics=REGISTRY.render,
+        port=PORT,
+        webhook_path=webhook_path,
+        secret_token=secret_token
+    )
+    REGISTRY.gauge("bot_uptime_seconds", "Seconds since the server started", lambda: round(time.time() - server.started))
+    if on_update is not None:
+        REGISTRY.gauge("bot_updates_received_total", "Webhook updates received",
+                       lambda: server.updates_received, kind="counter")
+        REGISTRY.gauge("bot_webhook_bad_requests_total", "Webhook payloads that were not valid JSON",
+                       lambda: server.bad_requests, kind="counter")
+    return server
+
+async def run_webhook(app, webhook_path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET, register=True):
+    """Receive updates through a webhook served from this event loop instead of polling.
+
+    Workers use the same server with ``register=False``: the router forwards
+    updates to them instead of Telegram.
+    """
+    if register and not WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL must be set when BOT_MODE=webhook.")
+
+    async def on_update(data):
+        await app.update_queue.put(Update.de_json(data, app.bot))
+
+    server = make_server(app, on_update, webhook_path, secret_token)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await app.initialize()
+    await app.post_init(app)
+    await server.start()
+    await app.start()
+    if register:
+        await app.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES
+        )
+    print(f"🌐 {'Webhook' if register else f'Worker {WORKER_INDEX}'} server listening on port {PORT}")
+    try:
+        await stop.wait()
+    finally:
+        await server.stop()
+        await app.stop()
+        await app.post_stop(app)
+        await app.shutdown()
+        await app.post_shutdown(app)
+
+async def run_router():
+    """Receive updates (webhook or polling) and fan them out by user id to WORKERS worker processes.
+
+    Workers run this same script with BOT_MODE=worker on ports PORT+1...PORT+WORKERS
+    and share the SQLite database, so a restarted worker resumes where it left off.
+    """
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL must be set when BOT_MODE=webhook.")
+
+    secret = CLUSTER_SECRET or secrets.token_urlsafe(24)
+    pool = WorkerPool(os.path.abspath(__file__), WORKERS, PORT + 1, {"BOT_MODE": "worker", "CLUSTER_SECRET": secret})
+    router = Router(pool.urls(FORWARD_PATH), secret)
+    bot = Bot(BOT_TOKEN, base_url=f"{BOT_API_URL}/bot", base_file_url=f"{BOT_API_URL}/file/bot")
+    REGISTRY.gauge("bot_router_forwarded_total", "Updates forwarded to workers", lambda: router.forwarded, kind="counter")
+    REGISTRY.gauge("bot_router_dropped_total", "Updates no worker accepted", lambda: router.failed, kind="counter")
+    REGISTRY.gauge("bot_router_queue_depth", "Updates waiting to be forwarded",
+                   lambda: sum(queue.qsize() for queue in router.queues))
+
+    webhook = BOT_MODE == "webhook"
+    poller = None
+    # When polling, the router is only ready while its getUpdates task is alive.
+    server = WebServer(router.route if webhook else None, metrics=REGISTRY.render,
+                       is_ready=lambda: webhook or (poller is not None and not poller.done()),
+                       port=PORT, webhook_path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    pool.start()
+    await router.start()
+    await server.start()
+    async with bot:
+        if webhook:
+            await bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES
+            )
+        else:
+            await bot.delete_webhook()
+            poller = asyncio.create_task(router.poll(bot))
+        print(f"🔀 Routing updates to {WORKERS} workers on ports {PORT + 1}-{PORT + WORKERS}")
+        try:
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pool.check()
+        finally:
+            if poller is not None:
+                poller.cancel()
+            await server.stop()
+            await router.stop()
+            await asyncio.to_thread(pool.stop)
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Log errors and send a message to the user."""
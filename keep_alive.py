@@ -1,13 +1,16 @@
-from flask import Flask
 from threading import Thread
 
-app = Flask(__name__)
-
-@app.route('/')
-def home():
-    return "Bot is alive!"
 
 def run():
+    # Flask is only needed for this legacy keep-alive mode, so import it here.
+    from flask import Flask
+
+    app = Flask(__name__)
+
+    @app.route('/')
+    def home():
+        return "Bot is alive!"
+
     app.run(host='0.0.0.0', port=8080)
 
 def keep_alive():
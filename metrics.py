@@ -0,0 +1,268 @@
+import time
+import asyncio
+import functools
+from bisect import bisect_left
+
+from telegram.request import BaseRequest
+
+# Upper bounds in seconds, from a fast reply to a slow file download.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOOP_LAG_INTERVAL = 0.5
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else f"{value:.6g}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Gauge:
+    """A value that is either set directly or read from ``fn()`` at scrape time."""
+
+    def __init__(self, name, help, fn=None, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        if self.fn is None:
+            return self.value
+        try:
+            return self.fn()
+        except Exception:
+            return 0
+
+    def samples(self):
+        yield self.name, "", self.get()
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels; quantiles are estimated from the buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *labels):
+        series = self.series.get(labels)
+        return series[2] if series else 0
+
+    def quantile(self, q, *labels):
+        series = self.series.get(labels)
+        if not series or not series[2]:
+            return 0.0
+        rank = q * series[2]
+        seen = 0
+        for i, n in enumerate(series[0]):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def samples(self):
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                yield (self.name + "_bucket",
+                       _format_labels(self.labelnames + ("le",), labels + (le,)), cumulative)
+            label_text = _format_labels(self.labelnames, labels)
+            yield self.name + "_sum", label_text, total
+            yield self.name + "_count", label_text, count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name, help, fn, kind="gauge"):
+        """Register (or replace) a gauge read from ``fn()``; ``kind="counter"`` for running totals."""
+        return self.register(Gauge(name, help, fn, kind))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+HANDLER_SECONDS = REGISTRY.register(Histogram(
+    "bot_handler_seconds", "Time spent in each update handler", ("handler",)))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    "bot_handler_errors_total", "Handler calls that raised, by exception type", ("handler", "error")))
+API_SECONDS = REGISTRY.register(Histogram(
+    "bot_api_request_seconds", "Latency of outgoing Bot API calls", ("method",)))
+API_CALLS = REGISTRY.register(Counter(
+    "bot_api_requests_total", "Outgoing Bot API calls by method and outcome", ("method", "outcome")))
+LOOP_LAG = REGISTRY.register(Histogram(
+    "bot_event_loop_lag_seconds", "How late the event loop wakes up a sleeping task"))
+UPDATES_DROPPED = REGISTRY.register(Counter(
+    "bot_updates_dropped_total", "Updates dropped before any handler ran, by reason", ("reason",)))
+STORAGE_FLUSH_SECONDS = REGISTRY.register(Histogram(
+    "bot_storage_flush_seconds", "Time to apply one batch of queued storage writes"))
+
+
+def timed(handler, name=None):
+    """Wrap an ``(update, context)`` handler so its latency and errors are recorded."""
+    label = name or handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception as e:
+            HANDLER_ERRORS.inc(label, type(e).__name__)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, label)
+
+    return wrapper
+
+
+class InstrumentedRequest(BaseRequest):
+    """Wraps another request object and records every Bot API call by method and outcome.
+
+    Pass it to ``ApplicationBuilder().request(...)``; the outcome label is
+    ``ok`` or the name of the raised ``TelegramError`` (``RetryAfter``,
+    ``Forbidden``, ``TimedOut``...).
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+    async def initialize(self):
+        await self.request.initialize()
+
+    async def shutdown(self):
+        await self.request.shutdown()
+
+    async def do_request(self, *args, **kwargs):
+        return await self.request.do_request(*args, **kwargs)
+
+    async def post(self, url, *args, **kwargs):
+        method = url.rsplit("/", 1)[-1]
+        outcome = "ok"
+        started = time.perf_counter()
+        try:
+            return await super().post(url, *args, **kwargs)
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            API_SECONDS.observe(time.perf_counter() - started, method)
+            API_CALLS.inc(method, outcome)
+
+
+class LoopLagMonitor:
+    """Sleeps ``interval`` seconds at a time and records how late each wakeup was."""
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.last = 0.0
+        REGISTRY.gauge("bot_event_loop_lag_last_seconds", "Most recent event loop lag sample", lambda: self.last)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last = max(0.0, loop.time() - expected)
+            LOOP_LAG.observe(self.last)
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.0f} ms" if seconds >= 0.001 else f"{seconds * 1000:.2f} ms"
+
+
+def stats_report(top=10):
+    """Plain-text summary of the registry for the admin ``/stats`` command."""
+    lines = ["📊 Handlers (calls · p50 · p99 · errors):"]
+    handlers = sorted(HANDLER_SECONDS.series, key=lambda labels: -HANDLER_SECONDS.count(*labels))
+    for labels in handlers[:top]:
+        errors = sum(v for (handler, _), v in HANDLER_ERRORS.values.items() if (handler,) == labels)
+        lines.append(f"• {labels[0]}: {HANDLER_SECONDS.count(*labels)} · {_ms(HANDLER_SECONDS.quantile(0.5, *labels))}"
+                     f" · {_ms(HANDLER_SECONDS.quantile(0.99, *labels))} · {errors}")
+    if not handlers:
+        lines.append("• no updates handled yet")
+
+    lines.append("\n📡 Bot API (calls · p99 · errors):")
+    methods = sorted(API_SECONDS.series, key=lambda labels: -API_SECONDS.count(*labels))
+    for labels in methods[:top]:
+        errors = {outcome: v for (method, outcome), v in API_CALLS.values.items()
+                  if (method,) == labels and outcome != "ok"}
+        error_text = ", ".join(f"{outcome} {v}" for outcome, v in sorted(errors.items())) or "0"
+        lines.append(f"• {labels[0]}: {API_SECONDS.count(*labels)}"
+                     f" · {_ms(API_SECONDS.quantile(0.99, *labels))} · {error_text}")
+    if not methods:
+        lines.append("• no calls yet")
+
+    if UPDATES_DROPPED.values:
+        lines.append("\n🚧 Dropped updates: " + ", ".join(
+            f"{reason} {count}" for (reason,), count in sorted(UPDATES_DROPPED.values.items())))
+
+    lines.append(f"\n⏱ Event loop lag p99: {_ms(LOOP_LAG.quantile(0.99))}")
+    if STORAGE_FLUSH_SECONDS.count():
+        lines.append(f"💾 Storage flush p99: {_ms(STORAGE_FLUSH_SECONDS.quantile(0.99))}"
+                     f" over {STORAGE_FLUSH_SECONDS.count()} flush(es)")
+    gauges = [metric for metric in REGISTRY.metrics.values() if isinstance(metric, Gauge)]
+    if gauges:
+        lines.append("")
+        lines.extend(f"• {gauge.name.removeprefix('bot_')}: {_format_value(gauge.get())}" for gauge in gauges)
+    return "\n".join(lines)
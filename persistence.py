@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import STORAGE_FLUSH_SECONDS
+
+FLUSH_DELAY = 0.05  # seconds to wait for more writes before flushing a burst
+RETRY_DELAY = 1  # first wait after a failed batch; doubles up to MAX_RETRY_DELAY
+MAX_RETRY_DELAY = 30  # longest wait between attempts when a whole batch fails
+CLOSE_TIMEOUT = 10  # seconds shutdown waits for a failing storage before giving up
+
+logger = logging.getLogger(__name__)
+
+
+class PersistenceService:
+    """Runs storage writes on a dedicated thread so handlers never block on disk.
+
+    Handlers call :meth:`submit` with a bound storage method; a writer task
+    collects everything queued within ``flush_delay`` and applies it inside one
+    ``storage.batch()`` on the storage thread, so a burst of submissions costs a
+    single file rewrite (JSON) or a single transaction (SQLite). Writes are
+    applied in submission order. If any write or the batch itself fails
+    (database busy or locked, disk full) the whole batch goes back to the
+    front of the queue and is retried with exponential backoff, so storage
+    writes must be safe to apply twice.
+    """
+
+    def __init__(self, storage, flush_delay=FLUSH_DELAY):
+        self.storage = storage
+        self.flush_delay = flush_delay
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage")
+        self.pending = []
+        self.waiters = []
+        self.wakeup = None
+        self.task = None
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self._writer())
+            if self.pending:
+                self.wakeup.set()
+
+    def submit(self, fn, *args):
+        """Queue ``fn(*args)`` to run on the storage thread; returns immediately."""
+        self.pending.append((fn, args))
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def run(self, fn, *args):
+        """Run a blocking call (storage read, file operation) on the storage thread."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def _apply(self, ops):
+        with self.storage.batch():
+            for fn, args in ops:
+                try:
+                    fn(*args)
+                except Exception:
+                    logger.exception("Storage write %s failed", getattr(fn, "__name__", fn))
+                    raise
+
+    async def _flush_pending(self):
+        ops, self.pending = self.pending, []
+        waiters, self.waiters = self.waiters, []
+        if ops:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            try:
+                await loop.run_in_executor(self.executor, self._apply, ops)
+            except Exception:
+                # Cancellation is not caught: the storage thread still finishes that batch.
+                self.pending[:0] = ops
+                self.waiters[:0] = waiters
+                raise
+            self.last_flush_seconds = loop.time() - started
+            STORAGE_FLUSH_SECONDS.observe(self.last_flush_seconds)
+            self.flushes += 1
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _writer(self):
+        retry_delay = RETRY_DELAY
+        while True:
+            await self.wakeup.wait()
+            await asyncio.sleep(self.flush_delay)
+            self.wakeup.clear()
+            try:
+                await self._flush_pending()
+            except Exception as e:
+                logger.warning("Storage batch failed (%d writes kept, retrying in %ss): %s",
+                               len(self.pending), retry_delay, e)
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                self.wakeup.set()
+            else:
+                retry_delay = RETRY_DELAY
+
+    async def flush(self):
+        """Wait until everything submitted so far is on disk."""
+        if self.task is None or self.task.done():
+            await self._flush_pending()
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.wakeup.set()
+        await waiter
+
+    async def close(self):
+        """Flush outstanding writes and stop the writer; call once on shutdown."""
+        try:
+            await asyncio.wait_for(self.flush(), CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self._flush_pending()
+        except Exception as e:
+            logger.error("%d storage writes could not be saved on shutdown: %s", len(self.pending), e)
+        await self.run(self.storage.close)
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,120 @@
+from itertools import islice
+
+from telegram import ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
+
+PAGE_SIZE = 8
+
+MARKDOWN_V2_ESCAPES = str.maketrans({char: "\\" + char for char in r"_*[]()~`>#+-=|{}.!"})
+
+ADMIN_MENU = [
+    ["Exam Announcement", "View Assignments"],
+    ["Add Exam Date", "Delete Exam"],
+    ["Post Message", "Buy me coffee"],
+]
+STUDENT_MENU = [
+    ["Submit Group Assignment", "Submit Individual Assignment"],
+    ["Exam Announcement"],
+    ["Manage Files", "Buy me coffee"],
+]
+
+
+def escape_markdown_v2(text):
+    return text.translate(MARKDOWN_V2_ESCAPES)
+
+
+class RenderCache:
+    """Memoizes rendered messages and keyboards under ``(group, ...)`` keys.
+
+    ``get(key, build)`` returns the cached value or stores ``build()``;
+    ``invalidate(group)`` drops every entry of a group, e.g. all exam views
+    after ``exam_dates`` changes. Markup objects are immutable in
+    python-telegram-bot 20, so one instance can be sent to every user.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            value = self.entries[key] = build()
+        else:
+            self.hits += 1
+        return value
+
+    def invalidate(self, group):
+        for key in [key for key in self.entries if key[0] == group]:
+            del self.entries[key]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def main_menu(cache, is_admin):
+    return cache.get(("menu", is_admin), lambda: ReplyKeyboardMarkup(
+        ADMIN_MENU if is_admin else STUDENT_MENU, resize_keyboard=True))
+
+
+def subject_menu(cache, subjects):
+    return cache.get(("menu", "subjects"), lambda: ReplyKeyboardMarkup(
+        [[subject] for subject in subjects] + [["Exit"]], resize_keyboard=True))
+
+
+def exam_list_text(cache, exams):
+    return cache.get(("exams", "list"), lambda: "📚 Exams:\n" + "\n".join(
+        f"{i + 1}. {e['name']} - {e['date']} {e['time']} (ID: {e['id'][:6]})" for i, e in enumerate(exams)))
+
+
+def page_markup(items, offset, total, button, nav_prefix, extra_rows=(), page_size=PAGE_SIZE):
+    """Inline keyboard for one page: a button per item plus a Prev/Next row.
+
+    ``items`` is an iterable over the whole listing; only the ``page_size``
+    items starting at ``offset`` are consumed. ``button(item)`` returns the
+    item's ``(text, callback_data)`` and navigation buttons carry
+    ``{nav_prefix}{offset}``, so every callback has a bounded size no matter
+    how long the listing is.
+    """
+    rows = [[InlineKeyboardButton(text, callback_data=data)]
+            for text, data in map(button, islice(items, offset, offset + page_size))]
+    nav = []
+    if offset > 0:
+        nav.append(InlineKeyboardButton("« Prev", callback_data=f"{nav_prefix}{max(0, offset - page_size)}"))
+    if total > page_size:
+        nav.append(InlineKeyboardButton(f"{offset // page_size + 1}/{-(-total // page_size)}",
+                                        callback_data=f"{nav_prefix}{offset}"))
+    if offset + page_size < total:
+        nav.append(InlineKeyboardButton("Next »", callback_data=f"{nav_prefix}{offset + page_size}"))
+    if nav:
+        rows.append(nav)
+    rows.extend(extra_rows)
+    return InlineKeyboardMarkup(rows)
+
+
+def clamp_offset(offset, total, page_size=PAGE_SIZE):
+    """Keep a page offset from a (possibly stale) callback within the listing's current pages."""
+    last_page = max(total - 1, 0) // page_size * page_size
+    return min(max(offset, 0), last_page)
+
+
+def exam_lookup(cache, exams):
+    return cache.get(("exams", "by_id"), lambda: {exam["id"]: exam for exam in exams})
+
+
+def exam_buttons(cache, exams, offset=0):
+    """One page of exam buttons; callback data is ``exam_{id}``, pages are ``exams_{offset}``."""
+    return cache.get(("exams", "page", offset), lambda: page_markup(
+        exams, offset, len(exams), lambda exam: (f"📚 {exam['name']}", f"exam_{exam['id']}"), "exams_"))
+
+
+def exam_details(cache, exam):
+    return cache.get(("exams", "details", exam["id"]), lambda: (
+        f"📚 *Exam Details:*\n"
+        f"📖 *Name:* {exam['name']}\n"
+        f"📅 *Date:* {exam['date']}\n"
+        f"⏰ *Time:* {exam['time']}\n"
+        f"📝 *Content:* {exam['content']}\n\n"
+        "✅ Stay prepared!"
+    ))
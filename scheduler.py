@@ -0,0 +1,109 @@
+import heapq
+import asyncio
+from datetime import datetime, timedelta
+
+# How long before an exam students are reminded, with the wording used in the message.
+REMINDERS = [(timedelta(hours=24), "24 hours"), (timedelta(hours=1), "1 hour")]
+MAX_SLEEP = 24 * 3600  # re-check at least daily in case the wall clock jumps
+
+EXPIRE = "expire"
+REMIND = "remind"
+
+
+def exam_datetime(exam):
+    """When ``exam`` starts; exams without a usable time last until the end of their day."""
+    try:
+        return datetime.strptime(f"{exam['date']} {exam['time']}", "%Y-%m-%d %H:%M")
+    except (KeyError, TypeError, ValueError):
+        pass
+    try:
+        return datetime.strptime(exam["date"], "%Y-%m-%d") + timedelta(days=1)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class ExamScheduler:
+    """Expires exams and sends reminders from a single min-heap of timed events.
+
+    Each exam contributes an ``expire`` event at its start time and ``remind``
+    events ahead of it. The run loop sleeps until the earliest event (or until
+    :meth:`add`/:meth:`remove` changes the heap) and only then does any work.
+    Removal is lazy: every event carries the version of the exam it was
+    scheduled for, and events whose exam was removed or re-added since are
+    skipped when popped. ``on_expire(exam_ids)`` is awaited once per batch of exams that
+    started together, ``on_reminder(exam, label)`` once per reminder.
+    """
+
+    def __init__(self, on_expire, on_reminder, reminders=REMINDERS):
+        self.on_expire = on_expire
+        self.on_reminder = on_reminder
+        self.reminders = reminders
+        self.heap = []
+        self.active = {}
+        self.versions = {}  # exam id -> counter value when it was last added
+        self.counter = 0
+        self.wakeup = asyncio.Event()
+
+    def _push(self, when, kind, exam_id, label=None):
+        self.counter += 1
+        heapq.heappush(self.heap, (when, self.counter, kind, exam_id, label, self.versions[exam_id]))
+
+    def add(self, exam, now=None):
+        when = exam_datetime(exam)
+        if when is None:
+            return False
+        now = now or datetime.now()
+        self.counter += 1
+        self.active[exam["id"]] = exam
+        self.versions[exam["id"]] = self.counter  # events pushed for an earlier add go stale
+        self._push(when, EXPIRE, exam["id"])
+        for before, label in self.reminders:
+            if when - before > now:
+                self._push(when - before, REMIND, exam["id"], label)
+        self.wakeup.set()
+        return True
+
+    def remove(self, exam_id):
+        self.active.pop(exam_id, None)
+        self.versions.pop(exam_id, None)
+        self.wakeup.set()
+
+    def _stale(self, event):
+        return self.versions.get(event[3]) != event[5]
+
+    def next_event_time(self):
+        while self.heap and self._stale(self.heap[0]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    async def run_due(self, now=None):
+        """Fire every event scheduled at or before ``now``."""
+        now = now or datetime.now()
+        expired = []
+        while self.next_event_time() is not None and self.heap[0][0] <= now:
+            _, _, kind, exam_id, label, _ = heapq.heappop(self.heap)
+            exam = self.active.get(exam_id)
+            if kind == EXPIRE:
+                del self.active[exam_id]
+                del self.versions[exam_id]
+                expired.append(exam_id)
+            else:
+                try:
+                    await self.on_reminder(exam, label)
+                except Exception as e:
+                    print(f"⚠️ Reminder for {exam['name']} failed: {e}")
+        if expired:
+            await self.on_expire(expired)
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            await self.run_due()
+            when = self.next_event_time()
+            timeout = MAX_SLEEP
+            if when is not None:
+                timeout = min(MAX_SLEEP, max(0.0, (when - datetime.now()).total_seconds()))
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
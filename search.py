@@ -0,0 +1,231 @@
+import re
+from bisect import bisect_left, insort
+from functools import reduce
+from itertools import islice
+from operator import itemgetter, or_
+
+WORD = re.compile(r"[^\W_]+")
+DATE = re.compile(r"^(\d{4}-\d{2}(?:-\d{2})?)(?:\.\.(\d{4}-\d{2}(?:-\d{2})?))?$")
+FIELDS = {"name": "file_name", "by": "submitted_by", "subject": "subject"}
+SEARCHED_FIELDS = tuple(FIELDS.values())
+NONZERO = re.compile(rb"[^\x00]")
+
+MASK_ABOVE = 512  # postings with at least this many ids also keep a bitmap
+SORT_BELOW = 2048  # set results up to this size are sorted outright; larger ones are walked lazily
+
+
+def words(text):
+    return WORD.findall(text.lower()) if text else []
+
+
+def to_mask(ids):
+    """An int with bit ``i`` set for every ``i`` in ``ids``."""
+    buf = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def newest_first(mask):
+    """The set bits of ``mask``, highest first (zero bytes are skipped by the regex engine)."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "big")
+    last = len(data) - 1
+    for match in NONZERO.finditer(data):
+        byte, base = data[match.start()], (last - match.start()) * 8
+        while byte:
+            bit = byte.bit_length() - 1
+            yield base + bit
+            byte ^= 1 << bit
+
+
+def _date_bounds(start, end):
+    # A month ("2025-01") covers all of its days.
+    end = end or start
+    return start, end + "\uffff" if len(end) == 7 else end
+
+
+def parse_query(text):
+    """Split a search into ``(field or None, word prefix)`` terms and a ``(from, to)`` date range or None.
+
+    Bare words match the start of any word in the file name, submitter or
+    subject (``lab rep`` finds ``Lab_Report_3.pdf``); ``name:``, ``by:`` and
+    ``subject:`` restrict a word to one field. Dates are a day
+    (``2025-01-15``), a month (``2025-01``) or a range (``2025-01-01..2025-01-31``).
+    """
+    terms, dates = [], None
+    for part in text.split():
+        prefix, _, value = part.partition(":")
+        field = FIELDS.get(prefix.lower()) if value else None
+        match = DATE.match(part)
+        if match:
+            start, end = _date_bounds(*match.groups())
+            dates = (max(start, dates[0]), min(end, dates[1])) if dates else (start, end)
+            continue
+        terms.extend((field, word) for word in words(value if field else part))
+    return terms, dates
+
+
+class SearchResults:
+    """The ids matching a search: ``len()`` counts them, iterating yields them newest first.
+
+    Iteration is lazy, so showing the first page of a broad search costs
+    that page rather than ordering every match.
+    """
+
+    def __init__(self, total, newest):
+        self.total = total
+        self.newest = newest
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        return self.newest()
+
+
+NO_RESULTS = SearchResults(0, lambda: iter(()))
+
+
+class SearchIndex:
+    """In-memory inverted index over a ``SubmissionStore``.
+
+    Every word of a submission's file name, submitter and subject, and its
+    submission date, maps to the set of ids containing it; a sorted key list
+    per field turns a prefix or a date range into a range of keys. Keys
+    with at least ``MASK_ABOVE`` ids also keep the set as a bitmap (an int
+    with bit ``id`` set), so broad terms combine with a few big-int ANDs
+    and ORs instead of walking sets of tens of thousands of ids. The index
+    follows the store (it registers itself as an observer), so additions,
+    deletions and other workers' changes are applied as they happen.
+
+    A search whose keys all have bitmaps is answered from them; otherwise it
+    starts from its most selective term and narrows that set with each other
+    term. The last result is cached until the store changes, so paging
+    through it costs one page.
+    """
+
+    DATE = "submission_date"
+
+    def __init__(self, store):
+        self.store = store
+        self.postings = {field: {} for field in SEARCHED_FIELDS + (self.DATE,)}
+        self.sorted_keys = {field: [] for field in self.postings}
+        self.masks = {field: {} for field in self.postings}
+        self.pending = {}
+        self.ids = []
+        self.version = 0
+        self.cached = (None, None, None)
+        store.observers.append(self)
+        for record in sorted(store.records.values(), key=itemgetter("id")):
+            self.add(record)
+
+    def _keys(self, record):
+        for field in SEARCHED_FIELDS:
+            for word in set(words(record.get(field))):
+                yield field, word
+        if record.get(self.DATE):
+            yield self.DATE, record[self.DATE]
+
+    def add(self, record):
+        submission_id = record["id"]
+        if self.ids and self.ids[-1] < submission_id:
+            self.ids.append(submission_id)
+        else:
+            insort(self.ids, submission_id)
+        for field, key in self._keys(record):
+            postings, masks = self.postings[field], self.masks[field]
+            ids = postings.get(key)
+            if ids is None:
+                ids = postings[key] = set()
+                insort(self.sorted_keys[field], key)
+            ids.add(submission_id)
+            if key in masks:
+                # Setting a bit rewrites the whole bitmap, so new ids are folded in batches.
+                pending = self.pending.setdefault((field, key), [])
+                pending.append(submission_id)
+                if len(pending) >= MASK_ABOVE:
+                    self._mask(field, key)
+            elif len(ids) >= MASK_ABOVE:
+                masks[key] = to_mask(ids)
+        self.version += 1
+
+    def remove(self, record):
+        submission_id = record["id"]
+        i = bisect_left(self.ids, submission_id)
+        if i < len(self.ids) and self.ids[i] == submission_id:
+            del self.ids[i]
+        for field, key in self._keys(record):
+            postings, masks = self.postings[field], self.masks[field]
+            ids = postings.get(key)
+            if ids is None:
+                continue
+            ids.discard(submission_id)
+            if key in masks:
+                if len(ids) < MASK_ABOVE // 2:
+                    del masks[key]
+                    self.pending.pop((field, key), None)
+                else:
+                    masks[key] = self._mask(field, key) & ~(1 << submission_id)
+            if not ids:
+                del postings[key]
+                sorted_keys = self.sorted_keys[field]
+                del sorted_keys[bisect_left(sorted_keys, key)]
+        self.version += 1
+
+    def _mask(self, field, key):
+        pending = self.pending.pop((field, key), None)
+        if pending:
+            self.masks[field][key] |= to_mask(pending)
+        return self.masks[field][key]
+
+    def _range(self, field, start, end=None):
+        """``(ids, bitmap or None)`` for every key of ``field`` from ``start`` to ``end`` (or starting with ``start``)."""
+        sorted_keys, postings, masks = self.sorted_keys[field], self.postings[field], self.masks[field]
+        matches = []
+        for i in range(bisect_left(sorted_keys, start), len(sorted_keys)):
+            key = sorted_keys[i]
+            if key > end if end is not None else not key.startswith(start):
+                break
+            matches.append((postings[key], self._mask(field, key) if key in masks else None))
+        return matches
+
+    def _term(self, field, prefix):
+        return [match for f in ((field,) if field else SEARCHED_FIELDS) for match in self._range(f, prefix)]
+
+    def search(self, text):
+        """The submissions matching every term of ``text`` as :class:`SearchResults`."""
+        self.store._ensure_loaded()
+        text = " ".join(text.split())
+        version, cached_text, results = self.cached
+        if version == self.version and cached_text == text:
+            return results
+        results = self._search(text)
+        self.cached = (self.version, text, results)
+        return results
+
+    def _search(self, text):
+        terms, dates = parse_query(text)
+        groups = [self._term(field, prefix) for field, prefix in terms]
+        if dates:
+            groups.append(self._range(self.DATE, *dates))
+        if not groups or not all(groups):
+            return NO_RESULTS
+
+        # Each group is one term; a submission must match some key of every group.
+        if all(mask is not None for group in groups for _, mask in group):
+            mask = -1
+            for group in groups:
+                mask &= reduce(or_, (mask for _, mask in group))
+            return SearchResults(mask.bit_count(), lambda: newest_first(mask))
+
+        sets = sorted(([ids for ids, _ in group] for group in groups), key=lambda sets: sum(map(len, sets)))
+        ids = sets[0][0] if len(sets[0]) == 1 else set().union(*sets[0])
+        for group in sets[1:]:
+            if not ids:
+                break
+            # Intersecting with each set separately only visits the smaller side of every pair.
+            ids = ids & group[0] if len(group) == 1 else set().union(*(ids & other for other in group))
+        if len(ids) <= SORT_BELOW:
+            ordered = sorted(ids, reverse=True)
+            return SearchResults(len(ids), lambda: iter(ordered))
+        return SearchResults(len(ids), lambda: islice(filter(ids.__contains__, reversed(self.ids)), len(ids)))
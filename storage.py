@@ -0,0 +1,551 @@
+import os
+import json
+import time
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+USER_IDS_FILE = "user_ids.json"
+USERS_FILE = "users.json"
+EXAM_DATES_FILE = "exam_dates.json"
+SUBMITTED_FILES_FILE = "submitted_files.json"
+USER_STATE_FILE = "user_state.json"
+DB_PATH = "bot.db"
+
+USER_FIELDS = ("user_id", "username", "first_seen", "last_seen", "is_admin")
+EXAM_FIELDS = ("id", "name", "date", "time", "content")
+SUBMISSION_FIELDS = (
+    "id", "file_name", "file_id", "submitted_by", "subject", "submission_date",
+    "file_unique_id", "sha256", "path", "size", "archive", "user_id",
+)
+
+
+def read_json(path, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def write_json(path, data):
+    """Write ``data`` to ``path`` atomically (temp file + rename)."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class Storage(ABC):
+    """Persistence interface for users, exams and submissions.
+
+    ``load_*`` return fresh containers for the bot to keep in memory; the other
+    methods record a single change that the bot has already applied in memory.
+    A backend missing one of the abstract methods fails when it is constructed.
+    """
+
+    @abstractmethod
+    def load_users(self):
+        """Return ``{user_id: {"user_id", "username", "first_seen", "last_seen", "is_admin"}}``."""
+        ...
+
+    @abstractmethod
+    def upsert_users(self, users):
+        ...
+
+    @abstractmethod
+    def remove_users(self, user_ids):
+        ...
+
+    @abstractmethod
+    def load_exams(self):
+        ...
+
+    @abstractmethod
+    def add_exam(self, exam):
+        ...
+
+    @abstractmethod
+    def delete_exams(self, exam_ids):
+        ...
+
+    @abstractmethod
+    def load_submissions(self):
+        ...
+
+    @abstractmethod
+    def add_submission(self, record):
+        """Store ``record``; its ``id`` has already been assigned by the caller."""
+        ...
+
+    @abstractmethod
+    def delete_submission(self, submission_id):
+        ...
+
+    @abstractmethod
+    def update_submission(self, submission_id, fields):
+        """Change some ``fields`` (e.g. ``path``, ``archive``) of a stored submission."""
+        ...
+
+    @abstractmethod
+    def load_user_states(self):
+        """Return ``{user_id: conversation data}`` as saved by :meth:`save_user_states`."""
+        ...
+
+    @abstractmethod
+    def save_user_states(self, states):
+        """Store ``{user_id: data}``; empty data deletes the user's entry."""
+        ...
+
+    def get_user(self, user_id):
+        return self.load_users().get(user_id)
+
+    def get_exam(self, exam_id):
+        return next((exam for exam in self.load_exams() if exam["id"] == exam_id), None)
+
+    def get_submission(self, submission_id):
+        return next((record for record in self.load_submissions() if record["id"] == submission_id), None)
+
+    def changes_since(self, seq):
+        """Return ``[(seq, collection, key, worker)]`` written by any worker after ``seq``.
+
+        Only shared backends keep a change log; single-process backends have
+        nothing to report.
+        """
+        return []
+
+    def last_change(self):
+        return 0
+
+    @contextmanager
+    def batch(self):
+        """Group several changes into one write (one file rewrite / one transaction)."""
+        yield
+
+    def close(self):
+        pass
+
+
+def owners_by_username(users):
+    """``{username: user_id}`` for usernames held by exactly one known user.
+
+    Submissions made before ``user_id`` was stored only name their submitter;
+    this gives them back an owner wherever the name is unambiguous.
+    """
+    owners, taken = {}, set()
+    for user in users:
+        name = user.get("username")
+        if name in owners:
+            taken.add(name)
+        elif name:
+            owners[name] = user["user_id"]
+    return {name: uid for name, uid in owners.items() if name not in taken}
+
+
+class JsonStorage(Storage):
+    """The original layout: one JSON file per collection, rewritten on every change."""
+
+    def __init__(self, directory="."):
+        self.users_path = os.path.join(directory, USERS_FILE)
+        self.exams_path = os.path.join(directory, EXAM_DATES_FILE)
+        self.submissions_path = os.path.join(directory, SUBMITTED_FILES_FILE)
+        self.states_path = os.path.join(directory, USER_STATE_FILE)
+        self.users = {int(uid): user for uid, user in read_json(self.users_path, {}).items()}
+        if not self.users:
+            # Older installs only kept a bare list of IDs.
+            for uid in read_json(os.path.join(directory, USER_IDS_FILE), []):
+                self.users[uid] = {"user_id": uid, "username": None, "first_seen": None,
+                                   "last_seen": None, "is_admin": False}
+        self.exams = read_json(self.exams_path, [])
+        self.submissions = read_json(self.submissions_path, [])
+        self.states = {int(uid): data for uid, data in read_json(self.states_path, {}).items()}
+        next_id = max((record.get("id") or 0 for record in self.submissions), default=0) + 1
+        owners = owners_by_username(self.users.values())
+        for record in self.submissions:
+            if record.get("id") is None:
+                record["id"] = next_id
+                next_id += 1
+            if "user_id" not in record:
+                record["user_id"] = owners.get(record.get("submitted_by"))
+        self.dirty = set()
+        self.batching = False
+
+    def _changed(self, path):
+        self.dirty.add(path)
+        if not self.batching:
+            self._write_dirty()
+
+    def _write_dirty(self):
+        data = {
+            self.users_path: lambda: self.users,
+            self.exams_path: lambda: self.exams,
+            self.submissions_path: lambda: self.submissions,
+            self.states_path: lambda: self.states,
+        }
+        for path in self.dirty:
+            write_json(path, data[path]())
+        self.dirty.clear()
+
+    @contextmanager
+    def batch(self):
+        if self.batching:
+            yield
+            return
+        self.batching = True
+        try:
+            yield
+        finally:
+            self.batching = False
+            self._write_dirty()
+
+    def load_users(self):
+        return {uid: dict(user) for uid, user in self.users.items()}
+
+    def upsert_users(self, users):
+        for user in users:
+            self.users[user["user_id"]] = dict(user)
+        self._changed(self.users_path)
+
+    def remove_users(self, user_ids):
+        for uid in user_ids:
+            self.users.pop(uid, None)
+        self._changed(self.users_path)
+
+    def load_exams(self):
+        return [dict(exam) for exam in self.exams]
+
+    def add_exam(self, exam):
+        # Replacing by id keeps a retried batch from adding the exam twice.
+        self.exams = [e for e in self.exams if e["id"] != exam["id"]] + [dict(exam)]
+        self._changed(self.exams_path)
+
+    def delete_exams(self, exam_ids):
+        exam_ids = set(exam_ids)
+        self.exams = [exam for exam in self.exams if exam["id"] not in exam_ids]
+        self._changed(self.exams_path)
+
+    def load_submissions(self):
+        return [dict(record) for record in self.submissions]
+
+    def add_submission(self, record):
+        # Replacing by id keeps a retried batch from adding its submissions twice;
+        # retried records are near the end, so search from there.
+        for i in range(len(self.submissions) - 1, -1, -1):
+            if self.submissions[i]["id"] == record["id"]:
+                self.submissions[i] = dict(record)
+                break
+        else:
+            self.submissions.append(dict(record))
+        self._changed(self.submissions_path)
+
+    def delete_submission(self, submission_id):
+        self.submissions = [record for record in self.submissions if record["id"] != submission_id]
+        self._changed(self.submissions_path)
+
+    def update_submission(self, submission_id, fields):
+        for record in self.submissions:
+            if record["id"] == submission_id:
+                record.update(fields)
+        self._changed(self.submissions_path)
+
+    def load_user_states(self):
+        return {uid: dict(data) for uid, data in self.states.items()}
+
+    def save_user_states(self, states):
+        for uid, data in states.items():
+            if data:
+                self.states[uid] = data
+            else:
+                self.states.pop(uid, None)
+        self._changed(self.states_path)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS exams (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    name TEXT,
+    date TEXT,
+    time TEXT,
+    content TEXT
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name TEXT,
+    file_id TEXT,
+    submitted_by TEXT,
+    subject TEXT,
+    submission_date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_subject ON submissions (subject);
+CREATE INDEX IF NOT EXISTS idx_submissions_submitted_by ON submissions (submitted_by);
+CREATE INDEX IF NOT EXISTS idx_submissions_date ON submissions (submission_date);
+"""
+
+# Applied in order on top of SCHEMA; PRAGMA user_version records how many ran.
+MIGRATIONS = [
+    """
+    ALTER TABLE users ADD COLUMN username TEXT;
+    ALTER TABLE users ADD COLUMN first_seen TEXT;
+    ALTER TABLE users ADD COLUMN last_seen TEXT;
+    ALTER TABLE users ADD COLUMN is_admin INTEGER NOT NULL DEFAULT 0;
+    """,
+    """
+    ALTER TABLE submissions ADD COLUMN file_unique_id TEXT;
+    ALTER TABLE submissions ADD COLUMN sha256 TEXT;
+    ALTER TABLE submissions ADD COLUMN path TEXT;
+    CREATE INDEX IF NOT EXISTS idx_submissions_sha256 ON submissions (sha256);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_state (
+        user_id INTEGER PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        collection TEXT NOT NULL,
+        key TEXT NOT NULL,
+        worker TEXT,
+        created REAL NOT NULL
+    );
+    """,
+    """
+    ALTER TABLE submissions ADD COLUMN size INTEGER;
+    ALTER TABLE submissions ADD COLUMN archive TEXT;
+    """,
+    """
+    ALTER TABLE submissions ADD COLUMN user_id INTEGER;
+    CREATE INDEX IF NOT EXISTS idx_submissions_user_id ON submissions (user_id);
+    UPDATE submissions SET user_id = (
+        SELECT user_id FROM users WHERE users.username = submissions.submitted_by
+    ) WHERE (SELECT COUNT(*) FROM users WHERE users.username = submissions.submitted_by) = 1;
+    """,
+]
+
+
+class SqliteStorage(Storage):
+    """SQLite (WAL) backend: every change is a single indexed insert or delete.
+
+    Several bot processes may share one database. Each opens it with its own
+    ``worker`` name; changes to users, exams and submissions are then also
+    appended to the ``changes`` table so the other workers can pick them up
+    (see ``cluster.ChangeFeed``).
+    """
+
+    def __init__(self, path=DB_PATH, migrate_from=".", worker=None):
+        self.path = path
+        self.worker = worker
+        self.depth = 0  # open batch() levels
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA busy_timeout = 10000")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.migrate_schema()
+        if migrate_from is not None:
+            self.migrate_json(migrate_from)
+
+    def migrate_schema(self):
+        # IMMEDIATE takes the write lock up front, so workers starting together
+        # wait for each other and each migration runs exactly once.
+        with self.batch():
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                for statement in script.split(";"):
+                    if statement.strip():
+                        self.conn.execute(statement)
+                self.conn.execute(f"PRAGMA user_version = {number}")
+
+    def migrate_json(self, directory):
+        """Import the JSON backend's files once; they are left in place as a backup.
+
+        They are read through :class:`JsonStorage`, so every layout it accepts
+        (``users.json`` or the older ``user_ids.json``, saved sessions in
+        ``user_state.json``) is carried over.
+        """
+        with self.batch():
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                return
+            legacy = JsonStorage(directory)
+            self.import_users(legacy.load_users().values())
+            self.import_exams(legacy.load_exams())
+            self.import_submissions(legacy.load_submissions())
+            self.save_user_states(legacy.load_user_states())
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', '1')")
+
+    def import_users(self, users):
+        self.conn.executemany(
+            f"INSERT OR IGNORE INTO users ({', '.join(USER_FIELDS)}) VALUES ({', '.join('?' for _ in USER_FIELDS)})",
+            (tuple(user.get(field) for field in USER_FIELDS[:-1]) + (bool(user.get("is_admin")),) for user in users)
+        )
+
+    def import_exams(self, exams):
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO exams (id, name, date, time, content) VALUES (?, ?, ?, ?, ?)",
+            (tuple(exam.get(field) for field in EXAM_FIELDS) for exam in exams)
+        )
+
+    def import_submissions(self, records):
+        self.conn.executemany(
+            f"INSERT INTO submissions ({', '.join(SUBMISSION_FIELDS)}) "
+            f"VALUES ({', '.join('?' for _ in SUBMISSION_FIELDS)})",
+            (tuple(record.get(field) for field in SUBMISSION_FIELDS) for record in records)
+        )
+
+    def _log(self, collection, keys):
+        if self.worker is not None:
+            now = time.time()
+            self.conn.executemany(
+                "INSERT INTO changes (collection, key, worker, created) VALUES (?, ?, ?, ?)",
+                ((collection, str(key), self.worker, now) for key in keys)
+            )
+
+    def load_users(self):
+        rows = self.conn.execute("SELECT user_id, username, first_seen, last_seen, is_admin FROM users")
+        return {row["user_id"]: {**dict(row), "is_admin": bool(row["is_admin"])} for row in rows}
+
+    def get_user(self, user_id):
+        row = self.conn.execute(
+            "SELECT user_id, username, first_seen, last_seen, is_admin FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return {**dict(row), "is_admin": bool(row["is_admin"])} if row else None
+
+    def upsert_users(self, users):
+        with self.batch():
+            self.conn.executemany(
+                "INSERT INTO users (user_id, username, first_seen, last_seen, is_admin) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET username = excluded.username, "
+                "last_seen = excluded.last_seen, is_admin = excluded.is_admin",
+                (tuple(user.get(field) for field in USER_FIELDS) for user in users)
+            )
+            self._log("users", [user["user_id"] for user in users])
+
+    def remove_users(self, user_ids):
+        with self.batch():
+            self.conn.executemany("DELETE FROM users WHERE user_id = ?", ((uid,) for uid in user_ids))
+            self._log("users", user_ids)
+
+    def load_exams(self):
+        rows = self.conn.execute("SELECT id, name, date, time, content FROM exams ORDER BY seq")
+        return [dict(row) for row in rows]
+
+    def get_exam(self, exam_id):
+        row = self.conn.execute("SELECT id, name, date, time, content FROM exams WHERE id = ?", (exam_id,)).fetchone()
+        return dict(row) if row else None
+
+    def add_exam(self, exam):
+        with self.batch():
+            self.import_exams([exam])
+            self._log("exams", [exam["id"]])
+
+    def delete_exams(self, exam_ids):
+        with self.batch():
+            self.conn.executemany("DELETE FROM exams WHERE id = ?", ((exam_id,) for exam_id in exam_ids))
+            self._log("exams", exam_ids)
+
+    def load_submissions(self):
+        rows = self.conn.execute(f"SELECT {', '.join(SUBMISSION_FIELDS)} FROM submissions ORDER BY id")
+        return [dict(row) for row in rows]
+
+    def get_submission(self, submission_id):
+        row = self.conn.execute(
+            f"SELECT {', '.join(SUBMISSION_FIELDS)} FROM submissions WHERE id = ?", (submission_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def add_submission(self, record):
+        with self.batch():
+            self.import_submissions([record])
+            self._log("submissions", [record["id"]])
+
+    def delete_submission(self, submission_id):
+        with self.batch():
+            self.conn.execute("DELETE FROM submissions WHERE id = ?", (submission_id,))
+            self._log("submissions", [submission_id])
+
+    def update_submission(self, submission_id, fields):
+        fields = {field: value for field, value in fields.items() if field in SUBMISSION_FIELDS and field != "id"}
+        with self.batch():
+            self.conn.execute(
+                f"UPDATE submissions SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ?",
+                (*fields.values(), submission_id)
+            )
+            self._log("submissions", [submission_id])
+
+    def load_user_states(self):
+        rows = self.conn.execute("SELECT user_id, data FROM user_state")
+        return {row["user_id"]: json.loads(row["data"]) for row in rows}
+
+    def save_user_states(self, states):
+        with self.batch():
+            self.conn.executemany(
+                "INSERT INTO user_state (user_id, data) VALUES (?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data",
+                ((uid, json.dumps(data)) for uid, data in states.items() if data)
+            )
+            self.conn.executemany(
+                "DELETE FROM user_state WHERE user_id = ?", ((uid,) for uid, data in states.items() if not data)
+            )
+
+    def changes_since(self, seq):
+        rows = self.conn.execute(
+            "SELECT seq, collection, key, worker FROM changes WHERE seq > ? ORDER BY seq", (seq,)
+        )
+        return [tuple(row) for row in rows]
+
+    def last_change(self):
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def prune_changes(self, max_age):
+        """Drop change-log entries older than ``max_age`` seconds; every worker has read them by then."""
+        self.conn.execute("DELETE FROM changes WHERE created < ?", (time.time() - max_age,))
+
+    @contextmanager
+    def batch(self):
+        # Nested batches join the outermost one, which alone begins and ends the transaction.
+        if self.depth:
+            self.depth += 1
+            try:
+                yield
+            finally:
+                self.depth -= 1
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.depth = 1
+        try:
+            yield
+            self.conn.execute("COMMIT")
+        except BaseException:
+            # Also after a failed COMMIT (busy, disk full): never leave the transaction open.
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            raise
+        finally:
+            self.depth = 0
+
+    def close(self):
+        self.conn.close()
+
+
+def open_storage(worker=None):
+    """Pick the backend from ``STORAGE_BACKEND`` (``sqlite`` by default, or ``json``).
+
+    ``worker`` names this process when several bot workers share the database;
+    only SQLite can be shared.
+    """
+    backend = os.getenv("STORAGE_BACKEND", "sqlite").lower()
+    if backend == "json":
+        if worker is not None:
+            raise ValueError("Multi-worker mode needs STORAGE_BACKEND=sqlite.")
+        return JsonStorage()
+    if backend == "sqlite":
+        return SqliteStorage(os.getenv("DB_PATH", DB_PATH), worker=worker)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
@@ -0,0 +1,203 @@
+import asyncio
+
+
+class SubmissionStore:
+    """In-memory submission history with secondary indexes.
+
+    Every record gets a stable integer ``id``. Records are indexed by subject,
+    submission date, submitter name and owner ``user_id``, each index mapping
+    a key to an insertion-ordered ``{id: record}`` dict, so lookups cost the
+    size of their result and deletes are O(1). Changes are persisted through ``persistence``.
+
+    When several workers share the storage, each allocates ids from its own
+    residue class (``id % id_step == id_offset``) so they never collide, and
+    applies the other workers' changes with :meth:`sync`.
+
+    ``usage`` sums the ``size`` of the records under each subject and
+    ``user_id``, kept up to date with the indexes. Objects in ``observers``
+    (e.g. the search index) get ``add(record)`` / ``remove(record)`` calls
+    as records are indexed and unindexed.
+
+    With ``lazy=True`` nothing is read from storage until the history is
+    first needed: :meth:`preload` reads it on the storage thread (start it in
+    the background at startup). Async code that may run before the load has
+    finished awaits :meth:`preload` too and shares the same load; synchronous
+    access while it is in flight is an error, as loading inline would use the
+    storage connection from the event loop alongside the storage thread.
+    """
+
+    INDEXED_FIELDS = ("subject", "submission_date", "submitted_by", "user_id")
+    USAGE_FIELDS = ("subject", "user_id")
+
+    def __init__(self, storage, persistence, id_offset=0, id_step=1, lazy=False):
+        self.storage = storage
+        self.persistence = persistence
+        self.id_offset = id_offset
+        self.id_step = id_step
+        self.records = {}
+        self.indexes = {field: {} for field in self.INDEXED_FIELDS}
+        self.usage = {field: {} for field in self.USAGE_FIELDS}
+        self.total_size = 0
+        self.observers = []
+        self.next_id = 1
+        self.loaded = False
+        self.loading = None
+        if not lazy:
+            self._load(storage.load_submissions())
+
+    def _load(self, rows):
+        if not self.loaded:
+            self.loaded = True
+            for record in rows:
+                self._index(record)
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            if self.loading is not None:
+                raise RuntimeError("The submission history is still loading; await preload() first.")
+            self._load(self.storage.load_submissions())
+
+    async def preload(self):
+        """Load the history without blocking the event loop; a no-op once loaded.
+
+        Concurrent callers wait for the same load. If it fails, the next call
+        starts a new one.
+        """
+        if self.loaded:
+            return
+        if self.loading is None:
+            self.loading = asyncio.ensure_future(self._read_all())
+        try:
+            await asyncio.shield(self.loading)
+        except Exception:
+            if self.loading is not None and self.loading.done():
+                self.loading = None
+            raise
+
+    async def _read_all(self):
+        rows = await self.persistence.run(self.storage.load_submissions)
+        self._load(rows)
+        self.loading = None
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self.records)
+
+    def __iter__(self):
+        self._ensure_loaded()
+        return iter(list(self.records.values()))
+
+    def _index(self, record):
+        if record.get("id") is None:
+            record["id"] = self.next_id
+        self.next_id = max(self.next_id, record["id"] + 1)
+        self.records[record["id"]] = record
+        for field, index in self.indexes.items():
+            index.setdefault(record.get(field), {})[record["id"]] = record
+        self._count_usage(record, 1)
+        for observer in self.observers:
+            observer.add(record)
+
+    def _unindex(self, record):
+        for field, index in self.indexes.items():
+            bucket = index.get(record.get(field))
+            if bucket is not None:
+                bucket.pop(record["id"], None)
+                if not bucket:
+                    del index[record.get(field)]
+        self._count_usage(record, -1)
+        for observer in self.observers:
+            observer.remove(record)
+
+    def _count_usage(self, record, sign):
+        size = (record.get("size") or 0) * sign
+        self.total_size += size
+        for field, usage in self.usage.items():
+            key = record.get(field)
+            usage[key] = usage.get(key, 0) + size
+            if not usage[key]:
+                del usage[key]
+
+    def add(self, record):
+        self._ensure_loaded()
+        self.next_id += (self.id_offset - self.next_id) % self.id_step
+        record["id"] = None
+        self._index(record)
+        self.persistence.submit(self.storage.add_submission, dict(record))
+        return record
+
+    def remove(self, submission_id):
+        self._ensure_loaded()
+        record = self.records.pop(submission_id, None)
+        if record is not None:
+            self._unindex(record)
+            self.persistence.submit(self.storage.delete_submission, submission_id)
+        return record
+
+    def update(self, submission_id, **fields):
+        self._ensure_loaded()
+        record = self.records.get(submission_id)
+        if record is not None:
+            self._unindex(record)
+            record.update(fields)
+            self._index(record)
+            self.persistence.submit(self.storage.update_submission, submission_id, dict(fields))
+        return record
+
+    def claim(self, user_id, username):
+        """Give ``user_id`` the records filed under ``username`` that have no owner; returns how many.
+
+        Submissions stored before ``user_id`` was recorded only name their
+        submitter, and the migration can't map every name to one user.
+        """
+        if not username:
+            return 0
+        unowned = [record for record in self._lookup("submitted_by", username) if record.get("user_id") is None]
+        for record in unowned:
+            self.update(record["id"], user_id=user_id)
+        return len(unowned)
+
+    def used(self, field, value):
+        """Bytes stored under a subject or user id."""
+        self._ensure_loaded()
+        return self.usage[field].get(value, 0)
+
+    def sync(self, submission_id, record):
+        """Apply a change made by another worker: ``record`` is the stored row, or None if deleted."""
+        self._ensure_loaded()
+        old = self.records.pop(submission_id, None)
+        if old is not None:
+            self._unindex(old)
+        if record is not None:
+            self._index(record)
+
+    def get(self, submission_id):
+        self._ensure_loaded()
+        return self.records.get(submission_id)
+
+    def _lookup(self, field, value):
+        self._ensure_loaded()
+        return list(self.indexes[field].get(value, {}).values())
+
+    def count(self, field, value):
+        self._ensure_loaded()
+        return len(self.indexes[field].get(value, ()))
+
+    def iter_by(self, field, value):
+        """Iterate over matching records without copying them into a list (e.g. to page through)."""
+        self._ensure_loaded()
+        return iter(self.indexes[field].get(value, {}).values())
+
+    def by_subject(self, subject):
+        return self._lookup("subject", subject)
+
+    def by_date(self, date):
+        return self._lookup("submission_date", date)
+
+    def by_submitter(self, submitter):
+        return self._lookup("submitted_by", submitter)
+
+    def dates(self):
+        """Submission dates that have at least one record."""
+        self._ensure_loaded()
+        return [date for date in self.indexes["submission_date"] if date]
@@ -0,0 +1,107 @@
+"""UserOrderedApplication: per-user order, no lost writes and the update_slots bound.
+
+    python -m pytest -q test_concurrency.py
+"""
+import os
+import random
+import asyncio
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+
+from bench_webhook import FakeRequest, make_update
+from concurrency import PENDING_UPDATES, UserOrderedApplication
+from persistence import PersistenceService
+from storage import SqliteStorage
+from submissions import SubmissionStore
+from user_registry import UserRegistry
+
+USERS = 20
+MESSAGES = 10
+BURST = 3
+SLOTS = 8
+
+
+def build_app(slots=SLOTS):
+    return (
+        ApplicationBuilder()
+        .token("123:TEST")
+        .request(FakeRequest())
+        .updater(None)
+        .application_class(UserOrderedApplication, kwargs={"update_slots": slots})
+        .concurrent_updates(PENDING_UPDATES)
+        .build()
+    )
+
+
+async def play(app, users=USERS, messages=MESSAGES, burst=BURST):
+    """Queue interleaved bursts of numbered messages from every user and wait until all are handled."""
+    await app.initialize()
+    await app.start()
+    update_id = 0
+    for first in range(1, messages + 1, burst):
+        for user_id in range(1, users + 1):
+            for seq in range(first, min(first + burst, messages + 1)):
+                update_id += 1
+                data = make_update(update_id, user_id)
+                data["message"]["text"] = str(seq)
+                await app.update_queue.put(Update.de_json(data, app.bot))
+    await app.update_queue.join()
+    await app.stop()
+    await app.shutdown()
+
+
+def test_per_user_order_and_no_lost_writes(tmp_path):
+    async def run():
+        store = SqliteStorage(os.path.join(tmp_path, "bot.db"), migrate_from=None)
+        persistence = PersistenceService(store)
+        persistence.start()
+        users = UserRegistry(store, persistence)
+        submitted_files = SubmissionStore(store, persistence)
+        handled = {}
+        rng = random.Random(1)
+
+        async def handler(update, context):
+            user_id = update.effective_user.id
+            seq = int(update.message.text)
+            handled.setdefault(user_id, []).append(seq)
+            users.touch(update.effective_user)
+            await asyncio.sleep(rng.uniform(0, 0.005))  # let other users' updates interleave
+            submitted_files.add({"file_name": f"{seq}.pdf", "file_id": f"{user_id}-{seq}",
+                                 "submitted_by": str(user_id), "user_id": user_id,
+                                 "subject": "OOSAD", "submission_date": "2025-01-01"})
+
+        app = build_app()
+        app.add_handler(MessageHandler(filters.TEXT, handler))
+        await play(app)
+        users.flush()
+        await persistence.close()
+        return app, handled, SqliteStorage(os.path.join(tmp_path, "bot.db"), migrate_from=None)
+
+    app, handled, reopened = asyncio.run(run())
+    expected = list(range(1, MESSAGES + 1))
+    assert handled == {user_id: expected for user_id in range(1, USERS + 1)}
+    assert sorted(reopened.load_users()) == list(range(1, USERS + 1))
+    stored = {(record["user_id"], record["file_name"]) for record in reopened.load_submissions()}
+    assert stored == {(u, f"{seq}.pdf") for u in range(1, USERS + 1) for seq in expected}
+    assert len(app.user_locks) == 0
+
+
+def test_update_slots_bound_handlers_running_at_once():
+    running = peak = 0
+
+    async def handler(update, context):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.002)
+        running -= 1
+
+    async def run():
+        app = build_app(slots=4)
+        app.add_handler(MessageHandler(filters.TEXT, handler))
+        # Each user's backlog waits on its lock; only the users at the front of their queue use slots.
+        await play(app, users=8, messages=20, burst=20)
+
+    asyncio.run(run())
+    assert peak == 4
@@ -0,0 +1,250 @@
+import os
+import time
+import uuid
+import errno
+import shutil
+import asyncio
+import hashlib
+
+import httpx
+
+SUBMISSIONS_DIR = "submissions"
+BLOBS_DIR = os.path.join(SUBMISSIONS_DIR, ".blobs")
+TMP_DIR = os.path.join(SUBMISSIONS_DIR, ".tmp")
+WORKERS = 3
+QUEUE_SIZE = 200
+CHUNK_SIZE = 256 * 1024
+DRAIN_TIMEOUT = 20  # seconds stop() lets queued uploads finish before giving up on them
+STALE_PART = 60 * 60  # .part files untouched this long are leftovers of a crash
+LINK_FALLBACK_ERRORS = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP)
+
+
+class UploadJob:
+    def __init__(self, file_id, file_unique_id, file_name, file_size, subject, chat_id, submitted_by, user_id=None):
+        self.file_id = file_id
+        self.file_unique_id = file_unique_id
+        self.file_name = file_name
+        self.file_size = file_size
+        self.subject = subject
+        self.chat_id = chat_id
+        self.submitted_by = submitted_by
+        self.user_id = user_id
+
+
+def blob_path(sha256):
+    return os.path.join(BLOBS_DIR, sha256[:2], sha256)
+
+
+def _write_chunk(f, digest, chunk):
+    f.write(chunk)
+    digest.update(chunk)
+
+
+def _copy_local(source, f, digest):
+    with open(source, "rb") as src:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            _write_chunk(f, digest, chunk)
+
+
+def _store_blob(tmp_path, sha256):
+    """Move a finished download into the content-addressed blob store."""
+    target = blob_path(sha256)
+    if os.path.exists(target):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+    return target
+
+
+def _copy_exclusive(blob, path):
+    """Copy ``blob`` to ``path``, failing with FileExistsError if the name is taken."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        with open(fd, "wb") as dst, open(blob, "rb") as src:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+def _link_into_subject(blob, subject, file_name):
+    """Expose ``blob`` as ``submissions/{subject}/{file_name}`` without overwriting other work.
+
+    Every submission gets its own link so deleting one never removes another's
+    file; taken names get a ``(2)``, ``(3)``... suffix. Names are claimed by
+    the link (or an ``O_EXCL`` copy where hard links aren't possible) itself,
+    so concurrent uploads of the same name can't end up on one path.
+    Returns the path used.
+    """
+    directory = os.path.join(SUBMISSIONS_DIR, subject)
+    os.makedirs(directory, exist_ok=True)
+    stem, ext = os.path.splitext(file_name)
+    n = 1
+    while True:
+        path = os.path.join(directory, file_name if n == 1 else f"{stem} ({n}){ext}")
+        try:
+            try:
+                os.link(blob, path)
+            except OSError as e:
+                if e.errno not in LINK_FALLBACK_ERRORS:
+                    raise
+                _copy_exclusive(blob, path)
+            return path
+        except FileExistsError:
+            n += 1
+
+
+def clean_stale_parts(max_age=STALE_PART):
+    """Remove downloads a crashed process left in ``submissions/.tmp``; returns how many."""
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(TMP_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.name.endswith(".part") and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def release(path, sha256):
+    """Remove a submission's file and drop its blob once nothing links to it."""
+    if path and os.path.exists(path):
+        os.remove(path)
+    if sha256:
+        blob = blob_path(sha256)
+        if os.path.exists(blob) and os.stat(blob).st_nlink <= 1:
+            os.remove(blob)
+
+
+class UploadAborted(Exception):
+    def __init__(self):
+        super().__init__("the bot was restarting before your file was saved. Please send it again.")
+
+
+class UploadPipeline:
+    """Downloads submitted documents in the background with a bounded worker pool.
+
+    Each download is streamed in chunks into ``submissions/.tmp`` while being
+    hashed, then atomically moved into a content-addressed blob store and
+    hard-linked into ``submissions/{subject}/``. Files Telegram already knows
+    we hold (same ``file_unique_id``) are not downloaded again, and identical
+    content uploaded under another name shares the same blob.
+    ``on_complete(job, path, sha256)`` / ``on_error(job, exc)`` are awaited
+    when a job settles.
+
+    :meth:`stop` stops taking jobs and gives the queue ``DRAIN_TIMEOUT``
+    seconds to finish; whatever is left settles with :class:`UploadAborted`,
+    so every student who was told their file is being saved hears back.
+    """
+
+    def __init__(self, on_complete, on_error, workers=WORKERS, queue_size=QUEUE_SIZE):
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.known = {}
+        self.tasks = []
+        self.bot = None
+        self.client = None
+        self.active = set()
+        self.closing = False
+
+    def remember(self, file_unique_id, sha256):
+        if file_unique_id and sha256:
+            self.known[file_unique_id] = sha256
+
+    def start(self, bot):
+        self.bot = bot
+        self.client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout=DRAIN_TIMEOUT):
+        """Finish queued uploads (up to ``timeout`` seconds), then fail the rest with UploadAborted."""
+        self.closing = True
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        unfinished = list(self.active)
+        while not self.queue.empty():
+            unfinished.append(self.queue.get_nowait())
+            self.queue.task_done()
+        self.active.clear()
+        for job in unfinished:
+            try:
+                await self.on_error(job, UploadAborted())
+            except Exception as e:
+                print(f"⚠️ Could not report the unfinished upload {job.file_name}: {e}")
+        if self.client is not None:
+            await self.client.aclose()
+
+    def enqueue(self, job):
+        """Queue a job; returns its position, or None if the queue is full (or the pipeline is stopping)."""
+        if self.closing:
+            return None
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return None
+        return self.queue.qsize()
+
+    async def _download(self, job):
+        await asyncio.to_thread(os.makedirs, TMP_DIR, exist_ok=True)
+        tmp_path = os.path.join(TMP_DIR, f"{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        telegram_file = await self.bot.get_file(job.file_id)
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            if telegram_file.file_path.startswith(("http://", "https://")):
+                async with self.client.stream("GET", telegram_file.file_path) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        await asyncio.to_thread(_write_chunk, f, digest, chunk)
+            else:
+                # Local Bot API server: the file is already on this machine.
+                await asyncio.to_thread(_copy_local, telegram_file.file_path, f, digest)
+        except BaseException:
+            await asyncio.to_thread(f.close)
+            await asyncio.to_thread(os.remove, tmp_path)
+            raise
+        await asyncio.to_thread(f.close)
+        sha256 = digest.hexdigest()
+        await asyncio.to_thread(_store_blob, tmp_path, sha256)
+        return sha256
+
+    async def process(self, job):
+        sha256 = self.known.get(job.file_unique_id)
+        if sha256 is None or not await asyncio.to_thread(os.path.exists, blob_path(sha256)):
+            sha256 = await self._download(job)
+            self.remember(job.file_unique_id, sha256)
+        path = await asyncio.to_thread(_link_into_subject, blob_path(sha256), job.subject, job.file_name)
+        return path, sha256
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            self.active.add(job)
+            try:
+                try:
+                    path, sha256 = await self.process(job)
+                except Exception as e:
+                    await self.on_error(job, e)
+                else:
+                    await self.on_complete(job, path, sha256)
+            except asyncio.CancelledError:
+                raise  # the job stays in self.active for stop() to report
+            except Exception as e:
+                print(f"⚠️ Upload callback failed for {job.file_name}: {e}")
+            finally:
+                self.queue.task_done()
+            self.active.discard(job)
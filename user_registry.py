@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime
+
+FLUSH_INTERVAL = 60  # seconds between batched last_seen/username updates
+
+
+class UserRegistry:
+    """Known users with their metadata, kept in memory and persisted lazily.
+
+    A user seen for the first time is written straight away; repeat visits only
+    update the in-memory record and mark it dirty, and dirty records are
+    written together every ``flush_interval`` seconds (and on shutdown), so
+    :meth:`touch` costs the same no matter how many users are registered.
+    """
+
+    def __init__(self, storage, persistence, flush_interval=FLUSH_INTERVAL):
+        self.storage = storage
+        self.persistence = persistence
+        self.flush_interval = flush_interval
+        self.users = storage.load_users()
+        self.dirty = set()
+
+    def __contains__(self, user_id):
+        return user_id in self.users
+
+    def __len__(self):
+        return len(self.users)
+
+    def ids(self):
+        return list(self.users)
+
+    def get(self, user_id):
+        return self.users.get(user_id)
+
+    def touch(self, user, is_admin=False):
+        """Record a visit from a ``telegram.User``; returns True if the user is new."""
+        now = datetime.now().isoformat(timespec="seconds")
+        record = self.users.get(user.id)
+        if record is None:
+            record = self.users[user.id] = {
+                "user_id": user.id,
+                "username": user.username,
+                "first_seen": now,
+                "last_seen": now,
+                "is_admin": is_admin,
+            }
+            self.dirty.discard(user.id)
+            self.persistence.submit(self.storage.upsert_users, [dict(record)])
+            return True
+        record["last_seen"] = now
+        record["username"] = user.username
+        record["is_admin"] = is_admin
+        self.dirty.add(user.id)
+        return False
+
+    def remove(self, user_ids):
+        user_ids = [uid for uid in user_ids if uid in self.users]
+        for uid in user_ids:
+            del self.users[uid]
+            self.dirty.discard(uid)
+        if user_ids:
+            self.persistence.submit(self.storage.remove_users, user_ids)
+        return user_ids
+
+    def sync(self, user_id, record):
+        """Apply a change made by another worker: ``record`` is the stored row, or None if removed."""
+        if user_id in self.dirty:
+            return  # our own pending update is newer
+        if record is None:
+            self.users.pop(user_id, None)
+        else:
+            self.users[user_id] = record
+
+    def flush(self):
+        if self.dirty:
+            batch = [dict(self.users[uid]) for uid in self.dirty]
+            self.dirty.clear()
+            self.persistence.submit(self.storage.upsert_users, batch)
+
+    async def run(self):
+        """Periodically flush dirty records; run as a background task."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
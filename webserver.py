@@ -0,0 +1,127 @@
+import json
+import time
+import asyncio
+import hmac
+
+MAX_BODY = 1024 * 1024
+READ_TIMEOUT = 30  # seconds a client may take to send the next line or the body
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class WebServer:
+    """Tiny HTTP/1.1 server on the bot's own event loop.
+
+    Serves the Telegram webhook (``POST webhook_path``) plus ``/`` and
+    ``/healthz`` (liveness), ``/readyz`` (readiness) and ``/metrics``. Replaces
+    the Flask keep-alive thread. With ``on_update=None`` the webhook route is
+    disabled and only the health and metrics routes are served (polling mode).
+
+    ``on_update(data)`` is awaited with each decoded webhook payload,
+    ``is_ready()`` decides the readiness answer and ``metrics()`` returns the
+    text body for ``/metrics``.
+    """
+
+    def __init__(self, on_update, is_ready, metrics, host="0.0.0.0", port=8080,
+                 webhook_path="/webhook", secret_token=None):
+        self.on_update = on_update
+        self.is_ready = is_ready
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.webhook_path = webhook_path
+        self.secret_token = secret_token
+        self.server = None
+        self.connections = set()
+        self.started = time.time()
+        self.updates_received = 0
+        self.bad_requests = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            # Idle keep-alive connections would otherwise keep their handlers waiting.
+            for writer in list(self.connections):
+                writer.close()
+            await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, "bad request line", keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, "bad content-length", keep_alive=False)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, "too large", keep_alive=False)
+                    break
+                body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                status, payload, content_type = await self._route(method, path.split("?")[0], headers, body)
+                await self._respond(writer, status, payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass  # slow or silent clients are dropped rather than holding the connection open
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def _route(self, method, path, headers, body):
+        if self.on_update is not None and path == self.webhook_path:
+            if method != "POST":
+                return 405, "method not allowed", "text/plain"
+            if self.secret_token and not hmac.compare_digest(
+                    headers.get("x-telegram-bot-api-secret-token", ""), self.secret_token):
+                return 403, "forbidden", "text/plain"
+            try:
+                data = json.loads(body)
+            except ValueError:
+                self.bad_requests += 1
+                return 400, "invalid json", "text/plain"
+            self.updates_received += 1
+            await self.on_update(data)
+            return 200, "ok", "text/plain"
+        if method != "GET":
+            return 405, "method not allowed", "text/plain"
+        if path in ("/", "/healthz"):
+            return 200, "Bot is alive!", "text/plain"
+        if path == "/readyz":
+            return (200, "ready", "text/plain") if self.is_ready() else (503, "not ready", "text/plain")
+        if path == "/metrics":
+            return 200, self.metrics(), "text/plain; version=0.0.4"
+        return 404, "not found", "text/plain"
+
+    async def _respond(self, writer, status, payload, content_type="text/plain", keep_alive=True):
+        body = payload.encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()